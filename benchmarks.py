@@ -0,0 +1,746 @@
+"""Performance benchmarks for PyText editor.
+
+Run with:
+    python benchmarks.py [name ...] [--save FILE] [--compare FILE]
+
+Benchmarks that do not need a display run headless against the document
+model in `project.py`. Widget benchmarks use a hidden Tk root and are
+skipped when no display is available (run them under Xvfb, e.g.
+`xvfb-run python benchmarks.py`). Every reported median is collected in
+RESULTS; `--save` writes them as a JSON baseline and `--compare` flags
+the ones that got slower than a baseline by more than the tolerance.
+"""
+import argparse
+import codecs
+import json
+import mmap
+import os
+import platform
+import queue
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tkinter as tk
+from array import array
+from pathlib import Path
+
+import project
+
+# Median and p95 of every reported measurement, keyed 'benchmark/measurement'
+RESULTS = {}
+_RUNNING = {'benchmark': None}
+# A measurement whose median grew by more than this fraction is a regression
+COMPARE_TOLERANCE = 0.25
+
+
+def make_words_document(words, words_per_line=12, seed=0):
+    """Build a synthetic document of `words` words."""
+    rng = random.Random(seed)
+    vocab = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'editor', 'python', 'text',
+             'piece', 'table', 'widget', 'count', 'a', 'of', 'the', 'and']
+    lines = []
+    for start in range(0, words, words_per_line):
+        n = min(words_per_line, words - start)
+        lines.append(' '.join(rng.choice(vocab) for _ in range(n)))
+    return '\n'.join(lines) + '\n'
+
+
+def make_tk_root():
+    """Return a withdrawn Tk root, or None when there is no display."""
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"  skipped: no display ({e})")
+        return None
+    root.withdraw()
+    return root
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    median = statistics.median(samples)
+    print(f"{name:<32} median {median * 1000:9.3f} ms   "
+          f"p95 {p95 * 1000:9.3f} ms   n={len(samples)}")
+    RESULTS[f"{_RUNNING['benchmark']}/{name}"] = {'median_s': median, 'p95_s': p95, 'n': len(samples)}
+
+
+def bench_word_count(words=1_000_000, keystrokes=200, baseline_keystrokes=5):
+    """Keystroke-to-updated-count latency: WordCounter vs. a full split()."""
+    text = make_words_document(words)
+    doc = project.PieceTable(text)
+    counter = project.WordCounter(doc)
+    rng = random.Random(1)
+    print(f"word_count: {counter.words} words, {len(doc)} characters, {doc.line_count()} lines")
+
+    incremental = []
+    for _ in range(keystrokes):
+        offset = rng.randrange(len(doc))
+        char = rng.choice('ab \n')
+        t0 = time.perf_counter()
+        doc.insert(offset, char)
+        counter.words
+        incremental.append(time.perf_counter() - t0)
+    report('incremental WordCounter', incremental)
+
+    full = []
+    for _ in range(baseline_keystrokes):
+        offset = rng.randrange(len(doc))
+        doc.insert(offset, 'a')
+        t0 = time.perf_counter()
+        project.word_count(doc.text())
+        full.append(time.perf_counter() - t0)
+    report('word_count(content.split())', full)
+    assert counter.words == project.word_count(doc.text())
+
+
+def bench_replace_all(size=50 * 1024 * 1024, replacements=100_000):
+    """Replace All of `replacements` matches in a `size`-character document."""
+    root = make_tk_root()
+    if root is None:
+        return
+    filler = make_words_document(size // 6)
+    step = len(filler) // replacements
+    parts = []
+    for i in range(replacements):
+        parts.append(filler[i * step:(i + 1) * step - 6])
+        parts.append('NEEDLE')
+    text = ''.join(parts)
+    widget = tk.Text(root, undo=True)
+    project.attach_document(widget)
+    widget.insert('1.0', text)
+    widget.tag_configure('bold', font=('Arial', 12, 'bold'))
+    widget.tag_add('bold', '1.0', '1.20')
+    print(f"replace_all: {len(text)} characters, {replacements} matches")
+
+    t0 = time.perf_counter()
+    count = project.replace_all(widget, 'NEEDLE', 'pin')
+    report('replace_all', [time.perf_counter() - t0])
+    assert count == replacements
+    assert project.get_document(widget).text() == text.replace('NEEDLE', 'pin')
+    assert widget.tag_ranges('bold'), 'formatting on untouched text was lost'
+    root.destroy()
+
+
+# Loading a .pytx document with this many formatted runs must stay under the target
+RICH_LOAD_RUNS = 10_000
+RICH_LOAD_TARGET_S = 0.5
+
+
+def bench_rich_load(runs=RICH_LOAD_RUNS, target=RICH_LOAD_TARGET_S):
+    """Load time of a .pytx document with `runs` formatted runs."""
+    root = make_tk_root()
+    if root is None:
+        return
+    text = make_words_document(runs * 10)
+    styles = {
+        'bold': {'font': ['Arial', 12, 'bold', 'roman', False]},
+        'italic': {'font': ['Arial', 12, 'normal', 'italic', False]},
+        'title': {'font': ['Arial', 20, 'bold', 'roman', False], 'justify': 'center'},
+        'align_right': {'justify': 'right'},
+    }
+    per_tag = runs // len(styles)
+    step = len(text) // per_tag
+    tags = {tag: {'style': style, 'runs': [step - 20, 20] * per_tag} for tag, style in styles.items()}
+    fd, path = tempfile.mkstemp(suffix='.pytx')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'format': 'pytext', 'version': 1, 'tags': tags, 'text': text}, f)
+    widget = tk.Text(root, undo=True)
+    project.attach_document(widget)
+    print(f"rich_load: {len(text)} characters, {per_tag * len(styles)} runs, target {target * 1000:.0f} ms")
+
+    samples = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        project.load_rich_document(widget, path)
+        samples.append(time.perf_counter() - t0)
+    report('load_rich_document', samples)
+    os.unlink(path)
+    assert len(widget.tag_ranges('bold')) == 2 * per_tag
+    root.destroy()
+    status = 'OK' if statistics.median(samples) <= target else 'OVER TARGET'
+    print(f"  {status}")
+
+
+def bench_typing(words=200_000, keystrokes=2000):
+    """Typing throughput with synthetic key events in a widget with a status bar and dirty tracking."""
+    root = make_tk_root()
+    if root is None:
+        return
+    root.deiconify()
+    widget = tk.Text(root, undo=True)
+    widget.pack()
+    project.attach_document(widget)
+    widget.insert('1.0', make_words_document(words))
+    project.create_status_bar(root, widget).pack()
+    edits = []
+    project.on_user_edit(widget, lambda: edits.append(1))
+    widget.mark_set('insert', '200.0')
+    widget.focus_force()
+    root.update()
+    print(f"typing: {keystrokes} keystrokes into {words} words")
+
+    samples = []
+    t0 = time.perf_counter()
+    for i in range(keystrokes):
+        t = time.perf_counter()
+        widget.event_generate('<KeyPress>', keysym='space' if i % 6 == 5 else 'a', when='now')
+        root.update()
+        samples.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - t0
+    report('keystroke to idle', samples)
+    print(f"  {keystrokes / elapsed:,.0f} keystrokes/s")
+    assert len(edits) == keystrokes, f"{len(edits)} edits seen for {keystrokes} keystrokes"
+    root.destroy()
+
+
+def make_python_source(lines, seed=0):
+    """Build a synthetic Python module of about `lines` lines."""
+    rng = random.Random(seed)
+    out = []
+    while len(out) < lines:
+        n = rng.randrange(1000)
+        out += [f'@decorator_{n}',
+                f'def function_{n}(arg, other=0x{n:x}):',
+                f'    """Docstring {n}.',
+                '',
+                '    Spans a few lines.',
+                '    """',
+                f"    value = arg + {n}.5e3  # comment {n}",
+                "    return str(value) + 'text' + r\"raw\\d\"",
+                '']
+    return '\n'.join(out[:lines]) + '\n'
+
+
+# Highlighting must keep up with typing: one 60 Hz frame per keystroke
+HIGHLIGHT_TARGET_S = 1 / 60
+
+
+def bench_highlight(lines=20_000, keystrokes=300, visible=60, target=HIGHLIGHT_TARGET_S):
+    """Per-keystroke re-lex (and, with a display, repaint) cost on a large Python file."""
+    source = make_python_source(lines)
+    doc = project.PieceTable(source)
+    lexer = project.PythonLexer(doc)
+    rng = random.Random(2)
+    print(f"highlight: {doc.line_count()} lines, target {target * 1000:.1f} ms per keystroke")
+
+    t0 = time.perf_counter()
+    lexer.state_at(doc.line_count() - 1)
+    report('first lex of whole file', [time.perf_counter() - t0])
+
+    samples = []
+    for i in range(keystrokes):
+        line = rng.randrange(doc.line_count() - visible)
+        offset = doc.line_start(line)
+        t = time.perf_counter()
+        # Every tenth keystroke types a quote, which changes the lexer state
+        doc.insert(offset, '"' if i % 10 == 0 else 'x')
+        list(lexer.tokens(line, line + visible))
+        samples.append(time.perf_counter() - t)
+    report('re-lex + lex visible lines', samples)
+
+    root = make_tk_root()
+    if root is not None:
+        root.deiconify()
+        widget = tk.Text(root, height=visible)
+        widget.pack()
+        project.attach_document(widget)
+        widget.insert('1.0', source)
+        highlighter = project.SyntaxHighlighter(widget)
+        widget.see(f'{lines // 2}.0')
+        root.update()
+        painted = []
+        for i in range(keystrokes):
+            line = lines // 2 + rng.randrange(visible // 2)
+            t = time.perf_counter()
+            widget.insert(f'{line}.0', '"' if i % 10 == 0 else 'x')
+            root.update()
+            painted.append(time.perf_counter() - t)
+        report('keystroke + repaint', painted)
+        highlighter.close()
+        root.destroy()
+        samples = painted
+    status = 'OK' if statistics.median(samples) <= target else 'OVER TARGET'
+    print(f"  {status}")
+
+
+def bench_analytics(size=50 * 1024 * 1024):
+    """Document Analytics throughput on a `size`-character document, cold and cached."""
+    doc = project.PieceTable(make_words_document(size // 6))
+    print(f"analytics: {len(doc)} characters")
+    snapshot = doc.snapshot()
+    t0 = time.perf_counter()
+    project.content_hash(snapshot.iter_chunks())
+    hashed = time.perf_counter() - t0
+    stats = project.analyse_chunks(snapshot.iter_chunks())
+    analysed = time.perf_counter() - t0
+    report('content_hash', [hashed])
+    report('content_hash + analyse_chunks', [analysed])
+    print(f"  {len(doc) / analysed / 1e6:,.1f} M characters/s cold, "
+          f"{len(doc) / hashed / 1e6:,.1f} M characters/s on a cache hit")
+    assert stats['words'] == project.word_count(doc.text())
+
+
+def bench_line_index(words=6_000_000, edits=2000, lookups=100_000):
+    """Line <-> offset conversion on a large document while it is being edited."""
+    doc = project.PieceTable(make_words_document(words))
+    rng = random.Random(3)
+    print(f"line_index: {doc.line_count()} lines, {len(doc)} characters")
+
+    samples = []
+    for _ in range(edits):
+        offset = rng.randrange(len(doc))
+        t0 = time.perf_counter()
+        doc.insert(offset, rng.choice(['x', '\n', 'two\nlines\n']))
+        samples.append(time.perf_counter() - t0)
+    report('insert (random position)', samples)
+
+    lines = [rng.randrange(doc.line_count()) for _ in range(lookups)]
+    t0 = time.perf_counter()
+    offsets = [doc.line_start(line) for line in lines]
+    report('line_start', [(time.perf_counter() - t0) / lookups])
+    t0 = time.perf_counter()
+    found = [doc.line_of(offset) for offset in offsets]
+    report('line_of', [(time.perf_counter() - t0) / lookups])
+    assert found == lines
+    t0 = time.perf_counter()
+    project.offsets_to_indices(doc, sorted(offsets))
+    report('offsets_to_indices', [(time.perf_counter() - t0) / lookups])
+
+
+def bench_undo(words=1_000_000, keystrokes=2000):
+    """Undo history size and undo/redo time after typing and a large Replace All."""
+    root = make_tk_root()
+    if root is None:
+        return
+    text = make_words_document(words)
+    widget = tk.Text(root)
+    project.attach_document(widget)
+    widget.insert('1.0', text)
+    history = project.attach_undo(widget)
+    history.clear()
+    print(f"undo: {len(text)} characters, {keystrokes} keystrokes, Replace All of 'lorem'")
+
+    for i in range(keystrokes):
+        widget.insert('insert', ' ' if i % 6 == 5 else 'a')
+        root.update()
+    print(f"  {len(history.undo_stack)} undo steps, {history.size:,} bytes after typing")
+
+    history.clear()
+    t0 = time.perf_counter()
+    count = project.replace_all(widget, 'lorem', 'ipsum')
+    report('replace_all', [time.perf_counter() - t0])
+    print(f"  {count} matches: {len(history.undo_stack)} step, {history.size:,} bytes "
+          f"for a {len(text):,}-character document")
+    t0 = time.perf_counter()
+    history.undo()
+    report('undo Replace All', [time.perf_counter() - t0])
+    assert project.get_document(widget).text() == text
+    t0 = time.perf_counter()
+    history.redo()
+    report('redo Replace All', [time.perf_counter() - t0])
+    root.destroy()
+
+
+def bench_instrumentation(calls=1_000_000):
+    """Cost per call of a @timed function with recording off and on."""
+    def op(x):
+        return x
+
+    wrapped = project.timed('bench_op')(op)
+    print(f"instrumentation: {calls:,} calls")
+    enabled = project.PERF_ENABLED
+    try:
+        for label, func, on in (('plain', op, False), ('timed, off', wrapped, False), ('timed, on', wrapped, True)):
+            project.PERF_ENABLED = on
+            t0 = time.perf_counter()
+            for i in range(calls):
+                func(i)
+            print(f"  {label}: {(time.perf_counter() - t0) / calls * 1e9:.0f} ns/call")
+    finally:
+        project.PERF_ENABLED = enabled
+        project.PERF_HISTOGRAMS.pop('bench_op', None)
+
+
+# Synthetic document sizes for the `documents` benchmark. Sizes from
+# project.LARGE_FILE_THRESHOLD up open in the large-file view, so only
+# open, insert and save apply to them.
+DOCUMENT_SIZES = {
+    '1KB': 1024,
+    '100KB': 100 * 1024,
+    '10MB': 10 * 1024 * 1024,
+    '500MB': 500 * 1024 * 1024,
+}
+TAG_RANGES = 1000
+
+
+def parse_size(label):
+    """Bytes in a size like '1KB', '10MB' or '4096'."""
+    match = re.fullmatch(r'(\d+)\s*([KMG]?)B?', label.strip().upper())
+    if not match:
+        raise ValueError(f"bad document size: {label!r}")
+    return int(match.group(1)) * 1024 ** ' KMG'.index(match.group(2) or ' ')
+
+
+def write_words_file(path, size, seed=0):
+    """Write a synthetic document of `size` bytes without building it in memory."""
+    block = make_words_document(min(size, 1024 * 1024) // 6 + 1, seed=seed)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        written = 0
+        while written < size:
+            chunk = block[:size - written]
+            f.write(chunk)
+            written += len(chunk)
+
+
+def time_runs(func, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def wait_for(root, done):
+    """Run the Tk event loop until `done()` is true."""
+    while not done():
+        root.update()
+        time.sleep(0.001)
+
+
+def bench_documents(sizes=None):
+    """Core operations on synthetic documents of each size in `sizes`.
+
+    Model operations (word_count, find_all, save) run headless; open,
+    insert, autosave, Replace All and bold/italic tagging need a Tk root.
+    """
+    sizes = sizes or DOCUMENT_SIZES
+    root = make_tk_root()
+    if root is None:
+        print("  documents: widget operations skipped, running model operations only")
+    recovery_dir = project.RECOVERY_DIR
+    with tempfile.TemporaryDirectory() as scratch:
+        # Autosave journals go to the scratch directory, not the user's recovery folder
+        project.RECOVERY_DIR = Path(scratch) / 'recovery'
+        try:
+            for label, size in sizes.items():
+                path = os.path.join(scratch, f'{label}.txt')
+                write_words_file(path, size)
+                bench_document(root, label, path, size, os.path.join(scratch, f'{label}-saved.txt'))
+                os.unlink(path)
+        finally:
+            project.SAVER.wait()
+            project.RECOVERY_DIR = recovery_dir
+            if root is not None:
+                root.destroy()
+
+
+def bench_document(root, label, path, size, save_path):
+    large = size >= project.LARGE_FILE_THRESHOLD
+    # Small documents are timed several times; a 500 MB one once
+    runs = 20 if size <= 100 * 1024 else 3 if not large else 1
+    print(f"documents {label}: {size:,} bytes, {runs} run{'s' if runs != 1 else ''}"
+          f"{', large-file view' if large else ''}")
+    if not large:
+        with open(path, 'r', encoding='utf-8') as f:
+            doc = project.PieceTable(f.read())
+        report(f'{label} word_count', time_runs(lambda: project.word_count(doc.text()), runs))
+        report(f'{label} find_all', time_runs(lambda: project.find_all(doc, 'lorem'), runs))
+        report(f'{label} save', time_runs(lambda: project.write_document(save_path, doc.snapshot()), runs))
+        del doc
+    if root is None:
+        return
+
+    rng = random.Random(4)
+    open_samples = []
+    widget = scrollbar = None
+    for _ in range(runs):
+        if widget is not None:
+            close_widget(widget, scrollbar)
+        widget = tk.Text(root)
+        scrollbar = tk.Scrollbar(root, command=widget.yview)
+        project.attach_document(widget)
+        loaded = []
+        t0 = time.perf_counter()
+        view = project.open_large_file(root, widget, scrollbar, path)
+        if view is not None:
+            wait_for(root, lambda: not view.indexing)
+        else:
+            project.load_document(root, widget, path, on_done=loaded.append,
+                                  on_error=lambda e: loaded.append(e))
+            wait_for(root, lambda: loaded)
+            assert loaded == [path], loaded
+        open_samples.append(time.perf_counter() - t0)
+    report(f'{label} open', open_samples)
+
+    journal = project.EditJournal(root, widget)
+    lines = int(widget.index('end-1c').split('.')[0])
+    inserts, flushes = [], []
+    for i in range(runs * 50):
+        index = f'{rng.randint(1, lines)}.0'
+        t0 = time.perf_counter()
+        widget.insert(index, ' ' if i % 6 == 5 else 'a')
+        inserts.append(time.perf_counter() - t0)
+        if i % 50 == 49:
+            t0 = time.perf_counter()
+            journal.flush()
+            flushes.append(time.perf_counter() - t0)
+    report(f'{label} insert', inserts)
+    if large:
+        print("  autosave, word_count, find_all, replace_all and tagging do not apply to the large-file view")
+        report(f'{label} save', time_runs(
+            lambda: project.write_document(save_path, project.document_for_save(widget, save_path).snapshot()), runs))
+        close_widget(widget, scrollbar)
+        return
+    report(f'{label} autosave', flushes)
+
+    words = ('lorem', 'LOREM')
+    replaced = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        project.replace_all(widget, words[i % 2], words[(i + 1) % 2], match_case=True)
+        replaced.append(time.perf_counter() - t0)
+    report(f'{label} replace_all', replaced)
+
+    end = len(project.get_document(widget))
+    starts = sorted(rng.randrange(max(1, end - 20)) for _ in range(TAG_RANGES))
+    indices = project.offsets_to_indices(project.get_document(widget), [o for s in starts for o in (s, s + 20)])
+    tagged = []
+    for i in range(runs):
+        make = project.make_bold if i % 2 == 0 else project.make_italic
+        t0 = time.perf_counter()
+        for first, last in zip(indices[0::2], indices[1::2]):
+            widget.tag_remove('sel', '1.0', 'end')
+            widget.tag_add('sel', first, last)
+            make(widget)
+        tagged.append(time.perf_counter() - t0)
+    report(f'{label} bold/italic x{TAG_RANGES}', tagged)
+    close_widget(widget, scrollbar)
+
+
+def close_widget(widget, scrollbar):
+    project.close_large_file(widget)
+    journal = project.JOURNALS.get(str(widget))
+    if journal is not None:
+        journal.discard()
+    widget.destroy()
+    scrollbar.destroy()
+
+
+def bench_log_view(size=256 * 1024 * 1024):
+    """Log Viewer: newline index build, cached index load and a full-file byte search."""
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'big.log')
+        write_words_file(path, size)
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        print(f"log_view: {size:,} bytes")
+        results = queue.Queue()
+        t0 = time.perf_counter()
+        project.index_newlines(mm, 0, size, results, threading.Event())
+        offsets = array('q', [0])
+        while not results.empty():
+            offsets.extend(results.get()[1])
+        elapsed = time.perf_counter() - t0
+        report('index newlines', [elapsed])
+        print(f"  {len(offsets):,} lines, {size / elapsed / 1e6:,.0f} MB/s")
+        cache = project.save_line_index(path, st.st_size, st.st_mtime_ns, offsets)
+        t0 = time.perf_counter()
+        assert project.load_line_index(path, st.st_size, st.st_mtime_ns) == offsets
+        report('load cached index', [time.perf_counter() - t0])
+        for label, pattern, regex, match_case in (('search miss (literal)', 'no such text', False, True),
+                                                  ('search miss (ignore case)', 'no such text', False, False),
+                                                  ('search miss (regex)', r'\bqu+x\d', True, False)):
+            t0 = time.perf_counter()
+            project.search_bytes(mm, project.compile_byte_search(pattern, regex, match_case), 0, size,
+                                 results, threading.Event())
+            elapsed = time.perf_counter() - t0
+            assert results.get()[1] is None
+            report(label, [elapsed])
+            print(f"  {size / elapsed / 1e6:,.0f} MB/s")
+        mm.close()
+        if cache and os.path.dirname(cache) != scratch:
+            os.unlink(cache)
+
+
+def bench_file_formats(size=64 * 1024 * 1024):
+    """Read and save throughput per file format: UTF-8/LF against CRLF, cp1252 and UTF-16."""
+    text = make_words_document(size // 6 + 1)[:size]
+    with tempfile.TemporaryDirectory() as scratch:
+        print(f"file_formats: {len(text):,} characters")
+        for fmt in (project.DEFAULT_FORMAT, project.TextFormat(newline='\r\n'),
+                    project.TextFormat('cp1252', b'', '\r\n'), project.TextFormat('utf-16-le', codecs.BOM_UTF16_LE)):
+            path = os.path.join(scratch, 'doc.txt')
+            doc = project.PieceTable(text)
+            doc.file_format = fmt
+            t0 = time.perf_counter()
+            project.write_document(path, doc)
+            saved = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            # An ASCII document also sniffs as UTF-8, so the format is given
+            loaded = sum(len(chunk) for chunk in project.read_text_chunks(path, fmt=fmt))
+            read = time.perf_counter() - t0
+            assert loaded == len(text)
+            report(f"save {fmt.label()}", [saved])
+            report(f"read {fmt.label()}", [read])
+            print(f"  {os.path.getsize(path) / saved / 1e6:,.0f} MB/s saved, "
+                  f"{os.path.getsize(path) / read / 1e6:,.0f} MB/s read")
+
+
+def bench_find_in_files(files=2000, size=32 * 1024):
+    """Find in Files over a generated tree: first hit, cold search, and a repeat on the trigram index."""
+    with tempfile.TemporaryDirectory() as scratch:
+        root = os.path.join(scratch, 'tree')
+        project.SNAPSHOT_DIR = Path(scratch) / 'cache'
+        for i in range(files):
+            directory = os.path.join(root, f'd{i // 100}')
+            os.makedirs(directory, exist_ok=True)
+            write_words_file(os.path.join(directory, f'f{i}.txt'), size, seed=i)
+            if i % 50 == 0:
+                with open(os.path.join(directory, f'f{i}.txt'), 'a', encoding='utf-8') as f:
+                    f.write('a rare needle phrase\n')
+        print(f"find_in_files: {files:,} files of {size:,} bytes")
+        for label in ('cold (no index)', 'repeat (index)'):
+            search = project.FileSearch(root, 'needle phrase')
+            t0 = time.perf_counter()
+            first = None
+            while True:
+                message = search.results.get()
+                if message[0] == 'file' and first is None:
+                    first = time.perf_counter() - t0
+                elif message[0] == 'done':
+                    stats = message[1]
+                    break
+            report(f'{label} first hit', [first])
+            report(f'{label} total', [time.perf_counter() - t0])
+            print(f"  {stats['matches']} matches, {stats['searched']:,} searched, "
+                  f"{stats['skipped']:,} ruled out by the index")
+
+
+# Time from interpreter start to an editable editor window must stay under the target
+STARTUP_TARGET_S = 1.0
+STARTUP_PROBE = """
+import time, tkinter
+t0 = time.perf_counter()
+import project
+def ready(root):
+    print(time.perf_counter() - t0)
+    root.destroy()
+project.main(show_splash=False, choice=2, on_ready=ready)
+"""
+
+
+def bench_startup(runs=5, target=STARTUP_TARGET_S):
+    """Time-to-first-editable-window of a fresh process (no splash, new document)."""
+    root = make_tk_root()
+    if root is None:
+        return
+    root.destroy()
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    with tempfile.TemporaryDirectory() as home:
+        # A scratch home keeps the session file and recovery journal out of the way
+        env = dict(os.environ, HOME=home, PYTHONPATH=here)
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', STARTUP_PROBE], env=env, cwd=here,
+                                 capture_output=True, text=True, check=True).stdout
+            wall = time.perf_counter() - t0
+            samples.append(float(out.split()[-1]))
+    print(f"startup: {runs} runs, target {target * 1000:.0f} ms (last process wall time {wall * 1000:.0f} ms)")
+    report('import to editable window', samples)
+    status = 'OK' if statistics.median(samples) <= target else 'OVER TARGET'
+    print(f"  {status}")
+
+
+BENCHMARKS = {
+    'word_count': bench_word_count,
+    'replace_all': bench_replace_all,
+    'rich_load': bench_rich_load,
+    'startup': bench_startup,
+    'typing': bench_typing,
+    'highlight': bench_highlight,
+    'analytics': bench_analytics,
+    'line_index': bench_line_index,
+    'undo': bench_undo,
+    'instrumentation': bench_instrumentation,
+    'documents': bench_documents,
+    'log_view': bench_log_view,
+    'file_formats': bench_file_formats,
+    'find_in_files': bench_find_in_files,
+}
+
+
+def save_baseline(path):
+    baseline = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                'platform': platform.platform(), 'results': RESULTS}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(path, tolerance=COMPARE_TOLERANCE):
+    """Print RESULTS against the baseline in `path`; return the names that regressed."""
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {path} ({baseline.get('created', '?')}), tolerance +{tolerance:.0%}")
+    if baseline.get('platform') != platform.platform():
+        print(f"  note: baseline was recorded on {baseline.get('platform')}")
+    regressions = []
+    for name, result in sorted(RESULTS.items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"  {name:<48} new")
+            continue
+        change = result['median_s'] / base['median_s'] - 1 if base['median_s'] else 0.0
+        status = 'REGRESSION' if change > tolerance else 'ok'
+        if status != 'ok':
+            regressions.append(name)
+        print(f"  {name:<48} {base['median_s'] * 1000:9.3f} -> {result['median_s'] * 1000:9.3f} ms"
+              f"  {change:+7.1%}  {status}")
+    print(f"  {len(regressions)} regression{'s' if len(regressions) != 1 else ''}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='benchmarks.py', description='PyText editor benchmarks')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--sizes', help='comma-separated document sizes for `documents` '
+                                        f"(default: {','.join(DOCUMENT_SIZES)})")
+    parser.add_argument('--save', metavar='FILE', help='write the results to FILE as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with the baseline in FILE')
+    parser.add_argument('--tolerance', type=float, default=COMPARE_TOLERANCE,
+                        help=f'slowdown that counts as a regression (default: {COMPARE_TOLERANCE})')
+    args = parser.parse_args(argv)
+    names = args.names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            return 2
+    try:
+        sizes = {label.strip(): parse_size(label) for label in args.sizes.split(',')} if args.sizes else None
+    except ValueError as e:
+        parser.error(str(e))
+    for name in names:
+        _RUNNING['benchmark'] = name
+        if name == 'documents':
+            bench_documents(sizes)
+        else:
+            BENCHMARKS[name]()
+    if args.save:
+        save_baseline(args.save)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        return 1 if compare(args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,241 +1,5072 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, font, ttk
-import importlib.util
+from tkinter import filedialog, messagebox, simpledialog, font, ttk
 import shutil
 import json
 import os
-import inspect
 from pathlib import Path
 import tempfile
 import time
-
-
-# Application state (document path, dirty flag, root reference)
+import codecs
+import io
+import threading
+import queue
+import uuid
+import hashlib
+import re
+import bisect
+import mmap
+import math
+from array import array
+from collections import Counter, OrderedDict, deque
+from functools import wraps
+
+
+# Application state (root reference, session); open documents live in DOC_MANAGER
 APP_ROOT = None
-CURRENT_PATH = None
-IS_DIRTY = False
 SESSION_FILE = Path.home() / '.pytext_session.json'
 RETURN_FROM_PREVIOUS = False
 
+# Streaming loader settings: bytes read per chunk, and files at least this
+# large get a progress window with a Cancel button.
+LOAD_CHUNK_SIZE = 256 * 1024
+LOAD_PROGRESS_THRESHOLD = 4 * 1024 * 1024
+LOAD_JOBS = {}
+
+# Python-side document models, keyed by text widget path name
+DOCUMENTS = {}
+# Widgets whose edits are temporarily not mirrored (bulk edits resync at the end)
+MIRROR_SUSPENDED = set()
+# Longest piece the piece table will build (and size of each add-buffer block)
+PIECE_MAX = 64 * 1024
+
+
+# ----------------------- Instrumentation -----------------------
+# Opt-in timings of the editor's hot operations (--perf, PYTEXT_PERF=1 or
+# Tools > Performance). Each operation keeps a ring of PERF_WINDOWS
+# histograms, one per PERF_WINDOW_S seconds, with log-spaced buckets: a
+# sample costs a couple of clock reads and one counter increment, and memory
+# stays fixed however long the session runs. Disabled, a timed function
+# costs one extra call and a global flag check.
+
+PERF_ENABLED = os.environ.get('PYTEXT_PERF', '') not in ('', '0')
+PERF_WINDOW_S = 10
+PERF_WINDOWS = 60  # percentiles cover the last 10 minutes
+PERF_MIN_S = 1e-6  # upper edge of the first bucket
+PERF_BUCKETS_PER_OCTAVE = 4  # buckets are about 19% wide
+PERF_BUCKETS = 128  # the last bucket collects everything above ~71 minutes
+PERF_LAG_INTERVAL_MS = 100
+PERF_REFRESH_MS = 1000
+PERF_HISTOGRAMS = {}
+_PERF = {'root': None, 'lag_id': None}
+
+
+class PerfHistogram:
+    """Latencies of one operation over the last PERF_WINDOWS windows."""
+
+    __slots__ = ('windows',)
+
+    def __init__(self):
+        # Slot i holds [window number, bucket counts, samples, total, max] or None
+        self.windows = [None] * PERF_WINDOWS
+
+    def record(self, seconds, now):
+        number = int(now // PERF_WINDOW_S)
+        slot = number % PERF_WINDOWS
+        window = self.windows[slot]
+        if window is None or window[0] != number:
+            window = self.windows[slot] = [number, [0] * PERF_BUCKETS, 0, 0.0, 0.0]
+        bucket = int(math.log2(seconds / PERF_MIN_S) * PERF_BUCKETS_PER_OCTAVE) + 1 if seconds > PERF_MIN_S else 0
+        window[1][min(bucket, PERF_BUCKETS - 1)] += 1
+        window[2] += 1
+        window[3] += seconds
+        if seconds > window[4]:
+            window[4] = seconds
+
+    def merged(self, now):
+        """(bucket counts, samples, total, max) over the windows still in range."""
+        oldest = int(now // PERF_WINDOW_S) - PERF_WINDOWS
+        counts, samples, total, longest = [0] * PERF_BUCKETS, 0, 0.0, 0.0
+        for window in self.windows:
+            if window is not None and window[0] > oldest:
+                counts = [a + b for a, b in zip(counts, window[1])]
+                samples += window[2]
+                total += window[3]
+                longest = max(longest, window[4])
+        return counts, samples, total, longest
+
+    def summary(self, now):
+        counts, samples, total, longest = self.merged(now)
+        result = {'count': samples, 'mean_ms': total / samples * 1000 if samples else 0.0,
+                  'max_ms': longest * 1000}
+        for name, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            result[name] = min(perf_quantile(counts, samples, q), longest) * 1000
+        return result
+
+
+def perf_quantile(counts, samples, q):
+    """Quantile `q`, in seconds: the geometric middle of the bucket holding it."""
+    if not samples:
+        return 0.0
+    rank = q * samples
+    seen = 0
+    for bucket, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            break
+    return PERF_MIN_S * 2 ** ((bucket - 0.5) / PERF_BUCKETS_PER_OCTAVE) if bucket else PERF_MIN_S
+
+
+def perf_record(name, seconds, now=None):
+    histogram = PERF_HISTOGRAMS.get(name)
+    if histogram is None:
+        histogram = PERF_HISTOGRAMS[name] = PerfHistogram()
+    histogram.record(seconds, time.perf_counter() if now is None else now)
+
+
+def timed(name):
+    """Decorator recording each call's duration under `name` while PERF_ENABLED."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PERF_ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                perf_record(name, end - start, end)
+        return wrapper
+    return decorate
 
-def update_title(event=None):
-    """Module-level stub. Replaced by UI `update_title` inside `main()` at runtime."""
-    return
 
+def _perf_noop():
+    pass
 
-def new_file(text_widget):
-    # This function now only clears the text; saving prompt handled by caller
-    text_widget.delete("1.0", tk.END)
-    global CURRENT_PATH, IS_DIRTY
-    CURRENT_PATH = None
-    IS_DIRTY = False
-    if APP_ROOT:
-        update_title()
 
+def perf_stopwatch(name):
+    """Start timing an asynchronous operation; call the result when it is over."""
+    if not PERF_ENABLED:
+        return _perf_noop
+    start = time.perf_counter()
 
-def open_file(text_widget):
-    global CURRENT_PATH, IS_DIRTY
-    if not prompt_save_if_dirty(text_widget):
-        return
-    path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt")])
-    if not path:
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read()
-    text_widget.delete("1.0", tk.END)
-    text_widget.insert(tk.END, content)
-    CURRENT_PATH = path
-    IS_DIRTY = False
-    update_title()
+    def stop():
+        end = time.perf_counter()
+        perf_record(name, end - start, end)
+    return stop
 
 
-def save_file(text_widget):
-    global CURRENT_PATH, IS_DIRTY
-    # If we already have a path, save directly
-    if CURRENT_PATH:
-        path = CURRENT_PATH
-    else:
-        path = filedialog.asksaveasfilename(defaultextension=".txt",
-                                            filetypes=[("Text Files", "*.txt")])
+def set_perf_enabled(root, enabled):
+    """Turn recording on or off, with the event-loop lag probe on `root`.
+
+    The probe asks for a callback every PERF_LAG_INTERVAL_MS and records
+    how late it runs, which is how long the UI was too busy to respond.
+    """
+    global PERF_ENABLED
+    PERF_ENABLED = enabled
+    if _PERF['lag_id'] is not None:
+        try:
+            _PERF['root'].after_cancel(_PERF['lag_id'])
+        except tk.TclError:
+            pass
+        _PERF['root'] = _PERF['lag_id'] = None
+    if not enabled:
+        return
+    due = {'at': time.perf_counter() + PERF_LAG_INTERVAL_MS / 1000}
+
+    def probe():
+        now = time.perf_counter()
+        perf_record('event_loop_lag', max(0.0, now - due['at']), now)
+        due['at'] = now + PERF_LAG_INTERVAL_MS / 1000
+        _PERF['lag_id'] = root.after(PERF_LAG_INTERVAL_MS, probe)
+
+    _PERF['root'] = root
+    _PERF['lag_id'] = root.after(PERF_LAG_INTERVAL_MS, probe)
+
+
+def perf_report():
+    """Summaries and raw histograms of every operation, ready for json.dump."""
+    now = time.perf_counter()
+    operations = {}
+    for name, histogram in sorted(PERF_HISTOGRAMS.items()):
+        counts = histogram.merged(now)[0]
+        operations[name] = dict(histogram.summary(now),
+                                buckets={i: c for i, c in enumerate(counts) if c})
+    return {'exported': time.strftime('%Y-%m-%dT%H:%M:%S'), 'enabled': PERF_ENABLED,
+            'window_s': PERF_WINDOW_S * PERF_WINDOWS, 'bucket_min_s': PERF_MIN_S,
+            'buckets_per_octave': PERF_BUCKETS_PER_OCTAVE, 'operations': operations}
+
+
+def export_perf(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(perf_report(), f, indent=2)
+
+
+def show_performance_window(root):
+    """Tools > Performance: live p50/p95/p99 per operation, with JSON export."""
+    win = tk.Toplevel(root)
+    win.title('Performance')
+    win.transient(root)
+    columns = ('count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    tree = ttk.Treeview(win, columns=columns, height=14)
+    tree.heading('#0', text='Operation')
+    tree.column('#0', width=180)
+    for column, label in zip(columns, ('Calls', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)')):
+        tree.heading(column, text=label)
+        tree.column(column, width=80, anchor='e')
+    tree.pack(expand=True, fill='both', padx=6, pady=6)
+    note = tk.Label(win, anchor='w', text=f'Last {PERF_WINDOW_S * PERF_WINDOWS // 60} minutes; '
+                                           'event_loop_lag is how late the UI answered a timer.')
+    note.pack(fill='x', padx=6)
+
+    buttons = tk.Frame(win)
+    buttons.pack(fill='x', padx=6, pady=6)
+    enabled_var = tk.BooleanVar(value=PERF_ENABLED)
+    tk.Checkbutton(buttons, text='Record timings', variable=enabled_var,
+                   command=lambda: set_perf_enabled(root, enabled_var.get())).pack(side='left')
+
+    def refresh():
+        now = time.perf_counter()
+        tree.delete(*tree.get_children())
+        for name, histogram in sorted(PERF_HISTOGRAMS.items()):
+            stats = histogram.summary(now)
+            tree.insert('', 'end', text=name, values=(stats['count'],) + tuple(
+                f'{stats[column]:.2f}' for column in columns[1:]))
+        pending['id'] = win.after(PERF_REFRESH_MS, refresh)
+
+    def reset():
+        PERF_HISTOGRAMS.clear()
+        win.after_cancel(pending['id'])
+        refresh()
+
+    def export():
+        path = filedialog.asksaveasfilename(parent=win, defaultextension='.json',
+                                            filetypes=[('JSON', '*.json')], initialfile='pytext-performance.json')
         if not path:
             return
-    content = text_widget.get("1.0", tk.END)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
-    CURRENT_PATH = path
-    IS_DIRTY = False
-    update_title()
-    messagebox.showinfo("Saved", f"File saved to {path}")
+        try:
+            export_perf(path)
+        except OSError as e:
+            messagebox.showerror('Export failed', str(e), parent=win)
+
+    tk.Button(buttons, text='Export JSON...', command=export).pack(side='right')
+    tk.Button(buttons, text='Reset', command=reset).pack(side='right', padx=4)
+    pending = {'id': None}
+    win.bind('<Destroy>', lambda e: e.widget is win and win.after_cancel(pending['id']))
+    refresh()
+    return win
+
+# --------------------- End instrumentation ---------------------
+
+
+# ----------------------- File formats -----------------------
+# Files are read and written as bytes. The encoding, byte-order mark and
+# line ending are sniffed from a file's first SNIFF_BYTES; the editor's
+# text always uses '\n', and saving writes the file back the way it was
+# read. Without a BOM, UTF-8 is tried first and FALLBACK_ENCODINGS after.
+
+SNIFF_BYTES = 64 * 1024
+FALLBACK_ENCODINGS = ('cp1252', 'latin-1')  # latin-1 decodes any bytes, so it comes last
+# The UTF-32 LE mark starts with the UTF-16 LE one, so it is checked first
+_BOMS = ((codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'), (codecs.BOM_UTF8, 'utf-8'),
+         (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+NEWLINE_NAMES = {'\n': 'LF', '\r\n': 'CRLF', '\r': 'CR'}
+
+
+class TextFormat:
+    """How a text file is stored: its encoding, byte-order mark and line ending."""
+
+    __slots__ = ('encoding', 'bom', 'newline')
+
+    def __init__(self, encoding='utf-8', bom=b'', newline='\n'):
+        self.encoding = encoding
+        self.bom = bom
+        self.newline = newline
+
+    def __eq__(self, other):
+        return (isinstance(other, TextFormat)
+                and (self.encoding, self.bom, self.newline) == (other.encoding, other.bom, other.newline))
+
+    def __repr__(self):
+        return f"TextFormat({self.encoding!r}, {self.bom!r}, {self.newline!r})"
+
+    def state(self):
+        """JSON-friendly form, read back by `from_state`."""
+        return [self.encoding, self.bom.hex(), self.newline]
+
+    @classmethod
+    def from_state(cls, state):
+        encoding, bom, newline = state
+        return cls(encoding, bytes.fromhex(bom), newline)
+
+    def label(self):
+        """Status bar text such as 'UTF-8 BOM  CRLF'."""
+        return f"{self.encoding.upper()}{' BOM' if self.bom else ''}  {NEWLINE_NAMES[self.newline]}"
+
+    def byte_lines(self):
+        """True if lines can be found by scanning the raw bytes for b'\\n'."""
+        return not self.encoding.startswith(('utf-16', 'utf-32')) and self.newline != '\r'
+
+    def decoder(self):
+        """An incremental decoder that also turns every line ending into '\\n'."""
+        return io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(self.encoding)(), translate=True)
+
+    def encode(self, chunks, bom=True):
+        """Yield the bytes of text `chunks` in this format, byte-order mark first."""
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        if bom and self.bom:
+            yield self.bom
+        for chunk in chunks:
+            if self.newline != '\n':
+                chunk = chunk.replace('\n', self.newline)
+            data = encoder.encode(chunk)
+            if data:
+                yield data
+        data = encoder.encode('', final=True)
+        if data:
+            yield data
+
+
+DEFAULT_FORMAT = TextFormat()
+
+
+def guess_encoding(head):
+    """Encoding of BOM-less bytes `head`: UTF-16 if every other byte is NUL, else the
+    first of UTF-8 and FALLBACK_ENCODINGS that decodes it."""
+    if len(head) >= 4:
+        # ASCII-range UTF-16 text has a NUL in every other byte
+        even, odd = head[0::2].count(0), head[1::2].count(0)
+        if odd >= len(head) // 4 and not even:
+            return 'utf-16-le'
+        if even >= len(head) // 4 and not odd:
+            return 'utf-16-be'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head)  # a character cut off at the end is fine
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            head.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            pass
+    return FALLBACK_ENCODINGS[-1]
 
 
-def prompt_save_if_dirty(text_widget):
-    """If document is dirty, prompt user to save. Return True to continue, False to cancel."""
-    global IS_DIRTY
-    if not IS_DIRTY:
-        return True
-    resp = messagebox.askyesnocancel("Save changes?", "You have unsaved changes. Save before continuing?")
-    if resp is None:
+def sniff_format(head):
+    """The TextFormat of a file that starts with the bytes `head`."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            break
+    else:
+        bom, encoding = b'', guess_encoding(head)
+    text = codecs.getincrementaldecoder(encoding)('replace').decode(head[len(bom):])
+    crlf = text.count('\r\n')
+    lf, cr = text.count('\n') - crlf, text.count('\r') - crlf
+    newline = '\r\n' if crlf > lf and crlf >= cr else '\r' if cr > lf and cr > crlf else '\n'
+    return TextFormat(encoding, bom, newline)
+
+
+def sniff_file(path):
+    with open(path, 'rb') as f:
+        return sniff_format(f.read(SNIFF_BYTES))
+
+
+def fallback_format(fmt):
+    """The format to retry with when a file sniffed as `fmt` fails to decode later on, or None."""
+    chain = ('utf-8',) + FALLBACK_ENCODINGS
+    if fmt.bom or fmt.encoding not in chain[:-1]:
+        return None
+    return TextFormat(chain[chain.index(fmt.encoding) + 1], b'', fmt.newline)
+
+
+def read_text(path):
+    """(text, TextFormat) of the whole file at `path`, with '\\n' line endings."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    fmt = sniff_format(data[:SNIFF_BYTES])
+    while True:
+        try:
+            return fmt.decoder().decode(data[len(fmt.bom):], final=True), fmt
+        except UnicodeDecodeError:
+            fmt = fallback_format(fmt)
+            if fmt is None:
+                raise
+
+
+def offer_utf8(text_widget, error):
+    """After a save failed because the text does not fit the file's encoding, offer
+    to switch the document to UTF-8 (same line endings); True if the user agreed."""
+    doc = get_document(text_widget)
+    fmt = doc.file_format
+    if not isinstance(error, UnicodeEncodeError) or fmt.encoding.startswith('utf') or str(text_widget) in LARGE_VIEWS:
         return False
-    if resp:
-        save_file(text_widget)
+    if not messagebox.askyesno("Save", f"The document contains characters that {fmt.encoding} cannot store "
+                                       f"({error.object[error.start:error.end]!r}).\n\nSave it as UTF-8 instead?"):
+        return False
+    doc.file_format = TextFormat('utf-8', b'', fmt.newline)
     return True
 
+# --------------------- End file formats ---------------------
 
-def save_session():
-    """Save current session (file path) to recovery file."""
-    if CURRENT_PATH:
+
+# ----------------------- Document model -----------------------
+# A piece table mirrors the contents of each Text widget so features can read
+# the document without copying it out of Tcl with `get('1.0', tk.END)`.
+
+class LineIndex:
+    """Start offset of every line, for O(log n) line <-> offset conversion.
+
+    Line starts are kept in blocks of about BLOCK_LINES array('q') entries.
+    Each block stores offsets relative to a per-block `delta`, so an edit
+    rebuilds only the block it lands in and then adds its length change to
+    the deltas of the blocks after it. Blocks are replaced, never modified,
+    which lets `copy` share them.
+    """
+
+    BLOCK_LINES = 512
+
+    def __init__(self, text=''):
+        self.reset(text)
+
+    def reset(self, text=''):
+        starts = [0]
+        starts.extend(m.end() for m in re.finditer('\n', text))
+        self._blocks, self._delta, self._first, self._heads = [], [], [], []
+        self._splice(0, 0, starts, 0)
+
+    def copy(self):
+        copy = LineIndex.__new__(LineIndex)
+        copy._blocks = list(self._blocks)
+        copy._delta = list(self._delta)
+        copy._first = list(self._first)
+        copy._heads = list(self._heads)
+        return copy
+
+    def __len__(self):
+        return self._first[-1] + len(self._blocks[-1])
+
+    def start(self, line):
+        """Offset of the first character of 0-based `line`."""
+        b = bisect.bisect_right(self._first, line) - 1
+        return self._blocks[b][line - self._first[b]] + self._delta[b]
+
+    def line_of(self, offset):
+        """0-based line containing `offset`."""
+        b = bisect.bisect_right(self._heads, offset) - 1
+        return self._first[b] + bisect.bisect_right(self._blocks[b], offset - self._delta[b]) - 1
+
+    def _values(self, b):
+        delta = self._delta[b]
+        return [x + delta for x in self._blocks[b]]
+
+    def _splice(self, b, e, starts, shift):
+        """Replace blocks [b, e) with absolute line `starts`; later blocks move by `shift` characters."""
+        size = self.BLOCK_LINES
+        removed = sum(len(block) for block in self._blocks[b:e])
+        pieces = [starts[i:i + size] for i in range(0, len(starts), size)] if len(starts) > 2 * size else [starts]
+        first = self._first[b] if b < len(self._first) else 0
+        blocks, firsts = [], []
+        for piece in pieces:
+            blocks.append(array('q', [x - piece[0] for x in piece]))
+            firsts.append(first)
+            first += len(piece)
+        self._blocks[b:e] = blocks
+        self._delta[b:e] = [piece[0] for piece in pieces]
+        self._heads[b:e] = [piece[0] for piece in pieces]
+        self._first[b:e] = firsts
+        tail = b + len(pieces)
+        lines = len(starts) - removed
+        if shift:
+            self._delta[tail:] = [x + shift for x in self._delta[tail:]]
+            self._heads[tail:] = [x + shift for x in self._heads[tail:]]
+        if lines:
+            self._first[tail:] = [x + lines for x in self._first[tail:]]
+
+    def insert(self, offset, text):
+        line = self.line_of(offset)
+        b = bisect.bisect_right(self._first, line) - 1
+        local = line - self._first[b] + 1
+        values = self._values(b)
+        n = len(text)
+        new = [offset + m.end() for m in re.finditer('\n', text)]
+        self._splice(b, b + 1, values[:local] + new + [x + n for x in values[local:]], n)
+
+    def delete(self, offset, removed):
+        line = self.line_of(offset)
+        last = line + removed.count('\n')
+        b = bisect.bisect_right(self._first, line) - 1
+        e = bisect.bisect_right(self._first, last)
+        values = []
+        for i in range(b, e):
+            values.extend(self._values(i))
+        local = line - self._first[b] + 1
+        n = len(removed)
+        drop = last - line
+        self._splice(b, e, values[:local] + [x - n for x in values[local + drop:]], -n)
+
+
+class PieceTable:
+    """Piece table over an original buffer and an append-only add buffer.
+
+    Each piece is a tuple (buffer, start, length, newlines). Buffer 0 is the
+    original text; the add buffer is stored as blocks 1, 2, ... of at most
+    PIECE_MAX characters, so appending never copies more than one block and
+    snapshots can share the (immutable) strings. Listeners registered with
+    `subscribe` are called as callback(kind, offset, text) after each change,
+    with kind 'insert', 'delete' (text is what was removed) or 'reset'.
+    `version` increases with every change. `file_format` is the TextFormat
+    the text is saved in.
+    """
+
+    def __init__(self, text=''):
+        self._listeners = []
+        self.version = 0
+        self.file_format = DEFAULT_FORMAT
+        self.reset(text)
+
+    def reset(self, text=''):
+        self._buffers = [text]
+        self._pieces = []
+        for start in range(0, len(text), PIECE_MAX):
+            chunk = text[start:start + PIECE_MAX]
+            self._pieces.append((0, start, len(chunk), chunk.count('\n')))
+        self._length = len(text)
+        self._newlines = text.count('\n')
+        self._lines = LineIndex(text)
+        self._notify('reset', 0, '')
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    @timed('edit_listeners')
+    def _notify(self, kind, offset, text):
+        self.version += 1
+        for callback in list(self._listeners):
+            callback(kind, offset, text)
+
+    def __len__(self):
+        return self._length
+
+    def line_count(self):
+        return self._newlines + 1
+
+    def _buffer(self, which):
+        return self._buffers[which]
+
+    def _append(self, text):
+        """Append `text` to the add buffer and return pieces covering it."""
+        pieces = []
+        pos = 0
+        while pos < len(text):
+            last = len(self._buffers) - 1
+            if last == 0 or len(self._buffers[last]) >= PIECE_MAX:
+                self._buffers.append('')
+                last += 1
+            block = self._buffers[last]
+            chunk = text[pos:pos + PIECE_MAX - len(block)]
+            self._buffers[last] = block + chunk
+            pieces.append((last, len(block), len(chunk), chunk.count('\n')))
+            pos += len(chunk)
+        return pieces
+
+    def snapshot(self):
+        """Return a read-only copy that shares this table's buffers.
+
+        Buffers are never modified in place, so the copy can be read from
+        another thread while editing continues.
+        """
+        copy = PieceTable.__new__(PieceTable)
+        copy._listeners = []
+        copy.version = self.version
+        copy._buffers = list(self._buffers)
+        copy._pieces = list(self._pieces)
+        copy._length = self._length
+        copy._newlines = self._newlines
+        copy._lines = self._lines.copy()
+        copy.file_format = self.file_format
+        return copy
+
+    def _piece_text(self, piece, lo=0, hi=None):
+        which, start, length, _ = piece
+        hi = length if hi is None else hi
+        return self._buffer(which)[start + lo:start + hi]
+
+    def _locate(self, offset):
+        """Return (index, start offset) of the piece containing `offset`."""
+        pos = 0
+        for i, piece in enumerate(self._pieces):
+            if offset < pos + piece[2]:
+                return i, pos
+            pos += piece[2]
+        return len(self._pieces), pos
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, self._length))
+        i, pos = self._locate(offset)
+        new = self._append(text)
+        prev = self._pieces[i - 1] if offset == pos and i > 0 else None
+        if prev and prev[0] == new[0][0] and prev[1] + prev[2] == new[0][1]:
+            # Typing at the end of the previous insert just extends that piece
+            first = new.pop(0)
+            self._pieces[i - 1] = (prev[0], prev[1], prev[2] + first[2], prev[3] + first[3])
+        if new:
+            if offset > pos:
+                # Split the piece the insertion lands in
+                which, start, length, newlines = self._pieces[i]
+                cut = offset - pos
+                left_nl = self._piece_text(self._pieces[i], 0, cut).count('\n')
+                new = ([(which, start, cut, left_nl)] + new
+                       + [(which, start + cut, length - cut, newlines - left_nl)])
+                self._pieces[i:i + 1] = new
+            else:
+                self._pieces[i:i] = new
+        self._length += len(text)
+        self._newlines += text.count('\n')
+        self._lines.insert(offset, text)
+        self._notify('insert', offset, text)
+
+    def delete(self, offset, length):
+        """Delete `length` characters at `offset` and return the removed text."""
+        offset = max(0, min(offset, self._length))
+        end = min(offset + length, self._length)
+        if end <= offset:
+            return ''
+        i, pos = self._locate(offset)
+        first = i
+        kept = []
+        removed = []
+        while i < len(self._pieces) and pos < end:
+            piece = self._pieces[i]
+            which, start, plen, newlines = piece
+            lo = max(offset - pos, 0)
+            hi = min(end - pos, plen)
+            removed.append(self._piece_text(piece, lo, hi))
+            if lo > 0:
+                kept.append((which, start, lo, self._piece_text(piece, 0, lo).count('\n')))
+            if hi < plen:
+                kept.append((which, start + hi, plen - hi, self._piece_text(piece, hi).count('\n')))
+            pos += plen
+            i += 1
+        self._pieces[first:i] = kept
+        removed = ''.join(removed)
+        self._length -= len(removed)
+        self._newlines -= removed.count('\n')
+        self._lines.delete(offset, removed)
+        self._notify('delete', offset, removed)
+        return removed
+
+    def iter_chunks(self, start=0, end=None):
+        """Yield the document between `start` and `end` one piece at a time."""
+        end = self._length if end is None else min(end, self._length)
+        pos = 0
+        for piece in self._pieces:
+            plen = piece[2]
+            if pos + plen > start and pos < end:
+                yield self._piece_text(piece, max(start - pos, 0), min(end - pos, plen))
+            pos += plen
+            if pos >= end:
+                break
+
+    def slice(self, start, end=None):
+        return ''.join(self.iter_chunks(start, end))
+
+    def text(self):
+        return self.slice(0)
+
+    def line_start(self, line):
+        """Offset of the first character of 0-based `line` (clamped to the end)."""
+        if line <= 0:
+            return 0
+        if line > self._newlines:
+            return self._length
+        return self._lines.start(line)
+
+    def line_of(self, offset):
+        """0-based line number containing `offset`."""
+        return self._lines.line_of(max(0, min(offset, self._length)))
+
+    def line_col(self, offset):
+        """(0-based line, column) of `offset`."""
+        line = self.line_of(offset)
+        return line, offset - self._lines.start(line)
+
+    def offset_of(self, line, col=0):
+        """Offset of `col` in 0-based `line`, both clamped to the document."""
+        line = max(0, min(line, self._newlines))
+        start = self._lines.start(line)
+        end = self._lines.start(line + 1) - 1 if line < self._newlines else self._length
+        return min(start + max(col, 0), end)
+
+    def index(self, offset):
+        """Tk 'line.col' index of `offset`."""
+        line, col = self.line_col(offset)
+        return f"{line + 1}.{col}"
+
+    def line_text(self, line):
+        """Text of 0-based `line` without its trailing newline."""
+        start = self.line_start(line)
+        if line + 1 > self._newlines:
+            return self.slice(start)
+        return self.slice(start, self.line_start(line + 1) - 1)
+
+
+def attach_document(text_widget):
+    """Mirror `text_widget` into a PieceTable and keep it in sync.
+
+    The widget's Tcl command is renamed and replaced by a Python proxy (the
+    same trick idlelib uses), so every insert/delete/replace, whether from
+    typing, bindings, undo or our own code, is applied to the piece table too.
+    """
+    key = str(text_widget)
+    if key in DOCUMENTS:
+        return DOCUMENTS[key]
+    tcl = text_widget.tk
+    orig = key + '_pytext_orig'
+    doc = PieceTable(text_widget.get('1.0', 'end-1c'))
+
+    def locate(index):
+        """Return (offset, column) of a Tk index; the dummy line after the
+        final newline maps to len(doc) + 1."""
+        line, col = map(int, str(tcl.call(orig, 'index', index)).split('.'))
+        if line > doc.line_count():
+            return len(doc) + 1, 0
+        return doc.line_start(line - 1) + col, col
+
+    def delete_range(index1, index2=None):
+        """Emulate Tk's delete semantics, returning (start, end) offsets."""
+        start, col = locate(index1)
+        end = start + 1 if index2 is None else locate(index2)[0]
+        if start >= end:
+            return None
+        if end > len(doc):
+            # Tk keeps the final newline; a range reaching `end` that starts at
+            # a line start removes the preceding newline instead.
+            end = len(doc)
+            if col == 0 and start > 0:
+                start -= 1
+        return (start, end) if start < end else None
+
+    def dispatch(cmd, *args):
+        if (cmd not in ('insert', 'delete', 'replace') or key in MIRROR_SUSPENDED
+                or str(tcl.call(orig, 'cget', '-state')) == 'disabled'):
+            return tcl.call((orig, cmd) + args)
+        if cmd == 'insert' and len(args) >= 2:
+            offset = min(locate(args[0])[0], len(doc))
+            result = tcl.call((orig, cmd) + args)
+            doc.insert(offset, ''.join(args[1::2]))
+            return result
+        if cmd == 'delete' and args:
+            pairs = [args[i:i + 2] for i in range(0, len(args), 2)]
+            ranges = sorted(r for r in (delete_range(*p) for p in pairs) if r)
+            result = tcl.call((orig, cmd) + args)
+            merged = []
+            for start, end in ranges:
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+                else:
+                    merged.append((start, end))
+            for start, end in reversed(merged):
+                doc.delete(start, end - start)
+            return result
+        # `replace` (and malformed calls) are rare: apply, then resync fully
+        result = tcl.call((orig, cmd) + args)
+        doc.reset(str(tcl.call(orig, 'get', '1.0', 'end-1c')))
+        return result
+
+    def detach(event=None):
+        if event is not None and str(event.widget) != key:
+            return
+        DOCUMENTS.pop(key, None)
         try:
-            with open(SESSION_FILE, 'w') as f:
-                json.dump({'last_file': CURRENT_PATH}, f)
-        except Exception:
+            tcl.deletecommand(key)
+        except tk.TclError:
             pass
 
+    tcl.call('rename', key, orig)
+    tcl.createcommand(key, dispatch)
+    text_widget.bind('<Destroy>', detach, add='+')
+    DOCUMENTS[key] = doc
+    return doc
 
-def load_session():
-    """Load last session (file path) if available."""
-    if SESSION_FILE.exists():
+
+def get_document(text_widget):
+    """Return the PieceTable mirroring `text_widget`."""
+    return DOCUMENTS.get(str(text_widget)) or attach_document(text_widget)
+
+
+# Permission bits for newly created files (mkstemp would otherwise give 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_document(path, doc, fmt=None):
+    """Atomically write `doc` to `path` piece by piece.
+
+    The text is encoded chunk by chunk in `fmt` (by default the document's
+    own `file_format`, else UTF-8); a document with `iter_bytes` supplies
+    its bytes itself. They go to a temp file in the same directory, which is
+    fsynced and then moved over `path` with os.replace, so a crash
+    mid-write never leaves a truncated file behind.
+    """
+    path = os.path.abspath(path)
+    fmt = fmt or getattr(doc, 'file_format', None) or DEFAULT_FORMAT
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.',
+                               suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.writelines(doc.iter_bytes(fmt) if hasattr(doc, 'iter_bytes') else fmt.encode(doc.iter_chunks()))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        else:
+            os.chmod(tmp, 0o666 & ~_UMASK)
+        os.replace(tmp, path)
+    except BaseException:
         try:
-            with open(SESSION_FILE, 'r') as f:
-                data = json.load(f)
-                return data.get('last_file')
-        except Exception:
+            os.unlink(tmp)
+        except OSError:
             pass
-    return None
+        raise
 
 
-def clear_session():
-    """Clear saved session."""
-    if SESSION_FILE.exists():
+class SaveWorker:
+    """Writes document snapshots on a background thread.
+
+    Saves to the same path coalesce: if a newer snapshot arrives before the
+    older one was written, only the newest is written and every caller's
+    callback runs once it is on disk. Callbacks are called as
+    callback(path, error) on the Tk thread via `root.after`.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._busy = 0
+        self._results = queue.Queue()
+        self._thread = None
+
+    def submit(self, root, path, doc, callback=None, fmt=None):
+        snapshot = doc.snapshot()
+        with self._cond:
+            _, _, callbacks = self._pending.get(path, (None, None, []))
+            if path not in self._pending:
+                self._busy += 1
+            self._pending[path] = (snapshot, fmt, callbacks + ([callback] if callback else []))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pytext-save', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        root.after(self.POLL_MS, lambda: self._poll(root))
+        return snapshot.version
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path = next(iter(self._pending))
+                snapshot, fmt, callbacks = self._pending.pop(path)
+            try:
+                write_document(path, snapshot, fmt)
+                error = None
+            except Exception as e:
+                error = e
+            self._results.put((path, callbacks, error))
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+    def _poll(self, root):
+        while True:
+            try:
+                path, callbacks, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            for callback in callbacks:
+                callback(path, error)
+        with self._cond:
+            busy = self._busy
+        if busy or not self._results.empty():
+            try:
+                root.after(self.POLL_MS, lambda: self._poll(root))
+            except tk.TclError:
+                pass
+
+    def wait(self, timeout=None):
+        """Block until every submitted save has been written."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._busy == 0, timeout)
+
+
+SAVER = SaveWorker()
+
+
+# ----------------------- Crash-recovery journal -----------------------
+# Autosave appends each edit to a per-document journal instead of rewriting
+# the whole file. Files in RECOVERY_DIR, for journal `key` and generation g:
+#   key.json     - metadata (document path, owning pid)
+#   key.g.ckpt   - full-text checkpoint written by compaction
+#   key.g.ref    - checkpoint that is a saved file, identified by size/mtime
+#   key.g.jnl    - JSON-lines edit records made after generation g started
+# Recovery loads the newest complete checkpoint and replays every journal
+# from that generation on.
+
+RECOVERY_DIR = Path.home() / '.pytext_recovery'
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+JOURNALS = {}
+
+
+class EditJournal:
+    """Append-only edit journal for the document in one text widget."""
+
+    def __init__(self, root, text_widget):
+        self.root = root
+        self.widget_key = str(text_widget)
+        self.doc = get_document(text_widget)
+        self.key = uuid.uuid4().hex
+        self.path = None
+        self.gen = 0
+        self._records = []
+        self._journal_bytes = 0
+        self.discarded = False
+        RECOVERY_DIR.mkdir(exist_ok=True)
+        self.doc.subscribe(self._on_change)
+        JOURNALS[self.widget_key] = self
+        self.rebase(None)
+
+    def _file(self, gen, ext):
+        return RECOVERY_DIR / f"{self.key}.{gen}.{ext}"
+
+    def _on_change(self, kind, offset, text):
+        if self.widget_key in LOAD_JOBS:
+            return  # a file is streaming in; rebase() runs when it is done
+        if self.widget_key in LARGE_VIEWS:
+            return  # the widget only holds a window of a huge file
+        if kind == 'insert':
+            self._records.append(['i', offset, text])
+        elif kind == 'delete':
+            self._records.append(['d', offset, len(text)])
+        else:
+            self.checkpoint(flush=False)
+
+    def _write_meta(self):
+        if self.discarded:
+            return
+        with open(RECOVERY_DIR / f"{self.key}.json", 'w', encoding='utf-8') as f:
+            json.dump({'path': self.path, 'pid': os.getpid(), 'updated': time.time(),
+                       'format': self.doc.file_format.state()}, f)
+
+    def flush(self):
+        """Append buffered edit records to the journal; compact when it grows large."""
+        if not self._records or self.widget_key in LOAD_JOBS:
+            return
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in self._records)
+        self._records = []
+        with open(self._file(self.gen, 'jnl'), 'a', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_bytes += len(data)
+        if self._journal_bytes > max(JOURNAL_COMPACT_BYTES, len(self.doc) // 2):
+            self.checkpoint()
+
+    def begin(self, flush=True):
+        """Start a new generation at the current document state and return it.
+
+        Pending records are written to the old generation first unless
+        `flush` is False (the new base already includes them).
+        """
+        if flush:
+            self.flush()
+        self.gen += 1
+        self._records = []
+        self._journal_bytes = 0
+        self._file(self.gen, 'jnl').touch()
+        return self.gen
+
+    def checkpoint(self, flush=True):
+        """Compact: write the whole document as the base of a new generation."""
+        gen = self.begin(flush)
+
+        def written(path, error):
+            if not error:
+                self._drop_before(gen)
+
+        # Checkpoints are always UTF-8 with '\n', whatever the document's file format
+        SAVER.submit(self.root, str(self._file(gen, 'ckpt')), self.doc, written, DEFAULT_FORMAT)
+
+    def commit_file(self, gen, path):
+        """Record that generation `gen` starts from the file saved at `path`.
+
+        A save finishing after the document was closed writes nothing, so it
+        cannot leave recovery files behind.
+        """
+        if self.discarded:
+            return
+        st = os.stat(path)
+        with open(self._file(gen, 'ref'), 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'size': st.st_size, 'mtime': st.st_mtime_ns}, f)
+        self.path = path
+        self._write_meta()
+        self._drop_before(gen)
+
+    def rebase(self, path):
+        """Restart the journal from the file at `path` (None for an empty document)."""
+        gen = self.begin()
+        if path:
+            self.commit_file(gen, path)
+        else:
+            self._file(gen, 'ckpt').touch()
+            self.path = None
+            self._write_meta()
+            self._drop_before(gen)
+
+    def _drop_before(self, gen):
+        for p in RECOVERY_DIR.glob(f"{self.key}.*.*"):
+            if int(p.name.split('.')[1]) < gen:
+                p.unlink(missing_ok=True)
+
+    def discard(self):
+        """Remove every recovery file for this document (clean close)."""
+        self.discarded = True
+        self.doc.unsubscribe(self._on_change)
+        JOURNALS.pop(self.widget_key, None)
+        for p in RECOVERY_DIR.glob(f"{self.key}.*"):
+            p.unlink(missing_ok=True)
+
+
+def find_recoverable_documents():
+    """Return [(key, meta)] for journals whose editor process is gone, newest first."""
+    found = []
+    if not RECOVERY_DIR.exists():
+        return found
+    for meta_path in RECOVERY_DIR.glob('*.json'):
         try:
-            SESSION_FILE.unlink()
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
         except Exception:
+            continue
+        pid = meta.get('pid')
+        if pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+            continue  # another editor still owns this journal
+        except (OSError, TypeError, OverflowError):
             pass
+        found.append((meta_path.stem, meta))
+    found.sort(key=lambda item: item[1].get('updated', 0), reverse=True)
+    return found
+
+
+def recover_document(key):
+    """Rebuild a document from its newest usable checkpoint and the journals after it."""
+    gens = {}
+    for p in RECOVERY_DIR.glob(f"{key}.*.*"):
+        _, gen, ext = p.name.split('.')
+        gens.setdefault(int(gen), {})[ext] = p
+    doc = None
+    for gen in sorted(gens, reverse=True):
+        files = gens[gen]
+        if 'ckpt' in files:
+            with open(files['ckpt'], 'r', encoding='utf-8') as f:
+                doc = PieceTable(f.read())
+            try:
+                with open(RECOVERY_DIR / f"{key}.json", 'r', encoding='utf-8') as f:
+                    doc.file_format = TextFormat.from_state(json.load(f)['format'])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass  # journals from older versions are UTF-8
+        elif 'ref' in files:
+            with open(files['ref'], 'r', encoding='utf-8') as f:
+                ref = json.load(f)
+            try:
+                st = os.stat(ref['path'])
+            except OSError:
+                continue
+            if (st.st_size, st.st_mtime_ns) != (ref['size'], ref['mtime']):
+                continue
+            if is_rich_path(ref['path']):
+                doc = PieceTable(read_rich_file(ref['path'])['text'])
+            else:
+                text, fmt = read_text(ref['path'])
+                doc = PieceTable(text)
+                doc.file_format = fmt
+        if doc is not None:
+            base = gen
+            break
+    if doc is None:
+        return None
+    for gen in sorted(g for g in gens if g >= base):
+        if 'jnl' not in gens[gen]:
+            continue
+        with open(gens[gen]['jnl'], 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    kind, offset, arg = json.loads(line)
+                except ValueError:
+                    break  # torn final record from a crash mid-append
+                if kind == 'i':
+                    doc.insert(offset, arg)
+                else:
+                    doc.delete(offset, arg)
+    return doc
 
 
-def show_splash_screen():
-    """Show a 5-second splash screen with the logo."""
-    splash = tk.Tk()
-    splash.title("PyText editor")
-    splash.geometry("500x500")
-    splash.resizable(False, False)
-    
-    # Set white background
-    splash.config(bg='white')
-    
-    # Center the splash screen
-    splash.update_idletasks()
-    x = (splash.winfo_screenwidth() // 2) - (splash.winfo_width() // 2)
-    y = (splash.winfo_screenheight() // 2) - (splash.winfo_height() // 2)
-    splash.geometry(f"500x500+{x}+{y}")
-    
-    # Load and display logo
-    logo_photo = None
+def discard_recovery(key):
+    for p in RECOVERY_DIR.glob(f"{key}.*"):
+        p.unlink(missing_ok=True)
+
+
+def offer_recovery(root, on_recovered):
+    """Offer to restore documents left behind by a crash.
+
+    Declined documents are discarded; each accepted one is handed to
+    `on_recovered(path, doc)` with its rebuilt PieceTable.
+    """
+    for key, meta in find_recoverable_documents():
+        name = os.path.basename(meta.get('path') or '') or 'Untitled'
+        ok = messagebox.askyesno("Recover unsaved changes?",
+                                 f"PyText found unsaved changes to {name} from a session that did not close cleanly.\n\nRecover them?",
+                                 parent=root)
+        if not ok:
+            discard_recovery(key)
+            continue
+        try:
+            doc = recover_document(key)
+        except Exception as e:
+            messagebox.showerror("Recovery failed", f"Could not recover {name}:\n{e}", parent=root)
+            continue
+        if doc is None:
+            messagebox.showerror("Recovery failed", f"No usable checkpoint was found for {name}.", parent=root)
+            discard_recovery(key)
+            continue
+        on_recovered(meta.get('path'), doc)
+        discard_recovery(key)
+
+
+def restore_recovered(text_widget, doc):
+    """Put a recovered document into `text_widget` and checkpoint its journal."""
+    text_widget.delete('1.0', tk.END)
+    text_widget.insert('1.0', doc.text())
+    get_document(text_widget).file_format = doc.file_format
+    reset_undo(text_widget)
+    journal = JOURNALS.get(str(text_widget))
+    if journal:
+        journal.checkpoint(flush=False)
+
+
+AUTOSAVE_INTERVAL_MS = 15000
+_AUTOSAVE = {'root': None}
+
+
+def start_autosave(root, interval=AUTOSAVE_INTERVAL_MS):
+    """Flush every open journal each `interval` ms from a single `after` loop.
+
+    Calling it again for the same root is a no-op, however many editor
+    windows and documents are open.
+    """
+    if _AUTOSAVE['root'] is root:
+        return
+    _AUTOSAVE['root'] = root
+
+    @timed('autosave')
+    def tick():
+        for journal in list(JOURNALS.values()):
+            try:
+                journal.flush()
+            except Exception:
+                pass
+        root.after(interval, tick)
+
+    root.after(interval, tick)
+
+# --------------------- End crash-recovery journal ---------------------
+
+
+# ----------------------- Search engine -----------------------
+
+# Lines above and below the viewport that also get match highlights
+HIGHLIGHT_MARGIN_LINES = 100
+# Ranges passed to a single `tag_add` call
+TAG_BATCH = 500
+SCROLL_LISTENERS = {}
+
+
+def compile_search(pattern, regex=False, whole_word=False, match_case=False):
+    """Compile the find options into one regular expression (raises re.error)."""
+    pat = pattern if regex else re.escape(pattern)
+    if whole_word:
+        pat = r'\b(?:' + pat + r')\b'
+    return re.compile(pat, re.MULTILINE | (0 if match_case else re.IGNORECASE))
+
+
+def find_all(doc, pattern, regex=False, whole_word=False, match_case=False):
+    """Return (starts, ends) offset lists for every match, in one pass over `doc`."""
+    rx = compile_search(pattern, regex, whole_word, match_case)
+    starts, ends = [], []
+    for m in rx.finditer(doc.text()):
+        if m.end() > m.start():
+            starts.append(m.start())
+            ends.append(m.end())
+    return starts, ends
+
+
+def offsets_to_indices(doc, offsets):
+    """Convert character offsets to Tk 'line.col' indices through the line index."""
+    index = doc.index
+    return [index(off) for off in offsets]
+
+
+def visible_offset_range(text_widget, doc, margin_lines=0):
+    """Offsets spanning the lines on screen, widened by `margin_lines` each way."""
+    top = int(text_widget.index('@0,0').split('.')[0]) - 1
+    bottom = int(text_widget.index(f'@0,{text_widget.winfo_height()}').split('.')[0])
+    start = doc.line_start(max(top - margin_lines, 0))
+    end = doc.line_start(bottom + margin_lines)
+    if bottom + margin_lines >= doc.line_count():
+        end = len(doc)
+    return start, end
+
+
+def add_tag_ranges(text_widget, tag, indices):
+    """Add `tag` over consecutive (start, end) index pairs, TAG_BATCH pairs per call."""
+    step = TAG_BATCH * 2
+    for i in range(0, len(indices), step):
+        text_widget.tag_add(tag, *indices[i:i + step])
+
+
+def highlight_visible_matches(text_widget, doc, starts, ends, tag='search'):
+    """Tag only the matches in and around the viewport."""
+    text_widget.tag_remove(tag, '1.0', tk.END)
+    lo, hi = visible_offset_range(text_widget, doc, HIGHLIGHT_MARGIN_LINES)
+    first = bisect.bisect_left(ends, lo + 1)
+    last = bisect.bisect_left(starts, hi)
+    offsets = []
+    for i in range(first, last):
+        offsets.append(starts[i])
+        offsets.append(ends[i])
+    add_tag_ranges(text_widget, tag, offsets_to_indices(doc, offsets))
+
+
+def add_scroll_listener(text_widget, callback):
+    """Call `callback()` whenever `text_widget` scrolls; returns a remover."""
+    listeners = _scroll_entry(text_widget)['listeners']
+    listeners.append(callback)
+    return lambda: callback in listeners and listeners.remove(callback)
+
+
+def set_scroll_target(text_widget, setter=None):
+    """Send `text_widget`'s scroll fractions to `setter(first, last)` instead
+    of its original yscrollcommand; None restores the original."""
+    _scroll_entry(text_widget)['target'] = setter
+
+
+def _scroll_entry(text_widget):
+    key = str(text_widget)
+    entry = SCROLL_LISTENERS.get(key)
+    if entry is None:
+        entry = SCROLL_LISTENERS[key] = {'listeners': [], 'target': None}
+        previous = str(text_widget.cget('yscrollcommand'))
+
+        def on_scroll(first, last):
+            if entry['target'] is not None:
+                entry['target'](first, last)
+            elif previous:
+                text_widget.tk.eval(f'{previous} {first} {last}')
+            for listener in list(entry['listeners']):
+                listener()
+
+        text_widget.configure(yscrollcommand=on_scroll)
+        text_widget.bind('<Destroy>', lambda e: str(e.widget) == key and SCROLL_LISTENERS.pop(key, None), add='+')
+    return entry
+
+
+# Above this many matches, Replace All edits the widget without mirroring
+# each edit and resyncs the piece table once at the end
+REPLACE_INCREMENTAL_MAX = 2000
+
+
+def replace_all(text_widget, pattern, replacement, regex=False, whole_word=False, match_case=False):
+    """Replace every match in `text_widget` and return the number replaced.
+
+    Matches are found in one scan and applied by apply_edits as a single
+    undo step holding just the replaced text. Text outside the matches, and
+    its tags, is left alone.
+    """
+    doc = get_document(text_widget)
+    rx = compile_search(pattern, regex, whole_word, match_case)
+    content = doc.text()
+    edits = [(m.start(), m.end(), m.expand(replacement) if regex else replacement)
+             for m in rx.finditer(content) if m.end() > m.start()]
+    apply_edits(text_widget, edits, content)
+    return len(edits)
+
+# --------------------- End search engine ---------------------
+
+
+class WordCounter:
+    """Word/character/line counts for a PieceTable, updated per edit.
+
+    Words never span lines, so the total is kept as a sum of per-line counts
+    and each edit only re-splits the lines it touched.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.rebuild()
+        doc.subscribe(self._on_change)
+
+    def rebuild(self):
+        self._line_words = [len(line.split()) for line in self.doc.text().split('\n')]
+        self.words = sum(self._line_words)
+
+    def _count_lines(self, first, count):
+        """Fresh word counts for `count` lines starting at `first`."""
+        start = self.doc.line_start(first)
+        if first + count < self.doc.line_count():
+            end = self.doc.line_start(first + count) - 1
+        else:
+            end = len(self.doc)
+        return [len(line.split()) for line in self.doc.slice(start, end).split('\n')]
+
+    def _on_change(self, kind, offset, text):
+        if kind == 'reset':
+            self.rebuild()
+            return
+        line = self.doc.line_of(offset)
+        newlines = text.count('\n')
+        if kind == 'insert':
+            old = self._line_words[line:line + 1]
+            new = self._count_lines(line, newlines + 1)
+        else:
+            old = self._line_words[line:line + newlines + 1]
+            new = self._count_lines(line, 1)
+        self._line_words[line:line + len(old)] = new
+        self.words += sum(new) - sum(old)
+
+    def summary(self):
+        return f"Words: {self.words}   Characters: {len(self.doc)}   Lines: {self.doc.line_count()}"
+
+
+WORD_COUNTERS = {}
+
+
+def get_word_counter(text_widget):
+    """Return the live WordCounter for `text_widget`."""
+    key = str(text_widget)
+    if key not in WORD_COUNTERS:
+        WORD_COUNTERS[key] = WordCounter(get_document(text_widget))
+        text_widget.bind('<Destroy>', lambda e: str(e.widget) == key and WORD_COUNTERS.pop(key, None), add='+')
+    return WORD_COUNTERS[key]
+
+
+# Minimum time between repaints of the window title and the status bar
+TITLE_INTERVAL_MS = 250
+STATUS_INTERVAL_MS = 100
+
+
+def subscribe_batched(widget, doc, callback, interval_ms=0):
+    """Deliver `doc`'s changes to `callback(changes)` once per idle cycle.
+
+    `changes` is the list of (kind, offset, text) since the previous call,
+    exactly as the piece table reported them. With `interval_ms`, batches
+    are at least that far apart. Returns an unsubscribe function.
+    """
+    state = {'changes': [], 'id': None}
+
+    def flush():
+        state['id'] = None
+        changes, state['changes'] = state['changes'], []
+        callback(changes)
+
+    def on_change(kind, offset, text):
+        state['changes'].append((kind, offset, text))
+        if state['id'] is None:
+            state['id'] = widget.after(interval_ms, flush) if interval_ms else widget.after_idle(flush)
+
+    def unsubscribe():
+        doc.unsubscribe(on_change)
+        if state['id'] is not None:
+            widget.after_cancel(state['id'])
+            state['id'] = None
+
+    doc.subscribe(on_change)
+    return unsubscribe
+
+
+def throttled(widget, func, interval_ms):
+    """Return a trigger that runs `func()` at most once per `interval_ms`.
+
+    A trigger after a quiet period runs on the next idle; triggers inside
+    the interval collapse into one run at its end. `trigger.cancel()`
+    drops a pending run.
+    """
+    state = {'id': None, 'last': 0.0}
+
+    def run():
+        state['id'] = None
+        state['last'] = time.monotonic()
+        func()
+
+    def trigger(*args):
+        if state['id'] is not None:
+            return
+        wait = int(interval_ms - (time.monotonic() - state['last']) * 1000)
+        state['id'] = widget.after(wait, run) if wait > 0 else widget.after_idle(run)
+
+    def cancel():
+        if state['id'] is not None:
+            widget.after_cancel(state['id'])
+            state['id'] = None
+
+    trigger.cancel = cancel
+    return trigger
+
+
+def on_user_edit(text_widget, callback):
+    """Call `callback()` after each edit of `text_widget`'s document that is
+    not part of loading a file; replaces polling the Tk modified flag."""
+    key = str(text_widget)
+
+    def on_change(kind, offset, text):
+        if key not in LOAD_JOBS:
+            callback()
+
+    get_document(text_widget).subscribe(on_change)
+
+
+def create_status_bar(parent, text_widget):
+    """Return a label showing live word/character/line counts and the file format of `text_widget`."""
+    counter = get_word_counter(text_widget)
+    label = tk.Label(parent, anchor='w', relief='sunken', bd=1)
+
+    def refresh():
+        view = LARGE_VIEWS.get(str(text_widget))
+        fmt = view.file_format if view else counter.doc.file_format
+        label.config(text=f"{view.summary(counter) if view else counter.summary()}  |  {fmt.label()}")
+
+    # A burst of edits repaints the label at most once per STATUS_INTERVAL_MS
+    repaint = throttled(label, refresh, STATUS_INTERVAL_MS)
+    unsubscribe = subscribe_batched(label, counter.doc, repaint)
+
+    def on_destroy(event=None):
+        unsubscribe()
+        repaint.cancel()
+
+    text_widget.bind('<<LargeFileProgress>>', repaint, add='+')
+    label.bind('<Destroy>', on_destroy)
+    refresh()
+    return label
+
+
+# ----------------------- Undo history -----------------------
+# Undo is kept in Python instead of by Tk (the widgets run with undo off).
+# A step is a list of compact (offset, removed, inserted) records taken from
+# the piece table's change stream, so undoing a Replace All costs the
+# replaced text rather than two copies of the document.
+
+UNDO_MEMORY_BUDGET = 32 * 1024 * 1024
+UNDO_RECORD_OVERHEAD = 80  # rough bytes per record besides its text
+UNDO_MERGE_S = 1.0
+# Save each document's history next to its session snapshot so undo survives a restart
+UNDO_PERSIST = True
+UNDO_HISTORIES = {}
+
+
+def _record_size(record):
+    return len(record[1]) + len(record[2]) + UNDO_RECORD_OVERHEAD
+
+
+def _parallel(step):
+    """True if `step` edits disjoint ranges back to front, like apply_edits does."""
+    for prev, record in zip(step, step[1:]):
+        if record[0] + len(record[1]) > prev[0]:
+            return False
+    return True
+
+
+class UndoHistory:
+    """Undo and redo stacks of edit records for one Text widget.
+
+    Records made in the same event-loop turn (typing over a selection, a
+    paste) form one step, and typing or deleting single characters at the
+    same spot within UNDO_MERGE_S extends the previous step up to a word
+    boundary. Loading a file is not recorded. Once the records take more
+    than `budget` bytes the oldest steps are dropped.
+    """
+
+    def __init__(self, text_widget, budget=UNDO_MEMORY_BUDGET):
+        self.text = text_widget
+        self.key = str(text_widget)
+        self.doc = get_document(text_widget)
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+        self.paused = False
+        self._open = False  # the newest step still takes records
+        self._depth = 0
+        self._idle_id = None
+        self._merge = False
+        self._last = 0.0
+        self.doc.subscribe(self._on_change)
+
+    def _on_change(self, kind, offset, text):
+        if self.paused or self.key in LOAD_JOBS:
+            return
+        if kind == 'reset':
+            self.clear()  # a wholesale replacement leaves nothing to diff against
+            return
+        self.add([(offset, '', text) if kind == 'insert' else (offset, text, '')])
+
+    def add(self, records):
+        """Record edits made by the caller (already applied to the document)."""
+        self._drop_redo()
+        now = time.monotonic()
+        if self._open:
+            self.undo_stack[-1].extend(records)
+        elif not (len(records) == 1 and self._continue_typing(records[0], now)):
+            self.undo_stack.append(list(records))
+        self.size += sum(_record_size(r) for r in records)
+        self._last = now
+        self._merge = True
+        self._open = True
+        if self._idle_id is None and not self._depth:
+            self._idle_id = self.text.after_idle(self._close)
+        self._trim()
+
+    def _continue_typing(self, record, now):
+        """Merge a one-character insert or delete into the previous step if it carries on from it."""
+        if not self._merge or now - self._last > UNDO_MERGE_S or not self.undo_stack:
+            return False
+        step = self.undo_stack[-1]
+        if len(step) != 1:
+            return False
+        offset, removed, inserted = record
+        last_offset, last_removed, last_inserted = step[0]
+        if len(inserted) == 1 and inserted != '\n' and not removed and last_inserted and not last_removed:
+            if offset != last_offset + len(last_inserted):
+                return False
+            if inserted.isspace() and not last_inserted[-1].isspace():
+                return False  # a space after a word starts a new step
+            step[0] = (last_offset, '', last_inserted + inserted)
+        elif len(removed) == 1 and removed != '\n' and not inserted and last_removed and not last_inserted:
+            if offset + 1 == last_offset:  # Backspace
+                step[0] = (offset, removed + last_removed, '')
+            elif offset == last_offset:  # Delete
+                step[0] = (offset, last_removed + removed, '')
+            else:
+                return False
+        else:
+            return False
+        self.size -= UNDO_RECORD_OVERHEAD  # the merged record's text is counted by the caller
+        return True
+
+    def _close(self):
+        self._idle_id = None
+        if not self._depth:
+            self._open = False
+
+    def begin_group(self):
+        """Collect every edit until the matching end_group into one step."""
+        if self._depth == 0:
+            self.undo_stack.append([])
+            self._open = True
+        self._depth += 1
+
+    def end_group(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._open = False
+            self._merge = False
+            if self.undo_stack and not self.undo_stack[-1]:
+                self.undo_stack.pop()
+
+    def _drop_redo(self):
+        for step in self.redo_stack:
+            self.size -= sum(_record_size(r) for r in step)
+        self.redo_stack.clear()
+
+    def _trim(self):
+        while self.size > self.budget and len(self.undo_stack) > 1:
+            self.size -= sum(_record_size(r) for r in self.undo_stack.popleft())
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+        self._open = self._merge = False
+
+    def undo(self):
+        return self._move(self.undo_stack, self.redo_stack, True)
+
+    def redo(self):
+        return self._move(self.redo_stack, self.undo_stack, False)
+
+    def _move(self, source, target, undo):
+        if self._idle_id is not None:
+            self.text.after_cancel(self._idle_id)
+            self._close()
+        if not source or self._depth:
+            self.text.bell()
+            return False
+        step = source.pop()
+        self._apply(step, undo)
+        target.append(step)
+        self._merge = False
+        offset, removed, inserted = step[0] if undo else step[-1]
+        self.text.tag_remove('sel', '1.0', tk.END)
+        self.text.mark_set('insert', self.doc.index(offset + len(removed if undo else inserted)))
+        self.text.see('insert')
+        return True
+
+    def _apply(self, step, undo):
+        self.paused = True
+        try:
+            if len(step) > 1 and _parallel(step):
+                edits, shift = [], 0
+                for offset, removed, inserted in reversed(step):
+                    if undo:
+                        start = offset + shift
+                        edits.append((start, start + len(inserted), removed))
+                        shift += len(inserted) - len(removed)
+                    else:
+                        edits.append((offset, offset + len(removed), inserted))
+                apply_edits(self.text, edits)
+                return
+            for offset, removed, inserted in (reversed(step) if undo else step):
+                old, new = (inserted, removed) if undo else (removed, inserted)
+                start = self.doc.index(offset)
+                if old:
+                    self.text.delete(start, self.doc.index(offset + len(old)))
+                if new:
+                    self.text.insert(start, new)
+        finally:
+            self.paused = False
+
+    def dump(self):
+        return {'undo': [list(map(list, step)) for step in self.undo_stack],
+                'redo': [list(map(list, step)) for step in self.redo_stack]}
+
+    def load(self, data):
+        self.clear()
+        self.undo_stack.extend([tuple(r) for r in step] for step in data.get('undo', []))
+        self.redo_stack.extend([tuple(r) for r in step] for step in data.get('redo', []))
+        self.size = sum(_record_size(r) for stack in (self.undo_stack, self.redo_stack) for step in stack for r in step)
+        self._trim()
+
+
+def attach_undo(text_widget):
+    """Give `text_widget` an UndoHistory and route <<Undo>>/<<Redo>> (Ctrl+Z/Ctrl+Y) to it."""
+    key = str(text_widget)
+    history = UNDO_HISTORIES[key] = UndoHistory(text_widget)
+
+    def on_undo(event):
+        history.undo()
+        return 'break'
+
+    def on_redo(event):
+        history.redo()
+        return 'break'
+
+    text_widget.bind('<<Undo>>', on_undo)
+    text_widget.bind('<<Redo>>', on_redo)
+    text_widget.bind('<Control-y>', on_redo)
+    text_widget.bind('<Destroy>', lambda e: str(e.widget) == key and UNDO_HISTORIES.pop(key, None), add='+')
+    return history
+
+
+def undo(text_widget, redo=False):
+    history = UNDO_HISTORIES.get(str(text_widget))
+    if history is not None:
+        history.redo() if redo else history.undo()
+
+
+def reset_undo(text_widget):
+    """Forget the undo history after the widget was loaded with a new document."""
+    text_widget.edit_reset()
+    history = UNDO_HISTORIES.get(str(text_widget))
+    if history is not None:
+        history.clear()
+
+
+def apply_edits(text_widget, edits, content=None):
+    """Apply disjoint (start, end, replacement) edits, given in ascending order, as one undo step.
+
+    `content` is the document's text, if the caller already has it. Edits
+    go in back to front so earlier offsets stay valid. Above
+    REPLACE_INCREMENTAL_MAX edits the widget is edited without mirroring
+    each edit and the piece table is rebuilt once at the end. The undo
+    history gets one (start, removed, replacement) record per edit.
+    """
+    if not edits:
+        return
+    key = str(text_widget)
+    doc = get_document(text_widget)
+    history = UNDO_HISTORIES.get(key)
+    recording = history is not None and not history.paused
+    content = doc.text() if content is None else content
+    indices = offsets_to_indices(doc, [off for start, end, _ in edits for off in (start, end)])
+    bulk = len(edits) > REPLACE_INCREMENTAL_MAX
+    if history is not None:
+        history.paused = True
+    if bulk:
+        MIRROR_SUSPENDED.add(key)
     try:
-        # Get the directory where the script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        logo_path = os.path.join(script_dir, 'logo.png')
-        
-        print(f"Looking for logo at: {logo_path}")
-        print(f"Logo exists: {os.path.exists(logo_path)}")
-        
-        if os.path.exists(logo_path):
-            from PIL import Image, ImageTk
-            logo_img = Image.open(logo_path)
-            print(f"Logo image size: {logo_img.size}")
-            logo_img = logo_img.resize((200, 200), Image.Resampling.LANCZOS)
-            logo_photo = ImageTk.PhotoImage(logo_img)
-            logo_label = tk.Label(splash, image=logo_photo, bg='white')
-            logo_label.image = logo_photo  # Keep reference
-            logo_label.pack(pady=30, padx=20)
-            print("Logo packed successfully")
-    except Exception as e:
-        print(f"Error loading logo: {e}")
-        import traceback
-        traceback.print_exc()
-    
-    # Add text
-    title_label = tk.Label(splash, text="PyText editor", font=("Arial", 20, "bold"), bg='white')
-    title_label.pack(pady=10)
-    
-    subtitle_label = tk.Label(splash, text="A simple Python text editor", font=("Arial", 12), bg='white')
-    subtitle_label.pack(pady=5)
-    
-    # Close splash after 5 seconds
-    splash.after(5000, splash.destroy)
-    splash.mainloop()
+        for i in range(len(edits) - 1, -1, -1):
+            if edits[i][1] > edits[i][0]:
+                text_widget.delete(indices[2 * i], indices[2 * i + 1])
+            if edits[i][2]:
+                text_widget.insert(indices[2 * i], edits[i][2])
+    finally:
+        if bulk:
+            MIRROR_SUSPENDED.discard(key)
+            parts = []
+            prev = 0
+            for start, end, new in edits:
+                parts.append(content[prev:start])
+                parts.append(new)
+                prev = end
+            parts.append(content[prev:])
+            doc.reset(''.join(parts))
+        if recording:
+            history.paused = False
+            history.begin_group()
+            history.add([(start, content[start:end], new) for start, end, new in reversed(edits)])
+            history.end_group()
+
+
+def save_undo_history(digest, text_widget):
+    """Cache the undo history of the content with hash `digest` (see UNDO_PERSIST)."""
+    history = UNDO_HISTORIES.get(str(text_widget))
+    if not (UNDO_PERSIST and digest and history is not None and (history.undo_stack or history.redo_stack)):
+        return
+    try:
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        with open(SNAPSHOT_DIR / f"{digest}.undo.json", 'w', encoding='utf-8') as f:
+            json.dump(history.dump(), f)
+    except OSError:
+        pass
+
+
+def load_undo_history(digest, text_widget):
+    history = UNDO_HISTORIES.get(str(text_widget))
+    if not (UNDO_PERSIST and digest and history is not None):
+        return
+    try:
+        with open(SNAPSHOT_DIR / f"{digest}.undo.json", 'r', encoding='utf-8') as f:
+            history.load(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+# --------------------- End undo history ---------------------
+
+
+# --------------------- End document model ---------------------
+
+
+# ----------------------- Open documents -----------------------
+# The main editor shows each open document in its own notebook tab. Only the
+# HYDRATED_TABS most recently used tabs keep their text in the Tk widget;
+# the others are dehydrated and filled again when they are selected.
+
+HYDRATED_TABS = 8
+DOC_MANAGER = None
+
+
+class Document:
+    """One open document of the main editor."""
+
+    __slots__ = ('path', 'dirty', 'title', 'frame', 'text', 'journal', 'hydrated', 'tags', 'view', 'restore')
+
+    def __init__(self, frame, text, journal):
+        self.path = None
+        self.dirty = False
+        self.title = 'Untitled'
+        self.frame = frame
+        self.text = text
+        self.journal = journal
+        self.hydrated = True
+        self.tags = None  # tag runs kept while dehydrated
+        self.view = None  # (insert index, first visible fraction) while dehydrated
+        self.restore = None  # session entry of a tab not yet shown since restore
+
+    def name(self):
+        return os.path.basename(self.path) if self.path else self.title
+
+
+class DocumentManager:
+    """The main editor's open documents, one ttk.Notebook tab each."""
+
+    def __init__(self, root, notebook, title_var):
+        self.root = root
+        self.notebook = notebook
+        self.title_var = title_var
+        self.docs = {}  # text widget path -> Document
+        self.recent = []  # hydrated documents, least recently used first
+        self.request_refresh = throttled(root, self.refresh, TITLE_INTERVAL_MS)
+        notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+        title_var.trace_add('write', self._on_title_edited)
+
+    def new(self):
+        """Open an empty document in a new tab and select it."""
+        frame = tk.Frame(self.notebook)
+        text = tk.Text(frame, wrap="word", font=("Arial", 12))
+        scrollbar = tk.Scrollbar(frame, command=text.yview)
+        text.config(yscrollcommand=scrollbar.set)
+        create_status_bar(frame, text).pack(side='bottom', fill='x')
+        scrollbar.pack(side='right', fill='y')
+        text.pack(side='left', expand=True, fill='both')
+        attach_document(text)
+        attach_undo(text)
+        add_minimap(frame, text)
+        doc = Document(frame, text, EditJournal(self.root, text))
+        frame.document = doc
+        self.docs[str(text)] = doc
+        self.recent.append(doc)
+
+        def on_edit():
+            # Only the clean -> dirty transition touches the title
+            if not doc.dirty:
+                doc.dirty = True
+                self.request_refresh()
+
+        on_user_edit(text, on_edit)
+        self.notebook.add(frame, text=doc.name())
+        self.notebook.select(frame)
+        return doc
+
+    def current(self):
+        selected = self.notebook.select()
+        return self.notebook.nametowidget(selected).document if selected else None
+
+    def document_of(self, text_widget):
+        return self.docs.get(str(text_widget))
+
+    def find(self, path):
+        path = os.path.abspath(path)
+        for doc in self.docs.values():
+            if doc.path and os.path.abspath(doc.path) == path:
+                return doc
+        return None
+
+    def blank(self):
+        """The current document if it is an untouched Untitled one, else a new tab."""
+        doc = self.current()
+        if doc is None or doc.path or doc.dirty or len(get_document(doc.text)):
+            doc = self.new()
+        return doc
+
+    def close(self, doc):
+        """Close `doc`'s tab after offering to save it; False if it is still open.
+
+        If the user chooses to save, the tab closes when the save succeeds
+        and stays open (with its journal) if it fails.
+        """
+        self.notebook.select(doc.frame)
+        if not prompt_save_if_dirty(doc.text, on_saved=lambda: self._close(doc)):
+            return False
+        self._close(doc)
+        return True
+
+    def _close(self, doc):
+        if str(doc.text) not in self.docs:
+            return  # already closed while its save was in flight
+        job = LOAD_JOBS.get(str(doc.text))
+        if job:
+            job['cancel']()
+        doc.journal.discard()
+        self.docs.pop(str(doc.text), None)
+        if doc in self.recent:
+            self.recent.remove(doc)
+        self.notebook.forget(doc.frame)
+        doc.frame.destroy()
+        if not self.docs:
+            self.new()
+
+    def refresh(self):
+        """Update the window title and the tab labels."""
+        for doc in self.docs.values():
+            self.notebook.tab(doc.frame, text=doc.name() + (' •' if doc.dirty else ''))
+        doc = self.current()
+        if doc is None:
+            return
+        name = doc.title or "Untitled"
+        marker = "•" if doc.dirty else ""
+        if doc.path:
+            self.root.title(f"{name} {marker} - {doc.path} - PyText editor")
+        else:
+            self.root.title(f"{name} {marker} - PyText editor")
+
+    def restore(self, session):
+        """Reopen the tabs of a saved session.
+
+        Files are only read when their tab is first shown. Unsaved tabs are
+        rebuilt from their recovery journals, and formatting comes back from
+        the snapshot cache when the content hash still matches.
+        """
+        blank = self.current()
+        active = None
+        for i, entry in enumerate(session['documents']):
+            path = entry.get('path')
+            recovered = None
+            if entry.get('journal'):
+                try:
+                    recovered = recover_document(entry['journal'])
+                except Exception as e:
+                    print(f"Could not recover {path or 'Untitled'}: {e}")
+            if recovered is None and not (path and os.path.exists(path)):
+                continue
+            doc = self.new()
+            doc.path = path
+            update_highlighting(doc.text, path)
+            doc.title = entry.get('title') or doc.name()
+            doc.view = (entry.get('cursor', '1.0'), entry.get('scroll', 0.0))
+            if entry.get('bookmarks'):
+                get_bookmarks(doc.text).set(entry['bookmarks'])
+            doc.hydrated = False
+            self.recent.remove(doc)
+            if recovered is not None:
+                pt = get_document(doc.text)
+                LOAD_JOBS[str(doc.text)] = {'path': path, 'cancel': lambda: None}
+                try:
+                    pt.reset(recovered.text())
+                    pt.file_format = recovered.file_format
+                finally:
+                    LOAD_JOBS.pop(str(doc.text), None)
+                doc.journal.checkpoint(flush=False)
+                discard_recovery(entry['journal'])
+                doc.dirty = True
+                doc.tags = {}
+                if content_hash(pt.iter_chunks(), pt.file_format) == entry.get('hash'):
+                    doc.tags = apply_snapshot(doc.text, load_snapshot(entry['hash']), ranges=False)
+                    load_undo_history(entry['hash'], doc.text)
+            else:
+                doc.restore = entry
+            if i == session.get('active') or active is None:
+                active = doc
+        if active is None:
+            return
+        if blank is not None and not blank.path and not blank.dirty and not len(get_document(blank.text)):
+            self.close(blank)
+        self.notebook.select(active.frame)
+        self._on_tab_changed()
+
+    def _on_title_edited(self, *args):
+        doc = self.current()
+        if doc is not None and doc.title != self.title_var.get():
+            doc.title = self.title_var.get()
+            self.refresh()
+
+    def _on_tab_changed(self, event=None):
+        doc = self.current()
+        if doc is None:
+            return
+        self.title_var.set(doc.title)
+        self.hydrate(doc)
+        if doc in self.recent:
+            self.recent.remove(doc)
+        self.recent.append(doc)
+        excess = len(self.recent) - HYDRATED_TABS
+        for victim in [d for d in self.recent[:-1] if str(d.text) not in LOAD_JOBS][:max(excess, 0)]:
+            self.dehydrate(victim)
+        self.refresh()
+
+    def dehydrate(self, doc):
+        """Empty a background tab's widget, keeping only what is needed to refill it.
+
+        Edited documents keep their PieceTable (the mirror is suspended while
+        the widget is emptied) and their tag runs; documents unchanged since
+        they were read from disk drop their text too and are reread later.
+        """
+        text, key = doc.text, str(doc.text)
+        pt = get_document(text)
+        doc.tags = collect_tag_runs(text, pt)
+        doc.view = (text.index('insert'), text.yview()[0])
+        MIRROR_SUSPENDED.add(key)
+        try:
+            text.delete('1.0', tk.END)
+        finally:
+            MIRROR_SUSPENDED.discard(key)
+        text.edit_reset()
+        text.edit_modified(False)
+        if doc.path and not doc.dirty and (is_rich_path(doc.path) or not doc.tags):
+            # Registered as a load so the journal does not record the reset
+            LOAD_JOBS[key] = {'path': doc.path, 'cancel': lambda: None}
+            try:
+                pt.reset('')
+            finally:
+                LOAD_JOBS.pop(key, None)
+            doc.tags = None
+        doc.hydrated = False
+        if doc in self.recent:
+            self.recent.remove(doc)
+
+    def hydrate(self, doc):
+        """Refill a dehydrated tab, from its PieceTable or by rereading its file."""
+        if doc.hydrated:
+            return
+        doc.hydrated = True
+        text, key = doc.text, str(doc.text)
+        insert, top = doc.view
+
+        def restore(path=None):
+            text.mark_set('insert', insert)
+            text.yview_moveto(top)
+
+        if doc.tags is None and doc.path:
+            def done(path):
+                doc.journal.rebase(path)
+                entry, doc.restore = doc.restore, None
+                if entry and file_matches(path, entry):
+                    if not is_rich_path(path):
+                        apply_snapshot(text, load_snapshot(entry.get('hash')))
+                    load_undo_history(entry.get('hash'), text)
+                restore()
+
+            def failed(e):
+                messagebox.showerror("Error", f"Failed to reopen {doc.path}: {e}")
+                doc.path = None
+                doc.journal.rebase(None)
+                self.refresh()
+
+            load_document(self.root, text, doc.path, on_done=done, on_cancel=lambda: failed('cancelled'),
+                          on_error=failed)
+            return
+        pt = get_document(text)
+        MIRROR_SUSPENDED.add(key)
+        try:
+            text.insert('1.0', pt.text())
+        finally:
+            MIRROR_SUSPENDED.discard(key)
+        for tag, spans in (doc.tags or {}).items():
+            add_tag_ranges(text, tag, offsets_to_indices(pt, [o for span in spans for o in span]))
+        doc.tags = None
+        text.edit_reset()
+        text.edit_modified(False)
+        restore()
+
+
+def current_document():
+    """The main editor's selected Document, or None before the editor exists."""
+    return DOC_MANAGER.current() if DOC_MANAGER else None
+
+# --------------------- End open documents ---------------------
+
+
+def update_title(event=None):
+    """Refresh the main window title and tab labels (rate-limited)."""
+    if DOC_MANAGER:
+        DOC_MANAGER.request_refresh()
+
+
+def new_file(text_widget):
+    # This function now only clears the text; saving prompt handled by caller
+    text_widget.delete("1.0", tk.END)
+    get_document(text_widget).file_format = DEFAULT_FORMAT
+    release_document_fonts(text_widget)
+    doc = DOC_MANAGER.document_of(text_widget) if DOC_MANAGER else None
+    if doc:
+        doc.path = None
+        doc.dirty = False
+    if str(text_widget) in JOURNALS:
+        JOURNALS[str(text_widget)].rebase(None)
+    update_highlighting(text_widget, None)
+    clear_bookmarks(text_widget)
+    reset_undo(text_widget)
+    update_title()
+
+
+def stream_load_file(root, text_widget, path, on_done=None, on_cancel=None, on_error=None):
+    """Load `path` into `text_widget` chunk by chunk without blocking the mainloop.
+
+    The file's TextFormat is sniffed from its first block and becomes the
+    document's `file_format`. Each chunk is decoded with an incremental
+    decoder (so multibyte characters and '\r\n' pairs split across chunk
+    boundaries are kept intact) and inserted from a `root.after` callback.
+    If a later chunk turns out not to be UTF-8 the load restarts with the
+    next fallback encoding. Large files get a progress window with a Cancel
+    button. Returns the job dict; `job['cancel']()` stops the load.
+    """
+    previous = LOAD_JOBS.get(str(text_widget))
+    if previous:
+        previous['cancel']()
+
+    try:
+        f = open(path, 'rb')
+        total = os.fstat(f.fileno()).st_size
+        fmt = sniff_format(f.read(SNIFF_BYTES))
+        f.seek(len(fmt.bom))
+    except Exception as e:
+        if on_error:
+            on_error(e)
+        return None
+
+    pt = get_document(text_widget)
+    pt.file_format = fmt
+    decoder = fmt.decoder()
+    undo_enabled = text_widget.tk.getboolean(text_widget.cget('undo'))
+    job = {'path': path, 'total': total, 'loaded': 0, 'after_id': None, 'dialog': None}
+
+    def finish():
+        LOAD_JOBS.pop(str(text_widget), None)
+        f.close()
+        if job['dialog'] is not None:
+            job['dialog'].destroy()
+        text_widget.configure(state='normal', undo=undo_enabled)
+        reset_undo(text_widget)
+        text_widget.edit_modified(False)
+
+    def fail(e):
+        finish()
+        text_widget.delete('1.0', tk.END)
+        if on_error:
+            on_error(e)
+
+    def cancel():
+        if job['after_id'] is not None:
+            root.after_cancel(job['after_id'])
+        finish()
+        text_widget.delete('1.0', tk.END)
+        text_widget.edit_modified(False)
+        if on_cancel:
+            on_cancel()
+
+    def step():
+        nonlocal decoder
+        job['after_id'] = None
+        try:
+            data = f.read(LOAD_CHUNK_SIZE)
+            chunk = decoder.decode(data, final=not data)
+        except UnicodeDecodeError as e:
+            retry = fallback_format(pt.file_format)
+            if retry is None:
+                fail(e)
+                return
+            # Only the sniffed head was valid UTF-8: start over in the next encoding
+            pt.file_format, decoder = retry, retry.decoder()
+            f.seek(0)
+            job['loaded'] = 0
+            text_widget.configure(state='normal')
+            text_widget.delete('1.0', tk.END)
+            text_widget.configure(state='disabled')
+            job['after_id'] = root.after(1, step)
+            return
+        except Exception as e:
+            fail(e)
+            return
+        if chunk:
+            text_widget.configure(state='normal')
+            text_widget.insert(tk.END, chunk)
+            text_widget.configure(state='disabled')
+        job['loaded'] += len(data)
+        if job['dialog'] is not None:
+            job['progress']['value'] = job['loaded']
+            percent = job['loaded'] * 100 // total if total else 100
+            job['label'].config(text=f"Loading {os.path.basename(path)}... {percent}%")
+        if not data:
+            finish()
+            if on_done:
+                on_done(path)
+            return
+        job['after_id'] = root.after(1, step)
+
+    job['cancel'] = cancel
+    LOAD_JOBS[str(text_widget)] = job
+
+    if total >= LOAD_PROGRESS_THRESHOLD:
+        dlg = tk.Toplevel(root)
+        dlg.title("Opening file")
+        dlg.transient(root)
+        dlg.resizable(False, False)
+        job['label'] = tk.Label(dlg, text=f"Loading {os.path.basename(path)}... 0%")
+        job['label'].pack(padx=12, pady=(12, 4))
+        job['progress'] = ttk.Progressbar(dlg, length=320, maximum=total)
+        job['progress'].pack(padx=12, pady=4)
+        tk.Button(dlg, text="Cancel", command=cancel).pack(pady=(4, 12))
+        dlg.protocol('WM_DELETE_WINDOW', cancel)
+        job['dialog'] = dlg
+
+    # Loading is not an undoable edit, and the widget stays read-only until done
+    text_widget.configure(undo=False)
+    text_widget.delete('1.0', tk.END)
+    text_widget.configure(state='disabled')
+    job['after_id'] = root.after(1, step)
+    return job
+
+
+def open_file(text_widget):
+    if not prompt_save_if_dirty(text_widget):
+        return
+    path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("PyText Documents", "*.pytx")])
+    if not path:
+        return
+    # Huge files would be read whole into the editor; logs only need the read-only viewer
+    if not is_rich_path(path) and os.path.getsize(path) >= LARGE_FILE_THRESHOLD:
+        size_mb = os.path.getsize(path) // (1024 * 1024)
+        if messagebox.askyesno("Large file", f"{os.path.basename(path)} is {size_mb:,} MB. Open it read-only "
+                                             "in the Log Viewer instead of loading it into the editor?"):
+            open_log_viewer(APP_ROOT, path)
+            return
+    open_file_internal(path)
+
+
+def save_file(text_widget, on_saved=None):
+    """Save the document on the background save worker; `on_saved()` runs once it
+    reached the disk with no edits made in the meantime."""
+    document = DOC_MANAGER.document_of(text_widget)
+    # If we already have a path, save directly
+    if document.path:
+        path = document.path
+    else:
+        path = filedialog.asksaveasfilename(defaultextension=".txt",
+                                            filetypes=[("Text Files", "*.txt"), ("PyText Documents", "*.pytx")])
+        if not path:
+            return
+    doc = get_document(text_widget)
+    journal = JOURNALS.get(str(text_widget))
+    gen = journal.begin() if journal else None
+
+    stop = perf_stopwatch('save_file')
+
+    def done(path, error):
+        stop()
+        if error:
+            if offer_utf8(text_widget, error):
+                save_file(text_widget, on_saved)
+            else:
+                messagebox.showerror("Save Failed", f"Could not save {path}:\n{error}")
+            return
+        if journal:
+            journal.commit_file(gen, path)
+        # Edits made while the write was in flight keep the document dirty
+        if doc.version == version and document.path == path:
+            document.dirty = False
+        update_title()
+        messagebox.showinfo("Saved", f"File saved to {path}")
+        if on_saved is not None and not document.dirty:
+            on_saved()
+
+    document.path = path
+    update_highlighting(text_widget, path)
+    version = SAVER.submit(APP_ROOT, path, document_for_save(text_widget, path), done)
+    update_title()
+
+
+def prompt_save_if_dirty(text_widget, on_saved=None):
+    """If document is dirty, prompt user to save. Return True to continue, False to cancel.
+
+    With `on_saved`, a save the user chose is waited for instead: False is
+    returned and `on_saved()` runs once the save has succeeded.
+    """
+    doc = DOC_MANAGER.document_of(text_widget)
+    if not doc.dirty:
+        return True
+    resp = messagebox.askyesnocancel("Save changes?", f"{doc.name()} has unsaved changes. Save before continuing?")
+    if resp is None:
+        return False
+    if resp:
+        save_file(text_widget, on_saved)
+        return on_saved is None
+    return True
+
+
+SNAPSHOT_DIR = Path.home() / '.pytext_cache'
+SNAPSHOT_CACHE_SIZE = 200
+SESSION_VERSION = 2
+
+
+def content_hash(chunks, fmt=DEFAULT_FORMAT):
+    """blake2b digest of text `chunks` encoded in `fmt` (matches the saved file's bytes)."""
+    h = hashlib.blake2b(digest_size=16)
+    for data in fmt.encode(chunks):
+        h.update(data)
+    return h.hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(LOAD_CHUNK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_matches(path, entry):
+    """True if the file at `path` still has the content recorded in session `entry`."""
+    if not entry.get('hash'):
+        return False
+    try:
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) == (entry.get('size'), entry.get('mtime')):
+            return True
+        return st.st_size == entry.get('size') and file_hash(path) == entry['hash']
+    except OSError:
+        return False
+
+
+def save_snapshot(digest, tags):
+    """Cache the tag table {tag: {'style', 'runs'}} of the content with hash `digest`."""
+    try:
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        with open(SNAPSHOT_DIR / f"{digest}.json", 'w', encoding='utf-8') as f:
+            json.dump({'tags': tags}, f)
+        cached = sorted(SNAPSHOT_DIR.glob('*.json'), key=lambda p: p.stat().st_mtime)
+        for old in cached[:-SNAPSHOT_CACHE_SIZE]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def load_snapshot(digest):
+    if not digest:
+        return None
+    try:
+        with open(SNAPSHOT_DIR / f"{digest}.json", 'r', encoding='utf-8') as f:
+            return json.load(f).get('tags')
+    except (OSError, ValueError):
+        return None
+
+
+def apply_snapshot(text_widget, tags, ranges=True):
+    """Configure the tags of a cached snapshot on `text_widget` and, with
+    `ranges`, tag the text; returns the runs as {tag: [(start, end), ...]}."""
+    spans = {}
+    doc = get_document(text_widget)
+    for tag, entry in (tags or {}).items():
+        apply_tag_style(text_widget, tag, entry.get('style', {}))
+        offsets = decode_runs(entry.get('runs', []))
+        spans[tag] = list(zip(offsets[::2], offsets[1::2]))
+        if ranges:
+            add_tag_ranges(text_widget, tag, offsets_to_indices(doc, offsets))
+    return spans
+
+
+def session_entry(doc):
+    """What the session file records about one open document."""
+    text = doc.text
+    pt = get_document(text)
+    entry = {'path': doc.path, 'title': doc.title, 'journal': doc.journal.key if doc.dirty else None}
+    if doc.hydrated:
+        entry['cursor'], entry['scroll'] = text.index('insert'), text.yview()[0]
+    else:
+        entry['cursor'], entry['scroll'] = doc.view
+    bookmarks = BOOKMARKS.get(str(text))
+    if bookmarks is not None and bookmarks.lines:
+        entry['bookmarks'] = list(bookmarks.lines)
+    if doc.restore:
+        # Never shown since the last restore: nothing about it has changed
+        return dict(doc.restore, **entry)
+    if doc.path and os.path.exists(doc.path):
+        st = os.stat(doc.path)
+        entry['size'], entry['mtime'] = st.st_size, st.st_mtime_ns
+    loaded = doc.dirty or (doc.hydrated and str(text) not in LOAD_JOBS)
+    if loaded:
+        entry['hash'] = content_hash(pt.iter_chunks(), pt.file_format)
+        save_undo_history(entry['hash'], text)
+    elif doc.path and os.path.exists(doc.path):
+        entry['hash'] = file_hash(doc.path)
+    runs = (collect_tag_runs(text, pt) if doc.hydrated else doc.tags) if loaded else None
+    if runs and entry.get('hash') and not (doc.path and is_rich_path(doc.path) and not doc.dirty):
+        save_snapshot(entry['hash'], {tag: {'style': tag_style(text, tag), 'runs': encode_runs(spans)}
+                                      for tag, spans in runs.items()})
+    return entry
+
+
+def save_session():
+    """Save every open tab (cursor, scroll position, content hash) to the session file.
+
+    Unsaved tabs are recorded by their recovery journal, which the caller
+    keeps instead of discarding.
+    """
+    if not DOC_MANAGER:
+        return
+    docs = [DOC_MANAGER.notebook.nametowidget(tab).document for tab in DOC_MANAGER.notebook.tabs()]
+    docs = [doc for doc in docs if doc.path or doc.dirty]
+    current = current_document()
+    try:
+        entries = [session_entry(doc) for doc in docs]
+        data = {'version': SESSION_VERSION, 'documents': entries,
+                'active': docs.index(current) if current in docs else 0,
+                'last_file': current.path if current in docs else None}
+        with open(SESSION_FILE, 'w') as f:
+            json.dump(data, f)
+    except Exception as e:
+        print(f"Could not save session: {e}")
+
+
+def load_session():
+    """Load the last session as {'documents': [...], 'active': i}, or None."""
+    if SESSION_FILE.exists():
+        try:
+            with open(SESSION_FILE, 'r') as f:
+                data = json.load(f)
+            if 'documents' not in data:
+                # Sessions from before tabs only named one file
+                data = {'documents': [{'path': data['last_file']}] if data.get('last_file') else [], 'active': 0}
+            return data if data['documents'] else None
+        except Exception:
+            pass
+    return None
+
+
+def clear_session():
+    """Clear saved session."""
+    if SESSION_FILE.exists():
+        try:
+            SESSION_FILE.unlink()
+        except Exception:
+            pass
+
+
+LOGO_PATH = Path(__file__).parent / 'logo.png'
+_LOGO = {'source': None, 'images': {}}
+
+
+def logo_image(master, size):
+    """Return the logo as a `size` x `size` PhotoImage for `master`'s interpreter, or None.
+
+    The PNG is decoded once and each size is resized once; PIL is only
+    imported the first time a logo is needed. Without PIL, Tk's own PNG
+    support is used with integer subsampling.
+    """
+    key = (id(master.tk), size)
+    if key in _LOGO['images']:
+        return _LOGO['images'][key]
+    image = None
+    try:
+        if _LOGO['source'] is None and LOGO_PATH.exists():
+            try:
+                from PIL import Image
+                with Image.open(LOGO_PATH) as img:
+                    _LOGO['source'] = img.convert('RGBA')
+            except ImportError:
+                _LOGO['source'] = False
+        if _LOGO['source']:
+            from PIL import Image, ImageTk
+            image = ImageTk.PhotoImage(_LOGO['source'].resize((size, size), Image.Resampling.LANCZOS), master=master)
+        elif LOGO_PATH.exists():
+            full = tk.PhotoImage(master=master, file=str(LOGO_PATH))
+            step = max(1, max(full.width(), full.height()) // size)
+            image = full.subsample(step, step)
+    except Exception as e:
+        print(f"Error loading logo: {e}")
+    _LOGO['images'][key] = image
+    return image
+
+
+def show_splash_screen(root):
+    """Show the splash screen over the (withdrawn) `root` and return it.
+
+    The caller destroys it once the editor window is ready.
+    """
+    splash = tk.Toplevel(root)
+    splash.title("PyText editor")
+    splash.resizable(False, False)
+    splash.overrideredirect(True)
+    
+    # Set white background
+    splash.config(bg='white')
+    
+    # Center the splash screen
+    x = (splash.winfo_screenwidth() // 2) - 250
+    y = (splash.winfo_screenheight() // 2) - 250
+    splash.geometry(f"500x500+{x}+{y}")
+    
+    # Load and display logo
+    logo_photo = logo_image(root, 200)
+    if logo_photo is not None:
+        tk.Label(splash, image=logo_photo, bg='white').pack(pady=30, padx=20)
+    
+    # Add text
+    title_label = tk.Label(splash, text="PyText editor", font=("Arial", 20, "bold"), bg='white')
+    title_label.pack(pady=10)
+    
+    subtitle_label = tk.Label(splash, text="A simple Python text editor", font=("Arial", 12), bg='white')
+    subtitle_label.pack(pady=5)
+    
+    # Paint it now: the editor is built before the event loop runs
+    splash.update()
+    return splash
+
+
+def show_startup_dialog(root):
+    """Show startup dialog with options to open previous, create new, open file, or exit."""
+    startup_root = tk.Toplevel(root)
+    startup_root.title("PyText editor - Welcome")
+    # Make window larger so all buttons are visible and allow resizing
+    startup_root.geometry("600x520")
+    startup_root.minsize(420, 360)
+    startup_root.resizable(True, True)
+    
+    # Load and display logo if available
+    logo_photo = logo_image(root, 100)
+    if logo_photo is not None:
+        tk.Label(startup_root, image=logo_photo).pack(pady=10)
+    
+    # Title
+    title = tk.Label(startup_root, text="PyText editor", font=("Arial", 18, "bold"))
+    title.pack(pady=5)
+    
+    # Subtitle
+    subtitle = tk.Label(startup_root, text="Choose an action:", font=("Arial", 10))
+    subtitle.pack(pady=5)
+    
+    choice = tk.IntVar(value=-1)
+    
+    # Buttons frame (use expand so buttons are laid out clearly)
+    frame = tk.Frame(startup_root)
+    frame.pack(pady=20, expand=True, fill='both')
+    
+    session = load_session()
+    
+    # Option 1: Return from previous session
+    if session:
+        names = [os.path.basename(d['path']) if d.get('path') else d.get('title') or 'Untitled'
+                 for d in session['documents']]
+        label = names[0] if len(names) == 1 else f"{names[0]} and {len(names) - 1} more"
+        btn1 = tk.Button(frame, text=f"Return from Previous Session\n({label})",
+                         height=2, command=lambda: (choice.set(1), startup_root.destroy()))
+        btn1.pack(pady=6, padx=20, fill='x')
+        print(f"Startup: Return button shown for {', '.join(names)}")
+    
+    # Option 2: Create new file
+    btn2 = tk.Button(frame, text="Create New File", height=2,
+                     command=lambda: (choice.set(2), startup_root.destroy()))
+    btn2.pack(pady=6, padx=20, fill='x')
+    print("Startup: Create New button shown")
+    
+    # Option 3: Open file
+    btn3 = tk.Button(frame, text="Open File", height=2,
+                     command=lambda: (choice.set(3), startup_root.destroy()))
+    btn3.pack(pady=6, padx=20, fill='x')
+    print("Startup: Open File button shown")
+    
+    # Option 4: Exit
+    btn4 = tk.Button(frame, text="Exit", height=2,
+                     command=lambda: (choice.set(4), startup_root.destroy()))
+    btn4.pack(pady=6, padx=20, fill='x')
+    print("Startup: Exit button shown")
+    
+    startup_root.protocol('WM_DELETE_WINDOW', startup_root.destroy)
+    startup_root.wait_window()
+    return choice.get()
+
+
+@timed('word_count')
+def word_count(content: str) -> int:
+    return len(content.split())
+
+
+# ----------------------- Font registry -----------------------
+# Formatting used to build a new named font and re-run `tag_configure` on every
+# button press. The registry keeps one Font per (family, size, weight, slant,
+# underline) and configures each tag on each widget only once.
+
+FONT_CACHE_SIZE = 64
+
+
+class FontRegistry:
+    """Bounded LRU cache of tkinter fonts plus the tags configured with them.
+
+    Fonts still used by a configured tag are never evicted; `release` forgets
+    a widget's tags when its document closes so their fonts can be freed.
+    """
+
+    def __init__(self, max_fonts=FONT_CACHE_SIZE):
+        self.max_fonts = max_fonts
+        self._fonts = OrderedDict()  # (interp, props) -> font.Font
+        self._tags = {}              # widget path -> {tag: (interp, props)}
+        self._base = {}              # (interp, font spec) -> props
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def base_props(self, widget):
+        """(family, size, weight, slant, underline) of `widget`'s own font."""
+        spec = str(widget.cget('font'))
+        key = (id(widget.tk), spec)
+        if key not in self._base:
+            actual = widget.tk.splitlist(widget.tk.call('font', 'actual', spec))
+            info = dict(zip(actual[::2], actual[1::2]))
+            self._base[key] = (str(info['-family']), int(info['-size']), str(info['-weight']),
+                               str(info['-slant']), bool(int(info['-underline'])))
+        return self._base[key]
+
+    def font(self, widget, props):
+        """Return the shared Font for `props`, creating it on a miss."""
+        key = (id(widget.tk), tuple(props))
+        f = self._fonts.get(key)
+        if f is not None:
+            self.hits += 1
+            self._fonts.move_to_end(key)
+            return f
+        self.misses += 1
+        family, size, weight, slant, underline = props
+        f = font.Font(root=widget, family=family, size=size, weight=weight,
+                      slant=slant, underline=underline)
+        self._fonts[key] = f
+        self._evict()
+        return f
+
+    def configure_tag(self, text_widget, tag, props, **options):
+        """Configure `tag` with the font for `props`, unless it already is."""
+        widget_key = str(text_widget)
+        if widget_key not in self._tags:
+            self._tags[widget_key] = {}
+            text_widget.bind('<Destroy>', lambda e: str(e.widget) == widget_key
+                             and self.release(text_widget, delete_tags=False), add='+')
+        tags = self._tags[widget_key]
+        key = (id(text_widget.tk), tuple(props))
+        f = self.font(text_widget, props)
+        if tags.get(tag) != key:
+            text_widget.tag_configure(tag, font=f, **options)
+            tags[tag] = key
+        return tag
+
+    def _in_use(self):
+        return {key for tags in self._tags.values() for key in tags.values()}
+
+    def _evict(self):
+        if len(self._fonts) <= self.max_fonts:
+            return
+        in_use = self._in_use()
+        for key in list(self._fonts):
+            if len(self._fonts) <= self.max_fonts:
+                break
+            if key not in in_use:
+                # Dropping the last reference deletes the Tk named font
+                del self._fonts[key]
+                self.evictions += 1
+
+    def release(self, text_widget, delete_tags=True):
+        """Forget the font tags on `text_widget` (its document closed) and free unused fonts."""
+        tags = self._tags.pop(str(text_widget), {})
+        if delete_tags and tags:
+            try:
+                text_widget.tag_delete(*tags)
+            except tk.TclError:
+                pass
+        in_use = self._in_use()
+        for key in [k for k in self._fonts if k[0] == id(text_widget.tk) and k not in in_use]:
+            del self._fonts[key]
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'fonts': len(self._fonts), 'hit_rate': self.hits / total if total else 0.0}
+
+
+FONTS = FontRegistry()
+
+
+def font_cache_summary():
+    st = FONTS.stats()
+    return (f"Fonts cached: {st['fonts']}\nHits: {st['hits']}\nMisses: {st['misses']}\n"
+            f"Evictions: {st['evictions']}\nHit rate: {st['hit_rate']:.0%}")
+
+
+def release_document_fonts(text_widget):
+    """Free the fonts of a closing document once its text is gone."""
+    FONTS.release(text_widget)
+
+# --------------------- End font registry ---------------------
+
+
+# ----------------------- Rich-text documents -----------------------
+# `.pytx` files are JSON: {"format": "pytext", "version": 1, "tags": {...},
+# "text": "..."}. Each tag maps to its style and its ranges, run-length
+# encoded as [gap, length, gap, length, ...] (gap measured from the end of
+# the previous range), so formatting survives a save/open round trip.
+
+RICH_EXTENSIONS = ('.pytx',)
+RICH_FORMAT_VERSION = 1
+# Transient tags that are not part of the document's formatting
+RICH_SKIP_TAGS = {'sel', 'search', 'bookmark'}
+RICH_STYLE_OPTIONS = ('justify', 'foreground', 'background', 'underline', 'overstrike')
+
+
+def is_rich_path(path):
+    return os.path.splitext(path)[1].lower() in RICH_EXTENSIONS
+
+
+def collect_tag_runs(text_widget, doc):
+    """Return {tag: [(start, end), ...]} offsets from the widget's `dump`, in tag priority order."""
+    def offset(index):
+        line, col = map(int, index.split('.'))
+        return min(doc.line_start(line - 1) + col, len(doc))
+
+    open_at = {}
+    runs = {tag: [] for tag in text_widget.tag_names() if tag not in RICH_SKIP_TAGS}
+    for key, tag, index in text_widget.dump('1.0', tk.END, tag=True):
+        if tag not in runs:
+            continue
+        if key == 'tagon':
+            open_at[tag] = offset(index)
+        elif key == 'tagoff' and tag in open_at:
+            start, end = open_at.pop(tag), offset(index)
+            if end > start:
+                runs[tag].append((start, end))
+    return {tag: spans for tag, spans in runs.items() if spans}
+
+
+def encode_runs(spans):
+    flat = []
+    prev = 0
+    for start, end in spans:
+        flat.append(start - prev)
+        flat.append(end - start)
+        prev = end
+    return flat
+
+
+def decode_runs(flat):
+    """Inverse of encode_runs, as flat [start, end, start, end, ...] offsets."""
+    offsets = []
+    pos = 0
+    for i in range(0, len(flat) - 1, 2):
+        pos += flat[i]
+        offsets.append(pos)
+        pos += flat[i + 1]
+        offsets.append(pos)
+    return offsets
+
+
+def tag_style(text_widget, tag):
+    style = {}
+    spec = str(text_widget.tag_cget(tag, 'font'))
+    if spec:
+        actual = text_widget.tk.splitlist(text_widget.tk.call('font', 'actual', spec))
+        info = dict(zip(actual[::2], actual[1::2]))
+        style['font'] = [str(info['-family']), int(info['-size']), str(info['-weight']),
+                         str(info['-slant']), bool(int(info['-underline']))]
+    for option in RICH_STYLE_OPTIONS:
+        value = str(text_widget.tag_cget(tag, option))
+        if value:
+            style[option] = value
+    return style
+
+
+def apply_tag_style(text_widget, tag, style):
+    options = {k: v for k, v in style.items() if k in RICH_STYLE_OPTIONS}
+    if style.get('font'):
+        FONTS.configure_tag(text_widget, tag, tuple(style['font']), **options)
+    else:
+        text_widget.tag_configure(tag, **options)
+
+
+class RichSnapshot:
+    """Text snapshot plus tag table of a widget, streamed out as `.pytx` JSON.
+
+    It can be passed to SAVER.submit like a PieceTable: the tag table is
+    captured on the Tk thread and encoding happens on the save worker.
+    """
+
+    def __init__(self, text_widget):
+        doc = get_document(text_widget)
+        self.doc = doc.snapshot()
+        self.version = self.doc.version
+        self.tags = {tag: {'style': tag_style(text_widget, tag), 'runs': encode_runs(spans)}
+                     for tag, spans in collect_tag_runs(text_widget, doc).items()}
+
+    def snapshot(self):
+        return self
+
+    def iter_chunks(self):
+        return rich_chunks(self.tags, self.doc.iter_chunks())
+
+
+def rich_chunks(tags, text_chunks):
+    """Stream a `.pytx` document with tag table `tags` and the given text."""
+    yield ('{"format": "pytext", "version": %d, "tags": %s, "text": "'
+           % (RICH_FORMAT_VERSION, json.dumps(tags, ensure_ascii=False)))
+    for chunk in text_chunks:
+        yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+    yield '"}\n'
+
+
+def document_for_save(text_widget, path):
+    """What to hand to the save worker for `path`: formatted for .pytx, plain text otherwise."""
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None:
+        return view
+    if is_rich_path(path):
+        return RichSnapshot(text_widget)
+    return get_document(text_widget)
+
+
+def read_rich_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != 'pytext' or not isinstance(data.get('text'), str):
+        raise ValueError(f"{os.path.basename(path)} is not a PyText document")
+    return data
+
+
+def load_rich_document(text_widget, path):
+    """Replace the widget contents with the `.pytx` document at `path`.
+
+    The text goes in with one insert and each tag with one batched tag_add
+    over all of its ranges.
+    """
+    data = read_rich_file(path)
+    key = str(text_widget)
+    undo_enabled = text_widget.tk.getboolean(text_widget.cget('undo'))
+    LOAD_JOBS[key] = {'path': path, 'cancel': lambda: None}
+    try:
+        text_widget.configure(undo=False)
+        text_widget.delete('1.0', tk.END)
+        text_widget.insert('1.0', data['text'])
+        doc = get_document(text_widget)
+        doc.file_format = DEFAULT_FORMAT
+        for tag, entry in data.get('tags', {}).items():
+            apply_tag_style(text_widget, tag, entry.get('style', {}))
+            add_tag_ranges(text_widget, tag, offsets_to_indices(doc, decode_runs(entry.get('runs', []))))
+    finally:
+        LOAD_JOBS.pop(key, None)
+        text_widget.configure(undo=undo_enabled)
+        reset_undo(text_widget)
+        text_widget.edit_modified(False)
+
+
+def load_document(root, text_widget, path, on_done=None, on_cancel=None, on_error=None):
+    """Open `path` into `text_widget`: `.pytx` documents directly, anything else streamed."""
+    if not is_rich_path(path):
+        return stream_load_file(root, text_widget, path, on_done, on_cancel, on_error)
+    try:
+        load_rich_document(text_widget, path)
+    except Exception as e:
+        text_widget.delete('1.0', tk.END)
+        if on_error:
+            on_error(e)
+        return None
+    if on_done:
+        on_done(path)
+    return None
+
+# --------------------- End rich-text documents ---------------------
+
+
+# ----------------------- Syntax highlighting -----------------------
+# Python files are coloured by a small line-by-line lexer. The lexer state at
+# the start of every line is cached, so an edit only re-lexes from its line
+# until the state matches the cache again, and only the visible lines are
+# (re)tagged.
+
+HIGHLIGHT_EXTENSIONS = ('.py', '.pyw')
+SYNTAX_STYLES = {
+    'syn_keyword': {'foreground': '#0000c0'},
+    'syn_builtin': {'foreground': '#7030a0'},
+    'syn_def': {'foreground': '#a05000'},
+    'syn_decorator': {'foreground': '#806000'},
+    'syn_number': {'foreground': '#008080'},
+    'syn_string': {'foreground': '#008000'},
+    'syn_comment': {'foreground': '#808080'},
+}
+RICH_SKIP_TAGS.update(SYNTAX_STYLES)
+# Edits spanning more lines than this are re-lexed lazily, when painted
+RELEX_EAGER_LINES = 2000
+HIGHLIGHTERS = {}
+
+_PY_TOKEN = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<triple>(?i:[rbuf]{0,2})(?:\'\'\'|"""))
+  | (?P<string>(?i:[rbuf]{0,2})(?:'(?:[^'\\\n]|\\.)*'?|"(?:[^"\\\n]|\\.)*"?))
+  | (?P<decorator>^\s*@[\w.]+)
+  | (?P<number>\b(?:0[xXoObB][\da-fA-F_]+|\d[\d_]*\.?[\d_]*(?:[eE][+-]?\d+)?[jJ]?)|\.\d[\d_]*(?:[eE][+-]?\d+)?[jJ]?)
+  | (?P<name>[^\W\d]\w*)
+''', re.VERBOSE)
+_TRIPLE_END = {'"""': re.compile(r'\\.|"""'), "'''": re.compile(r"\\.|'''")}
+
+
+def _python_names():
+    import builtins
+    import keyword
+    return set(keyword.kwlist), set(dir(builtins)) | set(getattr(keyword, 'softkwlist', ()))
+
+
+_PY_KEYWORDS, _PY_BUILTINS = _python_names()
+
+
+def lex_python_line(line, state=None):
+    """Lex one line. Returns ([(tag, start, end), ...], state at the next line),
+    where a state is None or the delimiter of a triple-quoted string left open."""
+    tokens = []
+    pos = 0
+    if state:
+        end = _close_triple(line, 0, state)
+        if end < 0:
+            return [('syn_string', 0, len(line))], state
+        tokens.append(('syn_string', 0, end))
+        pos = end
+    after_def = False
+    while True:
+        m = _PY_TOKEN.search(line, pos)
+        if m is None:
+            return tokens, None
+        kind, start, pos = m.lastgroup, m.start(), m.end()
+        if kind == 'triple':
+            delim = m.group()[-3:]
+            end = _close_triple(line, pos, delim)
+            if end < 0:
+                tokens.append(('syn_string', start, len(line)))
+                return tokens, delim
+            tokens.append(('syn_string', start, end))
+            pos = end
+        elif kind == 'name':
+            word = m.group()
+            if after_def:
+                tokens.append(('syn_def', start, pos))
+            elif word in _PY_KEYWORDS:
+                tokens.append(('syn_keyword', start, pos))
+            elif word in _PY_BUILTINS:
+                tokens.append(('syn_builtin', start, pos))
+            after_def = word in ('def', 'class')
+            continue
+        else:
+            tokens.append(('syn_' + kind, start, pos))
+        after_def = False
+
+
+def _close_triple(line, pos, delim):
+    """End offset of the `delim` closing a triple-quoted string, or -1."""
+    for m in _TRIPLE_END[delim].finditer(line, pos):
+        if m.group() == delim:
+            return m.end()
+    return -1
+
+
+class PythonLexer:
+    """Line-start lexer states for a PieceTable, kept up to date per edit.
+
+    `states[i]` is the state at the start of line i and is exact for
+    i < `valid`; later lines are lexed on demand by `state_at`.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.states = [None]
+        self.valid = 1
+        doc.subscribe(self._on_change)
+
+    def close(self):
+        self.doc.unsubscribe(self._on_change)
+
+    def _truncate(self, valid):
+        self.valid = max(1, valid)
+        del self.states[self.valid:]
+
+    def _on_change(self, kind, offset, text):
+        if kind == 'reset':
+            self._truncate(1)
+            return
+        line = self.doc.line_of(offset)
+        n = text.count('\n')
+        if line + 1 >= self.valid:
+            self._truncate(min(self.valid, line + 1))
+            return
+        if kind == 'insert':
+            self.states[line + 1:line + 1] = [None] * n
+            self.valid += n
+            changed = line + n
+        else:
+            del self.states[line + 1:line + 1 + n]
+            self.valid -= n
+            changed = line
+        if self.valid <= line + 1 or n > RELEX_EAGER_LINES:
+            self._truncate(line + 1)
+            return
+        # Re-lex from the edited line until a line start state converges
+        lines = self._lines(line, min(self.valid, changed + RELEX_EAGER_LINES))
+        for i, text_line in enumerate(lines, line):
+            if i + 1 >= self.valid:
+                break
+            state = lex_python_line(text_line, self.states[i])[1]
+            if i >= changed and state == self.states[i + 1]:
+                return
+            self.states[i + 1] = state
+        self._truncate(line + len(lines))
+
+    def _lines(self, first, end):
+        """Text of lines [first, end) as a list."""
+        stop = self.doc.line_start(end) - 1 if end < self.doc.line_count() else len(self.doc)
+        return self.doc.slice(self.doc.line_start(first), max(stop, 0)).split('\n')[:end - first]
+
+    def state_at(self, line):
+        """Lexer state at the start of `line`, lexing forward from the cache as needed."""
+        line = min(line, self.doc.line_count() - 1)
+        if line >= self.valid:
+            state = self.states[self.valid - 1]
+            for text_line in self._lines(self.valid - 1, line):
+                state = lex_python_line(text_line, state)[1]
+                self.states.append(state)
+            self.valid = len(self.states)
+        return self.states[line]
+
+    def tokens(self, first, end):
+        """Yield (line, tokens) for lines [first, end)."""
+        state = self.state_at(first)
+        for i, text_line in enumerate(self._lines(first, end), first):
+            tokens, state = lex_python_line(text_line, state)
+            yield i, tokens
+
+
+class SyntaxHighlighter:
+    """Paints PythonLexer tokens onto the visible lines of a Text widget."""
+
+    MARGIN_LINES = 5
+
+    def __init__(self, text_widget):
+        self.text = text_widget
+        self.lexer = PythonLexer(get_document(text_widget))
+        for tag, style in SYNTAX_STYLES.items():
+            text_widget.tag_configure(tag, **style)
+            text_widget.tag_lower(tag)
+        self.schedule = throttled(text_widget, self.paint, 0)
+        self._unsubscribe = subscribe_batched(text_widget, self.lexer.doc, self.schedule)
+        self._remove_scroll = add_scroll_listener(text_widget, self.schedule)
+        self.schedule()
+
+    def paint(self):
+        text = self.text
+        first = max(int(text.index('@0,0').split('.')[0]) - 1 - self.MARGIN_LINES, 0)
+        last = int(text.index(f'@0,{text.winfo_height()}').split('.')[0]) + self.MARGIN_LINES
+        last = min(last, self.lexer.doc.line_count())
+        ranges = {tag: [] for tag in SYNTAX_STYLES}
+        for line, tokens in self.lexer.tokens(first, last):
+            for tag, start, end in tokens:
+                ranges[tag] += (f'{line + 1}.{start}', f'{line + 1}.{end}')
+        for tag, indices in ranges.items():
+            text.tag_remove(tag, f'{first + 1}.0', f'{last + 1}.0')
+            add_tag_ranges(text, tag, indices)
+
+    def close(self):
+        self._unsubscribe()
+        self._remove_scroll()
+        self.schedule.cancel()
+        self.lexer.close()
+        for tag in SYNTAX_STYLES:
+            self.text.tag_remove(tag, '1.0', tk.END)
+
+
+def update_highlighting(text_widget, path):
+    """Highlight `text_widget` if `path` is a Python file, and stop otherwise."""
+    key = str(text_widget)
+    wanted = bool(path) and path.lower().endswith(HIGHLIGHT_EXTENSIONS) and key not in LARGE_VIEWS
+    current = HIGHLIGHTERS.get(key)
+    if wanted and current is None:
+        HIGHLIGHTERS[key] = SyntaxHighlighter(text_widget)
+        text_widget.bind('<Destroy>', lambda e: str(e.widget) == key and HIGHLIGHTERS.pop(key, None), add='+')
+    elif not wanted and current is not None:
+        HIGHLIGHTERS.pop(key).close()
+
+# --------------------- End syntax highlighting ---------------------
+
+
+# ----------------------- Large-file viewport -----------------------
+# Files at least LARGE_FILE_THRESHOLD bytes are not loaded into the widget.
+# The file is memory-mapped and indexed by line, and the widget holds only a
+# window of lines around the viewport. Edited windows are kept as overlays
+# and merged with the mapped file when it is saved; untouched byte ranges
+# are written straight from the map. Only files whose lines can be found by
+# scanning for b'\n' (not UTF-16/32, not CR-only) are viewed this way.
+
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+LARGE_WINDOW_LINES = 3000
+LARGE_WINDOW_MARGIN = 300
+LARGE_INDEX_CHUNK = 8 * 1024 * 1024
+LARGE_DECODE_CHUNK = 1024 * 1024
+LARGE_VIEWS = {}
+
+
+class LargeFileView:
+    """Viewport-only editing of a huge file in a Text widget.
+
+    Lines are addressed two ways: original lines of the mapped file, and
+    virtual lines of the edited document. `segments` is a sorted list of
+    [orig_start, orig_end, lines] overlays replacing original lines
+    [orig_start, orig_end) with `lines`. The widget shows virtual lines
+    starting at `window[2]`, covering original lines window[0]:window[1].
+    """
+
+    def __init__(self, root, text_widget, scrollbar, path):
+        self.root = root
+        self.text = text_widget
+        self.scrollbar = scrollbar
+        self.doc = get_document(text_widget)
+        self.window = (0, 0, 0)
+        self._window_len = 0
+        self._window_version = None
+        self._recenter_id = None
+        self._open(path)
+        LARGE_VIEWS[str(text_widget)] = self
+        self._wrap = str(text_widget.cget('wrap'))
+        text_widget.configure(wrap='none')
+        set_scroll_target(text_widget, self._on_text_scroll)
+        scrollbar.configure(command=self._on_scrollbar)
+        self._index_step()
+
+    def _open(self, path):
+        self.path = path
+        self.segments = []
+        # Old maps are left to the garbage collector: a pending save may still read them
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.file_format = sniff_format(self.mm[:SNIFF_BYTES])
+        self.offsets = array('q', [len(self.file_format.bom)])
+        self._scanned = 0
+        self.indexing = True
+        self._index_id = None
+
+    # -- line index --
+
+    def _index_step(self):
+        """Index the next chunk of newlines, then reschedule until done."""
+        self._index_id = None
+        start = self._scanned
+        chunk = self.mm[start:start + LARGE_INDEX_CHUNK]
+        self.offsets.extend(m.end() + start for m in re.finditer(b'\n', chunk))
+        self._scanned += len(chunk)
+        self.indexing = self._scanned < self.size
+        if start == 0 or not self.indexing:
+            self.render(self.top())
+        if self.indexing:
+            self._index_id = self.root.after(1, self._index_step)
+        self.text.event_generate('<<LargeFileProgress>>', when='tail')
+
+    def _orig_lines(self):
+        """Original lines known so far (the last one may still be growing)."""
+        return len(self.offsets) - 1 if self.indexing else len(self.offsets)
+
+    def _estimated_lines(self):
+        if not self.indexing:
+            return len(self.offsets)
+        return max(self._orig_lines(), len(self.offsets) * self.size // max(self._scanned, 1))
+
+    def _decode(self, first, end):
+        """Original lines [first, end) as a list of strings."""
+        if first >= end:
+            return []
+        stop = self.offsets[end] - 1 if end < len(self.offsets) else self.size
+        lines = self.mm[self.offsets[first]:stop].decode(self.file_format.encoding, 'replace').split('\n')
+        if self.file_format.newline == '\r\n':
+            lines = [line[:-1] if line.endswith('\r') else line for line in lines]
+        return lines
+
+    # -- virtual lines --
+
+    def _delta(self):
+        return sum(len(lines) - (end - start) for start, end, lines in self.segments)
+
+    def total_lines(self, estimate=True):
+        """Virtual line count, including unsaved edits in the window."""
+        base = self._estimated_lines() if estimate else self._orig_lines()
+        if self._window_version is None:
+            return base + self._delta()  # the widget does not hold a window yet
+        return base + self._delta() - self._window_len + self.doc.line_count()
+
+    def top(self):
+        """Virtual line at the top of the viewport."""
+        if self._window_version is None:
+            return self.window[2]
+        return self.window[2] + int(self.text.index('@0,0').split('.')[0]) - 1
+
+    def _to_orig(self, virtual):
+        """Map a virtual line to (original line, overlay segment or None)."""
+        shift = 0
+        for segment in self.segments:
+            start, end, lines = segment
+            if virtual < start + shift:
+                break
+            if virtual < start + shift + len(lines):
+                return start, segment
+            shift += len(lines) - (end - start)
+        return virtual - shift, None
+
+    def _to_virtual(self, orig):
+        """Virtual line of original line `orig` (which starts no overlay)."""
+        return orig + sum(len(lines) - (end - start) for start, end, lines in self.segments if end <= orig)
+
+    def _window_lines(self, first, end):
+        lines, pos = [], first
+        for start, stop, seg_lines in self.segments:
+            if first <= start < end:
+                lines.extend(self._decode(pos, start))
+                lines.extend(seg_lines)
+                pos = stop
+        lines.extend(self._decode(pos, end))
+        return lines
+
+    def commit(self):
+        """Store the window as an overlay if it was edited since it was rendered."""
+        if self._window_version is None or self.doc.version == self._window_version:
+            return
+        first, end, _ = self.window
+        lines = self.doc.text().split('\n')
+        self.segments = [s for s in self.segments if s[1] <= first or s[0] >= end]
+        bisect.insort(self.segments, [first, end, lines])
+        self._window_len = len(lines)
+        self._window_version = self.doc.version
+
+    def render(self, top):
+        """Show a window of lines centred on virtual line `top`."""
+        self.commit()
+        total = self.total_lines(estimate=False)
+        start = max(0, min(top - LARGE_WINDOW_LINES // 2, total - LARGE_WINDOW_LINES))
+        stop = min(total, start + LARGE_WINDOW_LINES)
+        first, segment = self._to_orig(start)
+        end, last = self._to_orig(max(stop - 1, start))
+        end = last[1] if last else min(end + 1, self._orig_lines())
+        if (first, end) == self.window[:2] and self._window_version is not None:
+            self.text.yview(f"{max(top - self.window[2], 0) + 1}.0")
+            return
+        insert_line, insert_col = map(int, self.text.index('insert').split('.'))
+        insert_line += self.window[2] - 1
+        lines = self._window_lines(first, end)
+        undo_enabled = self.text.tk.getboolean(self.text.cget('undo'))
+        self.text.configure(undo=False)
+        # Paging lines in is not an edit: registered as a load, it does not mark the file dirty
+        LOAD_JOBS[str(self.text)] = {'path': self.path, 'cancel': lambda: None}
+        try:
+            self.text.delete('1.0', tk.END)
+            self.text.insert('1.0', '\n'.join(lines))
+        finally:
+            LOAD_JOBS.pop(str(self.text), None)
+        self.text.configure(undo=undo_enabled)
+        reset_undo(self.text)
+        self.text.edit_modified(False)
+        self.window = (first, end, self._to_virtual(first))
+        self._window_len = len(lines)
+        self._window_version = self.doc.version
+        self.text.mark_set('insert', f"{max(insert_line - self.window[2], 0) + 1}.{insert_col}")
+        self.text.yview(f"{max(top - self.window[2], 0) + 1}.0")
+
+    # -- scrolling --
+
+    def _on_text_scroll(self, first, last):
+        """Translate the widget's window-relative fractions to the whole file."""
+        n = self.doc.line_count()
+        total = max(self.total_lines(), 1)
+        top = float(first) * n
+        bottom = float(last) * n
+        self.scrollbar.set((self.window[2] + top) / total, min(1.0, (self.window[2] + bottom) / total))
+        near_top = top < LARGE_WINDOW_MARGIN and self.window[2] > 0
+        near_bottom = bottom > n - LARGE_WINDOW_MARGIN and self.window[2] + n < total
+        if (near_top or near_bottom) and self._recenter_id is None:
+            self._recenter_id = self.root.after_idle(lambda: self._recenter(self.window[2] + int(top)))
+
+    def _recenter(self, top):
+        self._recenter_id = None
+        self.render(top)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * self.total_lines())
+            n = self.doc.line_count()
+            if self.window[2] <= top < self.window[2] + n - LARGE_WINDOW_MARGIN:
+                self.text.yview(f"{top - self.window[2] + 1}.0")
+            else:
+                self.render(top)
+        elif args[0] == 'scroll':
+            self.text.yview_scroll(int(args[1]), args[2])
+
+    # -- saving --
+
+    def snapshot(self):
+        """Freeze the overlays for the save worker (the map is never written to)."""
+        if self.indexing:
+            raise RuntimeError('The file is still being indexed; try again in a moment.')
+        self.commit()
+        return LargeFileSnapshot(self)
+
+    def reload(self, path):
+        """Map `path` afresh after it was saved, keeping the viewport position."""
+        top = self.top()
+        self._open(path)
+        self._window_version = None
+        self._window_len = 0
+        self.window = (0, 0, top)
+        self._index_step()
+
+    def summary(self, counter):
+        lines = f"{self.total_lines():,}{'+' if self.indexing else ''}"
+        progress = f"   Indexing {self._scanned * 100 // max(self.size, 1)}%" if self.indexing else ''
+        first = self.window[2] + 1
+        return (f"Lines: {lines}   Bytes: {self.size:,}   Showing lines {first:,}-"
+                f"{first + self.doc.line_count() - 1:,} (words in view: {counter.words}){progress}")
+
+    def close(self):
+        """Return the widget to normal editing (its contents are left as they are)."""
+        for after_id in (self._index_id, self._recenter_id):
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+        LARGE_VIEWS.pop(str(self.text), None)
+        set_scroll_target(self.text, None)
+        self.scrollbar.configure(command=self.text.yview)
+        self.text.configure(wrap=self._wrap)
+        self.text.event_generate('<<LargeFileProgress>>', when='tail')
+
+
+class LargeFileSnapshot:
+    """The mapped file with overlays applied, streamed as text chunks or file bytes."""
+
+    def __init__(self, view):
+        self.version = view.doc.version
+        self.file_format = view.file_format
+        self.mm = view.mm
+        self.size = view.size
+        self.offsets = view.offsets
+        self.segments = [list(s) for s in view.segments]
+
+    def snapshot(self):
+        return self
+
+    def _raw(self, first, end):
+        """Original lines [first, end) with their newlines, decoded in chunks."""
+        n = len(self.offsets)
+        pos = self.offsets[first] if first < n else self.size
+        stop = self.offsets[end] if end < n else self.size
+        decoder = self.file_format.decoder()
+        while pos < stop:
+            yield decoder.decode(self.mm[pos:min(pos + LARGE_DECODE_CHUNK, stop)])
+            pos += LARGE_DECODE_CHUNK
+        yield decoder.decode(b'', final=True)
+
+    def iter_chunks(self):
+        n = len(self.offsets)
+        pos = 0
+        for start, end, lines in self.segments:
+            yield from self._raw(pos, start)
+            yield '\n'.join(lines) + ('\n' if end < n else '')
+            pos = end
+        yield from self._raw(pos, n)
+
+    def iter_bytes(self, fmt=None):
+        """The file's bytes: unedited ranges are sliced straight out of the map and
+        only the overlays are encoded. Another `fmt` re-encodes everything."""
+        fmt = fmt or self.file_format
+        if fmt != self.file_format:
+            yield from fmt.encode(self.iter_chunks())
+            return
+        n = len(self.offsets)
+        view = memoryview(self.mm)
+        try:
+            yield fmt.bom
+            pos = 0
+            for start, end, lines in self.segments + [[n, n, None]]:
+                first = self.offsets[pos] if pos < n else self.size
+                stop = self.offsets[start] if start < n else self.size
+                for i in range(first, stop, LARGE_INDEX_CHUNK):
+                    yield view[i:min(i + LARGE_INDEX_CHUNK, stop)]
+                if lines is not None:
+                    yield from fmt.encode(['\n'.join(lines) + ('\n' if end < n else '')], bom=False)
+                pos = end
+        finally:
+            view.release()
+
+
+def open_large_file(root, text_widget, scrollbar, path):
+    """Open `path` in a viewport-only LargeFileView if it is big enough.
+
+    Returns the view, or None when the file should be loaded normally.
+    """
+    close_large_file(text_widget)
+    if is_rich_path(path) or os.path.getsize(path) < LARGE_FILE_THRESHOLD or not sniff_file(path).byte_lines():
+        return None
+    return LargeFileView(root, text_widget, scrollbar, path)
+
+
+def close_large_file(text_widget):
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None:
+        view.close()
+
+# --------------------- End large-file viewport ---------------------
+
+
+# ----------------------- Log viewer -----------------------
+# A read-only LargeFileView for logs and other files that are only read
+# and searched. The newline index is built on a worker thread and cached
+# next to the file (or in SNAPSHOT_DIR when that directory is read-only),
+# keyed by the file's size and mtime, so reopening an unchanged log is
+# instant. Search runs over the mapped bytes; only the window of lines
+# around the viewport is ever decoded. Follow mode watches the file and
+# indexes just the bytes appended to it.
+
+LOG_POLL_MS = 50
+LOG_FOLLOW_MS = 500
+LOG_SEARCH_CHUNK = 64 * 1024 * 1024
+LOG_INLINE_INDEX = 1024 * 1024  # appended bytes indexed on the Tk thread
+LOG_INDEX_CACHE_MIN = 16 * 1024 * 1024  # smaller files are quick to index
+LOG_INDEX_MAGIC = b'PYTXLIN1'
+LOG_EXTENSIONS = ('.log', '.out', '.err')
+_NEWLINE = re.compile(b'\n')
+
+
+def line_index_cache_paths(path):
+    """Where the line index of `path` may be cached: beside it, else in SNAPSHOT_DIR."""
+    path = os.path.abspath(path)
+    key = hashlib.blake2b(path.encode('utf-8', 'surrogatepass'), digest_size=12).hexdigest()
+    return [path + '.pytext-lines', str(SNAPSHOT_DIR / f'{key}.lines')]
+
+
+def load_line_index(path, size, mtime, first=0):
+    """The cached line-start offsets of `path`, or None unless they match `size` and
+    `mtime` and the first line starts at byte `first`."""
+    for cache in line_index_cache_paths(path):
+        try:
+            with open(cache, 'rb') as f:
+                if f.read(len(LOG_INDEX_MAGIC)) != LOG_INDEX_MAGIC:
+                    continue
+                header = array('q')
+                header.frombytes(f.read(16))
+                if list(header) != [size, mtime]:
+                    continue
+                offsets = array('q')
+                offsets.frombytes(f.read())
+        except (OSError, ValueError):
+            continue
+        if offsets and offsets[0] == first:
+            return offsets
+    return None
+
+
+def save_line_index(path, size, mtime, offsets):
+    """Cache `offsets` for `path`; silently skipped where nothing is writable."""
+    for cache in line_index_cache_paths(path):
+        tmp = cache + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(LOG_INDEX_MAGIC)
+                array('q', [size, mtime]).tofile(f)
+                offsets.tofile(f)
+            os.replace(tmp, cache)
+            return cache
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+    return None
+
+
+def index_newlines(mm, start, end, out, cancel):
+    """Worker: put (cancel, offsets after each newline in mm[start:end], bytes scanned) on `out`."""
+    pos = start
+    while pos < end and not cancel.is_set():
+        stop = min(pos + LARGE_INDEX_CHUNK, end)
+        out.put((cancel, array('q', [m.end() for m in _NEWLINE.finditer(mm, pos, stop)]), stop))
+        pos = stop
+
+
+def search_bytes(mm, find, start, size, out, cancel):
+    """Worker: put (cancel, first (start, end) match of `find` from byte `start` on,
+    wrapping around, or None) on `out`. Chunks end at a newline, so a match that does not
+    contain one is never split."""
+    # The wrapped pass runs to the end of the starting line, for a match straddling `start`
+    wrap_end = mm.find(b'\n', start) + 1 or size
+    for first, last in ((start, size), (0, wrap_end)):
+        pos = first
+        while pos < last and not cancel.is_set():
+            stop = min(pos + LOG_SEARCH_CHUNK, last)
+            if stop < last:
+                stop = mm.rfind(b'\n', pos, stop) + 1 or stop
+            match = find(mm, pos, stop)
+            if match:
+                out.put((cancel, match if first == start or match[0] < start else None))
+                return
+            pos = stop
+    out.put((cancel, None))
+
+
+def compile_byte_search(pattern, regex=False, match_case=False, encoding='utf-8'):
+    """A function returning the first (start, end) match of `pattern` in mm[pos:stop],
+    or None, searching bytes in `encoding` (case folding covers ASCII letters only)."""
+    try:
+        source = pattern.encode(encoding)
+    except UnicodeEncodeError:
+        return lambda mm, pos, stop: None  # the file cannot contain it
+    if not regex and (match_case or source.lower() == source.upper()):
+        # Plain bytes.find is several times faster than the regex engine
+        def find(mm, pos, stop):
+            i = mm.find(source, pos, stop)
+            return (i, i + len(source)) if i >= 0 else None
+        return find
+    rx = re.compile(source if regex else re.escape(source), 0 if match_case else re.IGNORECASE)
+
+    def find(mm, pos, stop):
+        m = rx.search(mm, pos, stop)
+        return (m.start(), m.end()) if m and m.end() > m.start() else None
+    return find
+
+
+class LogView(LargeFileView):
+    """A read-only LargeFileView with threaded, cached indexing, byte search and follow mode."""
+
+    def __init__(self, root, text_widget, scrollbar, path):
+        self._results = queue.Queue()
+        self._matches = queue.Queue()
+        self._cancel = threading.Event()
+        self._follow_id = None
+        self._tail = False  # the viewport showed the end when the file last grew
+        self._search = None  # (cancel event, callback) of the search in flight
+        self._search_from = 0
+        self._index_saved = None
+        self._index_id = None  # the _poll_index loop, shared by indexing and search
+        super().__init__(root, text_widget, scrollbar, path)
+        text_widget.configure(state='disabled')
+
+    def _open(self, path):
+        self._cancel.set()  # a worker still indexing the old map stops and is ignored
+        self._cancel = threading.Event()
+        self.path = path
+        self.segments = []
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.size, self.mtime = st.st_size, st.st_mtime_ns
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.file_format = sniff_format(self.mm[:SNIFF_BYTES])
+        if not self.file_format.byte_lines():
+            raise ValueError(f"{os.path.basename(path)} is {self.file_format.label()}; "
+                             "the Log Viewer needs a file whose lines end in a '\\n' byte")
+        first = len(self.file_format.bom)
+        cached = load_line_index(path, self.size, self.mtime, first) if self.size >= LOG_INDEX_CACHE_MIN else None
+        self.offsets = cached if cached is not None else array('q', [first])
+        self._scanned = self.size if cached is not None else 0
+        self._index_saved = (self.size, self.mtime) if cached is not None else None
+        self.indexing = self._scanned < self.size
+
+    # -- line index --
+
+    def _index_step(self):
+        """Start indexing whatever is left on a worker; _poll_index merges its results."""
+        if self.indexing:
+            threading.Thread(target=index_newlines, name='pytext-log-index', daemon=True,
+                             args=(self.mm, self._scanned, self.size, self._results, self._cancel)).start()
+            if self._index_id is None:
+                self._index_id = self.root.after(LOG_POLL_MS, self._poll_index)
+        self.render(self.top())
+        self.text.event_generate('<<LargeFileProgress>>', when='tail')
+
+    def _poll_index(self):
+        self._index_id = None
+        first = len(self.offsets) == 1
+        while True:
+            try:
+                cancel, offsets, scanned = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if cancel is self._cancel:  # otherwise it indexed a map that was replaced
+                self.offsets.extend(offsets)
+                self._scanned = scanned
+        while True:
+            try:
+                cancel, match = self._matches.get_nowait()
+            except queue.Empty:
+                break
+            if self._search is not None and cancel is self._search[0]:
+                self._found(match)
+        was_indexing = self.indexing
+        self.indexing = self._scanned < self.size
+        if was_indexing and not self.indexing:
+            self._indexed()
+        elif first and len(self.offsets) > 1:
+            self.render(self.top())
+        if self.indexing or self._search is not None:
+            self._index_id = self.root.after(LOG_POLL_MS, self._poll_index)
+        self.text.event_generate('<<LargeFileProgress>>', when='tail')
+
+    def _indexed(self):
+        """The index reached the end of the file: show the new lines and cache it."""
+        tail = self.following() and self._tail
+        self._window_version = None  # the last line may have grown
+        self.render(self.total_lines() if tail else self.top())
+        if tail:
+            self.text.see('end')
+        if self.size >= LOG_INDEX_CACHE_MIN and not self.following():
+            self._save_index()
+
+    def _save_index(self):
+        if self._index_saved != (self.size, self.mtime) and not self.indexing:
+            save_line_index(self.path, self.size, self.mtime, self.offsets)
+            self._index_saved = (self.size, self.mtime)
+
+    def render(self, top):
+        self.text.configure(state='normal')
+        try:
+            super().render(top)
+        finally:
+            self.text.configure(state='disabled')
+
+    # -- follow mode --
+
+    def following(self):
+        return self._follow_id is not None
+
+    def follow(self, on=True):
+        """Watch the file, showing lines as they are appended (and restarting if it shrinks)."""
+        if self._follow_id is not None:
+            self.root.after_cancel(self._follow_id)
+            self._follow_id = None
+        if on:
+            self._follow_id = self.root.after(LOG_FOLLOW_MS, self._follow_tick)
+            self._window_version = None
+            self.render(self.total_lines())
+            self.text.see('end')
+        self.text.event_generate('<<LargeFileProgress>>', when='tail')
+
+    def _follow_tick(self):
+        self._follow_id = self.root.after(LOG_FOLLOW_MS, self._follow_tick)
+        if self.indexing:
+            return
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return  # rotated away; keep showing what was mapped
+        if st.st_size < self.size:
+            self.reload(self.path)  # truncated: start over
+        elif st.st_size > self.size:
+            self._grow()
+
+    def _grow(self):
+        """Map the longer file and index only the appended bytes."""
+        start = self.size
+        self._tail = (self.window[2] + self.doc.line_count() >= self._orig_lines()
+                      and self.text.yview()[1] >= 0.999)
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.size, self.mtime = st.st_size, st.st_mtime_ns
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cancel = threading.Event()
+        self.indexing = True
+        if self.size - start <= LOG_INLINE_INDEX:
+            self.offsets.extend(m.end() for m in _NEWLINE.finditer(self.mm, start, self.size))
+            self._scanned = self.size
+            self.indexing = False
+            self._indexed()
+            self.text.event_generate('<<LargeFileProgress>>', when='tail')
+        else:
+            self._index_step()
+
+    # -- search --
+
+    def find_next(self, pattern, regex=False, match_case=False, on_done=None):
+        """Search the mapped bytes from the last match (or the viewport) on, wrapping
+        around; the match is shown and selected, and `on_done(found)` is called."""
+        if self.indexing:
+            raise RuntimeError('The file is still being indexed; try again in a moment.')
+        find = compile_byte_search(pattern, regex, match_case, self.file_format.encoding)
+        if self._search is not None:
+            self._search[0].set()
+        cancel = threading.Event()
+        self._search = (cancel, on_done)
+        if not self._search_from:
+            self._search_from = self.offsets[min(self.top(), len(self.offsets) - 1)]
+        threading.Thread(target=search_bytes, name='pytext-log-search', daemon=True,
+                         args=(self.mm, find, self._search_from, self.size, self._matches, cancel)).start()
+        if self._index_id is None:
+            self._index_id = self.root.after(LOG_POLL_MS, self._poll_index)
+
+    def _found(self, match):
+        on_done = self._search[1]
+        self._search = None
+        if match is not None:
+            start, end = match
+            self._search_from = end
+            line = bisect.bisect_right(self.offsets, start) - 1
+            last = bisect.bisect_right(self.offsets, end) - 1
+            encoding = self.file_format.encoding
+            col = len(self.mm[self.offsets[line]:start].decode(encoding, 'replace'))
+            last_col = len(self.mm[self.offsets[last]:end].decode(encoding, 'replace').rstrip('\r'))
+            self.render(max(line - 5, 0))
+            first = f'{line - self.window[2] + 1}.{col}'
+            self.text.tag_remove('sel', '1.0', tk.END)
+            self.text.tag_add('sel', first, f'{last - self.window[2] + 1}.{last_col}')
+            self.text.mark_set('insert', first)
+            self.text.see(first)
+        if on_done:
+            on_done(match is not None)
+
+    def reset_search(self):
+        """Make the next search start from the viewport again."""
+        self._search_from = 0
+
+    def summary(self, counter):
+        return super().summary(counter) + ('   Following' if self.following() else '') + '   Read-only'
+
+    def close(self):
+        self._cancel.set()
+        if self._search is not None:
+            self._search[0].set()
+            self._search = None
+        if self._follow_id is not None:
+            self.root.after_cancel(self._follow_id)
+            self._follow_id = None
+        if self.size >= LOG_INDEX_CACHE_MIN:
+            self._save_index()
+        super().close()
+
+
+def open_log_viewer(root, path=None):
+    """Show `path` (asked for if None) read-only in its own Log Viewer window."""
+    if path is None:
+        path = filedialog.askopenfilename(parent=root, title='Open Log',
+                                          filetypes=[('Logs', ' '.join('*' + e for e in LOG_EXTENSIONS)),
+                                                     ('All files', '*.*')])
+        if not path:
+            return None
+    win = tk.Toplevel(root)
+    win.title(f'{os.path.basename(path)} - Log Viewer')
+    bar = tk.Frame(win)
+    bar.pack(fill='x', padx=4, pady=4)
+    frame = tk.Frame(win)
+    text = tk.Text(frame, wrap='none', font=('Courier', 10))
+    scrollbar = tk.Scrollbar(frame, command=text.yview)
+    text.config(yscrollcommand=scrollbar.set)
+    attach_document(text)
+    create_status_bar(win, text).pack(side='bottom', fill='x')
+    frame.pack(expand=True, fill='both')
+    scrollbar.pack(side='right', fill='y')
+    text.pack(side='left', expand=True, fill='both')
+    try:
+        view = LogView(win, text, scrollbar, path)
+    except (OSError, ValueError) as e:
+        win.destroy()
+        messagebox.showerror('Log Viewer', f'Could not open {path}:\n{e}', parent=root)
+        return None
+
+    tk.Label(bar, text='Find:').pack(side='left')
+    find_var = tk.StringVar()
+    entry = tk.Entry(bar, textvariable=find_var, width=30)
+    entry.pack(side='left', padx=4)
+    regex_var = tk.BooleanVar(value=False)
+    case_var = tk.BooleanVar(value=False)
+    status = tk.Label(bar, text='', anchor='w')
+
+    def find(event=None):
+        if not find_var.get():
+            return
+        status.config(text='Searching...')
+        try:
+            view.find_next(find_var.get(), regex_var.get(), case_var.get(),
+                           on_done=lambda found: status.config(text='' if found else 'Not found'))
+        except (re.error, RuntimeError) as e:
+            status.config(text=str(e))
+
+    entry.bind('<Return>', find)
+    find_var.trace_add('write', lambda *args: view.reset_search())
+    tk.Button(bar, text='Find Next', command=find).pack(side='left')
+    tk.Checkbutton(bar, text='Regex', variable=regex_var).pack(side='left')
+    tk.Checkbutton(bar, text='Match case', variable=case_var).pack(side='left')
+    follow_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(bar, text='Follow', variable=follow_var,
+                   command=lambda: view.follow(follow_var.get())).pack(side='right')
+    status.pack(side='left', padx=8)
+    win.bind('<Control-f>', lambda e: (entry.focus_set(), 'break'))
+
+    def on_destroy(event):
+        if event.widget is win:
+            try:
+                view.close()
+            except tk.TclError:
+                pass  # its widgets are already gone
+
+    win.bind('<Destroy>', on_destroy)
+    return view
+
+# --------------------- End log viewer ---------------------
+
+
+# ----------------------- Navigation -----------------------
+# Go To Line, bookmarks and the minimap address the document through the
+# PieceTable's LineIndex, so none of them has to walk the text or ask Tk to
+# count lines.
+
+MINIMAP_WIDTH = 80
+MINIMAP_COLUMNS = 120  # line length drawn at full minimap width
+MINIMAP_LINE_PX = 2
+MINIMAP_INTERVAL_MS = 200
+MINIMAPS = {}
+BOOKMARKS = {}
+_MINIMAP = {'shown': True}
+
+
+def visible_lines(text_widget):
+    """(first, last) 0-based document lines on screen; a LargeFileView counts its whole file."""
+    first = int(text_widget.index('@0,0').split('.')[0]) - 1
+    last = int(text_widget.index(f'@0,{text_widget.winfo_height()}').split('.')[0]) - 1
+    view = LARGE_VIEWS.get(str(text_widget))
+    base = view.window[2] if view is not None else 0
+    return base + first, base + last
+
+
+def line_total(text_widget):
+    view = LARGE_VIEWS.get(str(text_widget))
+    return view.total_lines() if view is not None else get_document(text_widget).line_count()
+
+
+def scroll_to_line(text_widget, line):
+    """Show 0-based `line` at the top of the widget without moving the cursor."""
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None:
+        view.render(line)
+    else:
+        text_widget.yview(f'{line + 1}.0')
+
+
+def goto_line(text_widget, line, col=0):
+    """Put the cursor on 1-based `line` at 0-based `col` and scroll it into view."""
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None:
+        line = max(1, min(line, view.total_lines()))
+        view.render(line - 1)
+        index = f'{line - view.window[2]}.{max(col, 0)}'
+    else:
+        doc = get_document(text_widget)
+        index = doc.index(doc.offset_of(line - 1, col))
+    text_widget.tag_remove('sel', '1.0', tk.END)
+    text_widget.mark_set('insert', index)
+    text_widget.see('insert')
+    text_widget.focus_set()
+
+
+def ask_goto_line(parent, text_widget):
+    """Ask for 'line' or 'line:column' (both 1-based) and jump there."""
+    answer = simpledialog.askstring('Go To Line', f"Line (1-{line_total(text_widget):,}), or line:column:",
+                                    parent=parent)
+    if not answer:
+        return
+    try:
+        parts = [int(part) for part in answer.replace(',', '').split(':')]
+    except ValueError:
+        messagebox.showerror('Go To Line', f"Not a line number: {answer}", parent=parent)
+        return
+    goto_line(text_widget, parts[0], parts[1] - 1 if len(parts) > 1 else 0)
+
+
+class Bookmarks:
+    """Bookmarked lines of a document, kept in step with its edits.
+
+    Line numbers rather than offsets are stored, so bookmarks survive the
+    widget being emptied and refilled (a dehydrated tab coming back).
+    """
+
+    def __init__(self, text_widget):
+        self.text = text_widget
+        self.doc = get_document(text_widget)
+        self.lines = []
+        text_widget.tag_configure('bookmark', background='#dde8ff')
+        text_widget.tag_lower('bookmark')
+        self.schedule = throttled(text_widget, self.paint, 0)
+        self.doc.subscribe(self._on_change)
+
+    def _on_change(self, kind, offset, text):
+        if not self.lines:
+            return
+        newlines = text.count('\n')
+        if kind == 'insert' and newlines:
+            line, col = self.doc.line_col(offset)
+            # Breaking a line at its start moves the bookmarked text down
+            self.lines = [l + newlines if l > line or (l == line and col == 0) else l for l in self.lines]
+        elif kind == 'delete' and newlines:
+            line = self.doc.line_of(offset)
+            self.lines = sorted({l - newlines if l > line + newlines else min(l, line) for l in self.lines})
+        self.schedule()
+
+    def set(self, lines):
+        self.lines = sorted(set(lines))
+        self.schedule()
+
+    def toggle(self, line):
+        if line in self.lines:
+            self.lines.remove(line)
+        else:
+            bisect.insort(self.lines, line)
+        self.schedule()
+
+    def after(self, line, step=1):
+        """The next bookmarked line after `line` (or before it, for step -1), wrapping around."""
+        if not self.lines:
+            return None
+        if step > 0:
+            i = bisect.bisect_right(self.lines, line)
+            return self.lines[i % len(self.lines)]
+        i = bisect.bisect_left(self.lines, line)
+        return self.lines[i - 1]
+
+    def paint(self):
+        self.text.tag_remove('bookmark', '1.0', tk.END)
+        count = self.doc.line_count()
+        indices = []
+        for line in self.lines:
+            if line < count:
+                indices += (f'{line + 1}.0', f'{line + 2}.0')
+        add_tag_ranges(self.text, 'bookmark', indices)
+        minimap = MINIMAPS.get(str(self.text))
+        if minimap is not None:
+            minimap.redraw()
+
+    def close(self):
+        self.doc.unsubscribe(self._on_change)
+        self.schedule.cancel()
+
+
+def get_bookmarks(text_widget):
+    key = str(text_widget)
+    if key not in BOOKMARKS:
+        BOOKMARKS[key] = Bookmarks(text_widget)
+        text_widget.bind('<Destroy>', lambda e: str(e.widget) == key and BOOKMARKS.pop(key, None), add='+')
+    return BOOKMARKS[key]
+
+
+def clear_bookmarks(text_widget):
+    bookmarks = BOOKMARKS.get(str(text_widget))
+    if bookmarks is not None:
+        bookmarks.set([])
+
+
+def toggle_bookmark(text_widget):
+    if str(text_widget) in LARGE_VIEWS:
+        text_widget.bell()  # lines of a LargeFileView window move as it pages
+        return
+    get_bookmarks(text_widget).toggle(int(text_widget.index('insert').split('.')[0]) - 1)
+
+
+def jump_to_bookmark(text_widget, step=1):
+    bookmarks = BOOKMARKS.get(str(text_widget))
+    line = int(text_widget.index('insert').split('.')[0]) - 1
+    target = bookmarks.after(line, step) if bookmarks is not None else None
+    if target is None:
+        text_widget.bell()
+        return
+    goto_line(text_widget, target + 1)
+
+
+class Minimap:
+    """A narrow overview of a document drawn beside its Text widget.
+
+    Short documents get MINIMAP_LINE_PX pixels per line; longer ones map a
+    band of lines to each pixel row and draw the length of the band's first
+    line, two O(1) line index lookups per row. The viewport and bookmarks
+    are drawn over it, and clicking or dragging scrolls the text there.
+    """
+
+    def __init__(self, parent, text_widget):
+        self.text = text_widget
+        self.doc = get_document(text_widget)
+        self.canvas = tk.Canvas(parent, width=MINIMAP_WIDTH, background='#f4f4f4', highlightthickness=0)
+        self._px_per_line = MINIMAP_LINE_PX
+        self.redraw = throttled(self.canvas, self.draw, MINIMAP_INTERVAL_MS)
+        self.move_viewport = throttled(self.canvas, self.draw_viewport, 0)
+        self._unsubscribe = subscribe_batched(self.canvas, self.doc, self.redraw)
+        self._remove_scroll = add_scroll_listener(text_widget, self.move_viewport)
+        self.canvas.bind('<Configure>', self.redraw)
+        self.canvas.bind('<Button-1>', self._on_click)
+        self.canvas.bind('<B1-Motion>', self._on_click)
+        self.canvas.bind('<Destroy>', self._on_destroy)
+        text_widget.bind('<<LargeFileProgress>>', self.redraw, add='+')
+
+    def draw(self):
+        canvas = self.canvas
+        canvas.delete('all')
+        height = canvas.winfo_height()
+        total = line_total(self.text)
+        if height <= 1 or total <= 0:
+            return
+        self._px_per_line = min(MINIMAP_LINE_PX, height / total)
+        if str(self.text) not in LARGE_VIEWS:
+            # Line lengths are only known for documents held in a PieceTable
+            doc = self.doc
+            scale = (MINIMAP_WIDTH - 8) / MINIMAP_COLUMNS
+            step = max(self._px_per_line, 1)
+            y = 0.0
+            while y < height:
+                line = int(y / self._px_per_line)
+                if line >= total:
+                    break
+                length = doc.offset_of(line, MINIMAP_COLUMNS) - doc.line_start(line)
+                if length:
+                    canvas.create_line(2, y, 2 + length * scale, y, fill='#9aa4b1', width=min(step, MINIMAP_LINE_PX))
+                y += step
+        bookmarks = BOOKMARKS.get(str(self.text))
+        for line in bookmarks.lines if bookmarks is not None else ():
+            y = line * self._px_per_line
+            canvas.create_rectangle(MINIMAP_WIDTH - 5, y, MINIMAP_WIDTH, y + 3, fill='#3a6fd8', outline='')
+        self.draw_viewport()
+
+    def draw_viewport(self):
+        first, last = visible_lines(self.text)
+        top = first * self._px_per_line
+        bottom = max((last + 1) * self._px_per_line, top + 4)
+        self.canvas.delete('viewport')
+        self.canvas.create_rectangle(1, top, MINIMAP_WIDTH - 1, bottom, outline='#5a6a7a', tags='viewport')
+
+    def _on_click(self, event):
+        first, last = visible_lines(self.text)
+        line = int(max(event.y, 0) / self._px_per_line)
+        scroll_to_line(self.text, max(min(line, line_total(self.text) - 1) - (last - first) // 2, 0))
+
+    def _on_destroy(self, event):
+        if event.widget is not self.canvas:
+            return
+        self._unsubscribe()
+        self._remove_scroll()
+        self.redraw.cancel()
+        self.move_viewport.cancel()
+        MINIMAPS.pop(str(self.text), None)
+
+
+def add_minimap(parent, text_widget):
+    """Create `text_widget`'s minimap, packed beside it unless minimaps are hidden."""
+    minimap = MINIMAPS[str(text_widget)] = Minimap(parent, text_widget)
+    if _MINIMAP['shown']:
+        minimap.canvas.pack(side='right', fill='y', before=text_widget)
+    return minimap
+
+
+def show_minimaps(shown):
+    _MINIMAP['shown'] = shown
+    for minimap in MINIMAPS.values():
+        if shown:
+            minimap.canvas.pack(side='right', fill='y', before=minimap.text)
+            minimap.redraw()
+        else:
+            minimap.canvas.pack_forget()
+
+# --------------------- End navigation ---------------------
+
+
+# ----------------------- Batch mode -----------------------
+# `python project.py batch ...` runs the editor's text operations over many
+# files with no GUI. Files are streamed in LOAD_CHUNK_SIZE pieces rather than
+# read whole, and spread over a process pool.
+
+
+def read_text_chunks(path, size=LOAD_CHUNK_SIZE, fmt=None):
+    """Yield the text of `path` in chunks of about `size` bytes, with '\n' line endings.
+
+    The file is decoded as `fmt`, sniffed from the file when not given.
+    """
+    with open(path, 'rb') as f:
+        if fmt is None:
+            fmt = sniff_format(f.read(SNIFF_BYTES))
+        f.seek(len(fmt.bom))
+        decoder = fmt.decoder()
+        while True:
+            data = f.read(size)
+            chunk = decoder.decode(data, final=not data)
+            if chunk:
+                yield chunk
+            if not data:
+                return
+
+
+def read_line_blocks(path, fmt=None):
+    """Like read_text_chunks, but every block ends at a line boundary."""
+    pending = []
+    for chunk in read_text_chunks(path, fmt=fmt):
+        cut = chunk.rfind('\n') + 1
+        if not cut:
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:cut])
+        yield ''.join(pending)
+        pending = [chunk[cut:]]
+    if pending and pending[0]:
+        yield ''.join(pending)
+
+
+class ChunkStream:
+    """Wraps a chunk generator so write_document can save it like a document."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_chunks(self):
+        return self.chunks
+
+
+def batch_output_path(path, output_dir, ext=None):
+    name = os.path.basename(path)
+    if ext:
+        name = os.path.splitext(name)[0] + ext
+    return os.path.join(output_dir or os.path.dirname(path), name)
+
+
+def batch_count(path):
+    """(words, characters, lines) of `path`, as the status bar counts them."""
+    words = chars = 0
+    lines = 1
+    in_word = False
+    for chunk in read_text_chunks(path):
+        n = len(chunk.split())
+        if in_word and not chunk[0].isspace():
+            n -= 1  # the first word continues the previous chunk's last one
+        words += n
+        chars += len(chunk)
+        lines += chunk.count('\n')
+        in_word = not chunk[-1].isspace()
+    return f"{words}\t{chars}\t{lines}"
+
+
+def batch_replace(path, pattern, replacement, regex=False, whole_word=False, match_case=False, output_dir=None):
+    """Replace every match in `path`, streaming block by block; returns the count.
+
+    Blocks end at line boundaries, so matches never span lines here. The
+    file keeps its encoding and line endings.
+    """
+    rx = compile_search(pattern, regex, whole_word, match_case)
+    fmt = sniff_file(path)
+    total = 0
+
+    def substitute(m):
+        # Empty matches are skipped, as in replace_all
+        nonlocal total
+        if m.end() == m.start():
+            return ''
+        total += 1
+        return m.expand(replacement) if regex else replacement
+
+    blocks = (rx.sub(substitute, block) for block in read_line_blocks(path, fmt))
+    write_document(batch_output_path(path, output_dir), ChunkStream(blocks), fmt)
+    return f"{total} replaced"
+
+
+def batch_convert(path, to, output_dir=None):
+    """Convert between plain text and `.pytx`; returns the new file's path.
+
+    Text is streamed into `.pytx`; a `.pytx` file is one JSON document, so
+    it is parsed whole.
+    """
+    if to == 'pytx':
+        dest = batch_output_path(path, output_dir, RICH_EXTENSIONS[0])
+        chunks = rich_chunks({}, read_text_chunks(path))
+    else:
+        dest = batch_output_path(path, output_dir, '.txt')
+        chunks = iter([read_rich_file(path)['text']])
+    write_document(dest, ChunkStream(chunks))
+    return dest
+
+
+def _batch_call(job, path):
+    """Run one batch job; errors are returned rather than raised across the pool."""
+    func, kwargs = job
+    try:
+        return path, func(path, **kwargs), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def run_batch(func, paths, jobs=None, out=None, **kwargs):
+    """Apply `func(path, **kwargs)` to every path, printing results as they arrive.
+
+    Returns the number of files that failed.
+    """
+    import sys
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    out = out or sys.stdout
+    call = partial(_batch_call, (func, kwargs))
+    jobs = jobs or os.cpu_count() or 1
+    failed = 0
+    if jobs == 1 or len(paths) == 1:
+        results = map(call, paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(call, paths, chunksize=max(1, min(64, len(paths) // (jobs * 4))))
+    try:
+        for path, result, error in results:
+            if error:
+                failed += 1
+                print(f"{path}\tERROR\t{error}", file=sys.stderr)
+            else:
+                print(f"{path}\t{result}", file=out, flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return failed
+
+
+def batch_main(args):
+    """Entry point for `project.py batch ...`; returns the process exit status."""
+    import sys
+    if getattr(args, 'output_dir', None):
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.operation == 'count':
+        failed = run_batch(batch_count, args.files, args.jobs)
+    elif args.operation == 'replace':
+        try:
+            compile_search(args.pattern, args.regex, args.whole_word, args.match_case)
+        except re.error as e:
+            print(f"Invalid pattern: {e}", file=sys.stderr)
+            return 2
+        failed = run_batch(batch_replace, args.files, args.jobs, pattern=args.pattern,
+                           replacement=args.replacement, regex=args.regex, whole_word=args.whole_word,
+                           match_case=args.match_case, output_dir=args.output_dir)
+    else:
+        failed = run_batch(batch_convert, args.files, args.jobs, to=args.to, output_dir=args.output_dir)
+    return 1 if failed else 0
+
+# --------------------- End batch mode ---------------------
+
+
+# ----------------------- Document analytics -----------------------
+# Tools > Document Analytics. Statistics are computed on a worker thread from
+# a frozen snapshot, a chunk at a time, so the panel works the same for a
+# small tab and a multi-gigabyte LargeFileView. Results are cached by content
+# hash; the worker hashes first and only analyses on a miss.
+
+READING_WPM = 230
+TOP_WORDS = 20
+ANALYTICS_CACHE_SIZE = 32
+ANALYTICS_PROGRESS_S = 0.1
+ANALYTICS_CACHE = OrderedDict()
+ANALYTICS_VERSIONS = {}
+
+ANALYTICS_VOCABULARY_MAX = 500_000
+WORD_PUNCTUATION = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\'“”‘’«»…—–'
+
+_SENTENCE_END = re.compile(r'[.!?]+(?=\s|$)')
+# A paragraph starts at the first text after a blank line
+_PARAGRAPH_START = re.compile(r'\n[^\S\n]*\n\s*\S')
+_BLANK_LINE = re.compile(r'\n[^\S\n]*\n')
+
+
+class TextStats:
+    """Streaming character/word/line/sentence/paragraph counts of a text.
+
+    Text is counted a block of whole lines at a time with str methods and
+    regular expressions; the only state carried between blocks is whether
+    the last line was blank and whether it ended a sentence. Word
+    frequencies are counted on whitespace-split tokens and stripped of
+    punctuation when the result is built.
+    """
+
+    def __init__(self):
+        self.characters = 0
+        self.words = 0
+        self.lines = 1
+        self.sentences = 0
+        self.paragraphs = 0
+        self.frequencies = Counter()
+        self._partial = []
+        self._last = '\n\n'  # context for the regexes: blank, 'x\n' open or '.\n' closed
+
+    def feed(self, chunk):
+        self.characters += len(chunk)
+        cut = chunk.rfind('\n')
+        if cut < 0:
+            self._partial.append(chunk)
+            return
+        self._partial.append(chunk[:cut])
+        block = ''.join(self._partial)
+        self._partial = [chunk[cut + 1:]]
+        self.lines += chunk.count('\n')
+        self._block(block)
+
+    def _block(self, block):
+        """Count `block`, a run of complete lines joined without the final newline."""
+        tokens = block.lower().split()
+        self.words += len(tokens)
+        self.frequencies.update(tokens)
+        if len(self.frequencies) > ANALYTICS_VOCABULARY_MAX:
+            # Keep memory bounded on huge files; words seen once cannot make the top list
+            self.frequencies = Counter({w: n for w, n in self.frequencies.items() if n > 1})
+        self.sentences += len(_SENTENCE_END.findall(block))
+        context = self._last + block + '\n'
+        self.paragraphs += len(_PARAGRAPH_START.findall(context))
+        # A paragraph that ends without a full stop (a heading, a list item) still counts as a sentence
+        for m in _BLANK_LINE.finditer(context):
+            end = context[max(m.start() - 80, 0):m.start()].rstrip(' \t\r\f\v')
+            if end and end[-1] not in '\n.!?':
+                self.sentences += 1
+        last = block[block.rfind('\n') + 1:].rstrip()
+        if not last:
+            self._last = '\n\n'
+        else:
+            self._last = '.\n' if last[-1] in '.!?' else 'x\n'
+
+    def top_words(self, n=TOP_WORDS, exact=True):
+        """The `n` most frequent words; inexact merges only the top raw tokens (for progress updates)."""
+        tokens = self.frequencies.items() if exact else self.frequencies.most_common(2 * n)
+        words = Counter()
+        for token, count in tokens:
+            word = token.strip(WORD_PUNCTUATION)
+            if word and not word.isdigit():
+                words[word] += count
+        return sorted(words.most_common(n), key=lambda kv: (-kv[1], kv[0]))
+
+    def result(self, final=False):
+        """Counts so far as a dict; `final` also counts the unterminated last line."""
+        sentences = self.sentences
+        if final:
+            self._block(''.join(self._partial))
+            self._partial = []
+            sentences = self.sentences + (self._last == 'x\n')
+        return {
+            'characters': self.characters,
+            'words': self.words,
+            'lines': self.lines,
+            'sentences': sentences,
+            'paragraphs': self.paragraphs,
+            'reading_minutes': self.words / READING_WPM,
+            'top_words': self.top_words(exact=final),
+        }
+
+
+def analyse_chunks(chunks, progress=None, cancel=None):
+    """TextStats result for a stream of text chunks.
+
+    `progress(partial)` is called at most every ANALYTICS_PROGRESS_S seconds;
+    returns None if the `cancel` event gets set.
+    """
+    stats = TextStats()
+    last = time.monotonic()
+    for chunk in chunks:
+        if cancel is not None and cancel.is_set():
+            return None
+        stats.feed(chunk)
+        if progress is not None and time.monotonic() - last >= ANALYTICS_PROGRESS_S:
+            progress(stats.result())
+            last = time.monotonic()
+    return stats.result(final=True)
+
+
+def analytics_source(text_widget):
+    """A frozen snapshot of what `text_widget` shows: the whole file for a LargeFileView."""
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None:
+        return view.snapshot()
+    return get_document(text_widget).snapshot()
+
+
+def cached_analytics(text_widget):
+    """The cached result for the widget's current content, if it is known without hashing."""
+    doc = get_document(text_widget)
+    seen = ANALYTICS_VERSIONS.get(str(text_widget))
+    if seen is None or seen[0] != doc.version:
+        return None
+    return ANALYTICS_CACHE.get(seen[1])
+
+
+def _remember_analytics(digest, stats):
+    ANALYTICS_CACHE[digest] = stats
+    ANALYTICS_CACHE.move_to_end(digest)
+    while len(ANALYTICS_CACHE) > ANALYTICS_CACHE_SIZE:
+        ANALYTICS_CACHE.popitem(last=False)
+
+
+def compute_analytics(root, text_widget, on_result, on_progress=None):
+    """Analyse the widget's content on a worker thread.
+
+    `on_result(stats)` and `on_progress(partial)` run on the Tk thread via
+    `root.after`. Returns an Event that stops the worker when set.
+    """
+    cancel = threading.Event()
+    stats = cached_analytics(text_widget)
+    if stats is not None:
+        root.after(0, lambda: on_result(stats))
+        return cancel
+    key = str(text_widget)
+    source = analytics_source(text_widget)
+    version = get_document(text_widget).version
+    results = queue.Queue()
+
+    def work():
+        try:
+            digest = content_hash(source.iter_chunks())
+            stats = ANALYTICS_CACHE.get(digest)
+            if stats is None:
+                stats = analyse_chunks(source.iter_chunks(),
+                                       lambda partial: results.put(('progress', partial)), cancel)
+            results.put(('done', (digest, stats)))
+        except Exception as e:
+            results.put(('error', e))
+
+    def poll():
+        while True:
+            try:
+                kind, value = results.get_nowait()
+            except queue.Empty:
+                break
+            if cancel.is_set():
+                return
+            if kind == 'progress':
+                if on_progress is not None:
+                    on_progress(value)
+                continue
+            if kind == 'error':
+                messagebox.showerror('Document Analytics', f"Could not analyse the document:\n{value}")
+                return
+            digest, stats = value
+            if stats is None:
+                return
+            _remember_analytics(digest, stats)
+            ANALYTICS_VERSIONS[key] = (version, digest)
+            on_result(stats)
+            return
+        try:
+            root.after(SaveWorker.POLL_MS, poll)
+        except tk.TclError:
+            cancel.set()
+
+    threading.Thread(target=work, name='pytext-analytics', daemon=True).start()
+    root.after(SaveWorker.POLL_MS, poll)
+    return cancel
+
+
+def format_analytics(stats):
+    minutes = stats['reading_minutes']
+    reading = 'under a minute' if minutes < 1 else f"{round(minutes):,} min"
+    return (f"Characters:\t{stats['characters']:,}\n"
+            f"Words:\t{stats['words']:,}\n"
+            f"Lines:\t{stats['lines']:,}\n"
+            f"Sentences:\t{stats['sentences']:,}\n"
+            f"Paragraphs:\t{stats['paragraphs']:,}\n"
+            f"Reading time:\t{reading}")
+
+
+def show_analytics_panel(root, text_widget):
+    """Open the Document Analytics window for `text_widget`."""
+    dlg = tk.Toplevel(root)
+    dlg.title('Document Analytics')
+    dlg.transient(root)
+    status = tk.Label(dlg, text='Analysing...', anchor='w')
+    status.pack(fill='x', padx=8, pady=(8, 0))
+    counts = tk.Label(dlg, text='', justify='left', anchor='w', font=('Arial', 11))
+    counts.pack(fill='x', padx=8, pady=4)
+    tk.Label(dlg, text='Most frequent words:', anchor='w').pack(fill='x', padx=8)
+    words = tk.Listbox(dlg, height=10, width=36)
+    words.pack(fill='both', expand=True, padx=8, pady=(0, 8))
+    tk.Button(dlg, text='Close', command=dlg.destroy).pack(pady=(0, 8))
+
+    def show(stats, final=True):
+        if not dlg.winfo_exists():
+            return
+        counts.config(text=format_analytics(stats))
+        words.delete(0, tk.END)
+        for word, n in stats['top_words']:
+            words.insert(tk.END, f"{n:>10,}  {word}")
+        if final:
+            status.config(text='')
+        else:
+            status.config(text=f"Analysing... {stats['characters']:,} characters so far")
+
+    try:
+        cancel = compute_analytics(root, text_widget, show, lambda partial: show(partial, final=False))
+    except RuntimeError as e:
+        dlg.destroy()
+        messagebox.showinfo('Document Analytics', str(e))
+        return None
+    dlg.bind('<Destroy>', lambda e: e.widget is dlg and cancel.set())
+    return dlg
+
+# --------------------- End document analytics ---------------------
+
+
+# ----------------------- Find in files -----------------------
+# Find in Files searches a directory tree. A thread walks the tree (skipping
+# FIND_SKIP_DIRS and whatever the .gitignore files along the way exclude)
+# and hands files in batches to a pool of worker processes. A worker skips
+# binaries, rules out a file without decoding it when one bytes.find over
+# its memory map misses, and decodes only the files that may match. The
+# first FIND_INLINE_FILES are searched on the walking thread itself, so hits
+# show before the pool has started; every finished batch is queued and
+# polled into the panel.
+#
+# Each tree has a trigram index, kept in SNAPSHOT_DIR and refreshed from
+# file sizes and mtimes. It holds the distinct 3-byte sequences, ASCII-
+# lowercased, inside the whitespace-separated words of every file. A
+# literal ASCII pattern is only looked for in files that contain all the
+# trigrams of its words, so a repeat search reads a fraction of the tree.
+# Indexing distinct words is several times faster than indexing every byte,
+# and a match's words always lie within the file's words.
+#
+# Limitation: with Match case off, re also matches a few non-ASCII letters
+# that case-fold to ASCII, such as the Kelvin sign for 'k'. The index and
+# the byte check skip files whose only match relies on such a letter, so
+# those matches are not found.
+
+FIND_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+FIND_BATCH_FILES = 32
+FIND_INLINE_FILES = 64
+FIND_FILE_HITS = 1000  # per file
+FIND_MAX_HITS = 20000  # listed in the panel
+FIND_LINE_CHARS = 240
+FIND_POLL_MS = 30
+FIND_SKIP_DIRS = ('.git', '.hg', '.svn')
+TRIGRAM_MAX_FILE = 4 * 1024 * 1024  # larger files are always searched
+TRIGRAM_MAGIC = b'PYTXTRI1'
+TRIGRAM_INDEXES = {}
+_FIND = {'pool': None, 'lock': threading.Lock()}
+
+
+def gitignore_regex(pattern):
+    """Translate a .gitignore pattern (without its '!' or trailing '/') into a regex
+    over '/'-separated paths relative to the .gitignore's directory."""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[' and pattern.find(']', i + 2) > 0:
+            end = pattern.find(']', i + 2)  # a ']' right after '[' is part of the set
+            body = pattern[i + 1:end]
+            out.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            i = end + 1
+            continue
+        elif c == '\\' and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile(('' if anchored else '(?:.*/)?') + ''.join(out) + r'\Z')
+
+
+def read_gitignore(directory):
+    """The rules of `directory`/.gitignore as (regex, negate, dir_only) tuples."""
+    rules = []
+    try:
+        with open(os.path.join(directory, '.gitignore'), 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        line = line[1:] if negate else line
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line:
+            rules.append((gitignore_regex(line), negate, dir_only))
+    return rules
+
+
+def gitignored(rule_sets, rel, is_dir):
+    """Whether path `rel` is ignored by `rule_sets`, [(base, rules)] from the root down.
+
+    As in git, the last matching rule wins and '!' rules re-include.
+    """
+    ignored = False
+    for base, rules in rule_sets:
+        sub = rel[len(base) + 1:] if base else rel
+        for rx, negate, dir_only in rules:
+            if (is_dir or not dir_only) and rx.match(sub):
+                ignored = not negate
+    return ignored
+
+
+def walk_project(root, cancel=None):
+    """Yield (path, rel, size, mtime_ns) for each file under `root`, depth first.
+
+    FIND_SKIP_DIRS and .gitignore'd paths are left out, ignored directories
+    are not entered, and symlinks are not followed.
+    """
+    stack = [(root, '', [('', read_gitignore(root))])]
+    while stack:
+        directory, rel_dir, rule_sets = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if cancel is not None and cancel.is_set():
+                return
+            rel = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file(follow_symlinks=False):
+                    continue
+                if (is_dir and entry.name in FIND_SKIP_DIRS) or gitignored(rule_sets, rel, is_dir):
+                    continue
+                if is_dir:
+                    subdirs.append((entry.path, rel))
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            yield entry.path, rel, st.st_size, st.st_mtime_ns
+        for path, rel in reversed(subdirs):
+            rules = read_gitignore(path)
+            stack.append((path, rel, rule_sets + [(rel, rules)] if rules else rule_sets))
+
+
+def word_trigrams(data):
+    """The distinct 3-byte sequences within the words of `data`, ASCII-lowercased."""
+    trigrams = set()
+    for word in set(data.lower().split()):
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+def file_trigrams(data):
+    """word_trigrams of `data` as one sorted bytes string."""
+    return b''.join(sorted(word_trigrams(data)))
+
+
+def pattern_trigrams(pattern, regex=False):
+    """The trigrams every file matching `pattern` contains, or None if the index
+    cannot rule out files for this search (regex, non-ASCII or short patterns)."""
+    if regex or not pattern.isascii():
+        return None
+    return sorted(word_trigrams(pattern.encode('ascii'))) or None
+
+
+def has_trigrams(blob, wanted):
+    """True if the sorted trigram string `blob` holds every trigram in `wanted`."""
+    n = len(blob) // 3
+
+    def key(i):
+        return blob[3 * i:3 * i + 3]
+
+    for trigram in wanted:
+        i = bisect.bisect_left(range(n), trigram, key=key)
+        if i == n or key(i) != trigram:
+            return False
+    return True
+
+
+class TrigramIndex:
+    """rel path -> (size, mtime_ns, trigrams) for the tree at `root`, cached in SNAPSHOT_DIR.
+
+    The file is the magic, an 8-byte header length, a JSON header giving each
+    path's size, mtime and slice of the data, then the trigram strings. Hold
+    `lock` while reading or updating it.
+    """
 
+    def __init__(self, root):
+        self.root = root
+        key = hashlib.blake2b(root.encode('utf-8', 'surrogatepass'), digest_size=12).hexdigest()
+        self.path = SNAPSHOT_DIR / f'{key}.trigrams'
+        self.lock = threading.Lock()
+        self.files = {}
+        self.dirty = False
+        self._load()
 
-def show_startup_dialog():
-    """Show startup dialog with options to open previous, create new, open file, or exit."""
-    startup_root = tk.Tk()
-    startup_root.title("PyText editor - Welcome")
-    # Make window larger so all buttons are visible and allow resizing
-    startup_root.geometry("600x520")
-    startup_root.minsize(420, 360)
-    startup_root.resizable(True, True)
-    
-    # Load and display logo if available
-    logo_path = Path(__file__).parent / 'logo.png'
-    if logo_path.exists():
+    def _load(self):
         try:
-            from PIL import Image, ImageTk
-            logo_img = Image.open(logo_path).resize((100, 100))
-            logo_photo = ImageTk.PhotoImage(logo_img)
-            logo_label = tk.Label(startup_root, image=logo_photo)
-            logo_label.image = logo_photo  # Keep a reference
-            logo_label.pack(pady=10)
-        except Exception:
-            pass
-    
-    # Title
-    title = tk.Label(startup_root, text="PyText editor", font=("Arial", 18, "bold"))
-    title.pack(pady=5)
-    
-    # Subtitle
-    subtitle = tk.Label(startup_root, text="Choose an action:", font=("Arial", 10))
-    subtitle.pack(pady=5)
-    
-    choice = tk.IntVar(value=-1)
-    
-    # Buttons frame (use expand so buttons are laid out clearly)
-    frame = tk.Frame(startup_root)
-    frame.pack(pady=20, expand=True, fill='both')
-    
-    last_file = load_session()
-    
-    # Option 1: Return from previous session
-    if last_file and os.path.exists(last_file):
-        btn1 = tk.Button(frame, text=f"Return from Previous Session\n({os.path.basename(last_file)})",
-                         height=2, command=lambda: (choice.set(1), startup_root.destroy()))
-        btn1.pack(pady=6, padx=20, fill='x')
-        print(f"Startup: Return button shown for {last_file}")
-    
-    # Option 2: Create new file
-    btn2 = tk.Button(frame, text="Create New File", height=2,
-                     command=lambda: (choice.set(2), startup_root.destroy()))
-    btn2.pack(pady=6, padx=20, fill='x')
-    print("Startup: Create New button shown")
-    
-    # Option 3: Open file
-    btn3 = tk.Button(frame, text="Open File", height=2,
-                     command=lambda: (choice.set(3), startup_root.destroy()))
-    btn3.pack(pady=6, padx=20, fill='x')
-    print("Startup: Open File button shown")
-    
-    # Option 4: Exit
-    btn4 = tk.Button(frame, text="Exit", height=2,
-                     command=lambda: (choice.set(4), startup_root.destroy()))
-    btn4.pack(pady=6, padx=20, fill='x')
-    print("Startup: Exit button shown")
-    
-    startup_root.mainloop()
-    return choice.get()
+            with open(self.path, 'rb') as f:
+                if f.read(len(TRIGRAM_MAGIC)) != TRIGRAM_MAGIC:
+                    return
+                header = json.loads(f.read(int.from_bytes(f.read(8), 'little')))
+                data = f.read()
+        except (OSError, ValueError):
+            return
+        if header.get('root') != self.root:
+            return
+        self.files = {rel: (size, mtime, data[start:start + length])
+                      for rel, (size, mtime, start, length) in header['files'].items()}
+
+    def lookup(self, rel, size, mtime):
+        """The trigrams of `rel` if it is unchanged since they were taken, else None."""
+        entry = self.files.get(rel)
+        return entry[2] if entry is not None and entry[:2] == (size, mtime) else None
+
+    def update(self, rel, size, mtime, blob):
+        self.files[rel] = (size, mtime, blob)
+        self.dirty = True
+
+    def prune(self, seen):
+        """Forget files that were not `seen` by a complete walk."""
+        for rel in self.files.keys() - seen:
+            del self.files[rel]
+            self.dirty = True
+
+    def save(self):
+        """Write the index if it changed; skipped when SNAPSHOT_DIR is not writable."""
+        if not self.dirty:
+            return
+        files, offset = {}, 0
+        for rel, (size, mtime, blob) in self.files.items():
+            files[rel] = [size, mtime, offset, len(blob)]
+            offset += len(blob)
+        header = json.dumps({'root': self.root, 'files': files}).encode('utf-8')
+        tmp = self.path.with_suffix('.tmp')
+        try:
+            SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(TRIGRAM_MAGIC)
+                f.write(len(header).to_bytes(8, 'little'))
+                f.write(header)
+                f.writelines(blob for _, _, blob in self.files.values())
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
 
 
-def word_count(content: str) -> int:
-    return len(content.split())
+def trigram_index(root):
+    """The TrigramIndex of `root`, loaded once per process."""
+    with _FIND['lock']:
+        if root not in TRIGRAM_INDEXES:
+            TRIGRAM_INDEXES[root] = TrigramIndex(root)
+        return TRIGRAM_INDEXES[root]
+
+
+def search_text(path, rx, fmt):
+    """(line, col, line text) of the matches of `rx` in the file, up to FIND_FILE_HITS."""
+    while True:
+        hits, line = [], 0
+        try:
+            for block in read_line_blocks(path, fmt):
+                pos = 0
+                for m in rx.finditer(block):
+                    if m.end() == m.start():
+                        continue
+                    line += block.count('\n', pos, m.start())
+                    pos = m.start()
+                    start = block.rfind('\n', 0, pos) + 1
+                    end = block.find('\n', pos)
+                    hits.append((line + 1, pos - start, block[start:end if end >= 0 else len(block)][:FIND_LINE_CHARS]))
+                    if len(hits) >= FIND_FILE_HITS:
+                        return hits
+                line += block.count('\n', pos)
+            return hits
+        except UnicodeDecodeError:
+            fmt = fallback_format(fmt)
+            if fmt is None:
+                raise
+
+
+def search_file(path, options, index=False):
+    """Worker: (hits, trigrams) of one file for `options` (pattern, regex, whole_word,
+    match_case). `hits` is None for a binary file; `trigrams` is None unless `index`
+    is set and the file can be indexed (binaries index as b'')."""
+    pattern, regex, whole_word, match_case = options
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(SNIFF_BYTES)
+        fmt = sniff_format(head)
+        ascii_bytes = not fmt.encoding.startswith(('utf-16', 'utf-32'))
+        if not size or (b'\0' in head and ascii_bytes):
+            return (None if size else []), (b'' if index else None)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        blob = file_trigrams(mm[:]) if index and ascii_bytes and size <= TRIGRAM_MAX_FILE else None
+        if ascii_bytes and not regex and pattern.isascii() and '\n' not in pattern:
+            # Most files do not contain the pattern at all: rule them out without decoding
+            if compile_byte_search(pattern, False, match_case)(mm, 0, size) is None:
+                return [], blob
+    finally:
+        mm.close()
+    return search_text(path, compile_search(pattern, regex, whole_word, match_case), fmt), blob
+
+
+def search_files(batch, options):
+    """Worker: search_file over (path, rel, size, mtime, index) items; errors are returned, not raised."""
+    results = []
+    for path, rel, size, mtime, index in batch:
+        try:
+            hits, blob = search_file(path, options, index)
+            results.append((path, rel, size, mtime, hits, blob, None))
+        except Exception as e:
+            results.append((path, rel, size, mtime, None, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def find_pool():
+    """The Find in Files worker processes, started on first use and kept for later searches.
+
+    They are spawned rather than forked: the editor process runs Tk and
+    threads. False once they have failed, when FileSearch works alone.
+    """
+    with _FIND['lock']:
+        if _FIND['pool'] is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _FIND['pool'] = ProcessPoolExecutor(FIND_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _FIND['pool']
+
+
+class FileSearch:
+    """One Find in Files run over the tree at `root`, on a thread of its own.
+
+    `results` receives ('file', path, rel, hits) and ('error', path, message)
+    as files are searched (path is None for errors not about one file),
+    then ('done', stats). Raises re.error for a bad
+    pattern.
+    """
+
+    def __init__(self, root, pattern, regex=False, whole_word=False, match_case=False):
+        compile_search(pattern, regex, whole_word, match_case)
+        self.root = os.path.abspath(root)
+        self.options = (pattern, regex, whole_word, match_case)
+        self.results = queue.Queue()
+        self.cancel = threading.Event()
+        self.stats = {'files': 0, 'searched': 0, 'skipped': 0, 'binary': 0, 'matches': 0}
+        threading.Thread(target=self._run, name='pytext-find-files', daemon=True).start()
 
+    def stop(self):
+        self.cancel.set()
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            index = trigram_index(self.root)
+            with index.lock:
+                self._search(index)
+        except Exception as e:
+            self.results.put(('error', self.root, f"{type(e).__name__}: {e}"))
+        self.stats['seconds'] = time.perf_counter() - t0
+        self.results.put(('done', dict(self.stats)))
+
+    def _search(self, index):
+        wanted = pattern_trigrams(self.options[0], self.options[1])
+        seen, pending, batch = set(), {}, []  # pending: future -> its batch
+        inline = FIND_INLINE_FILES
+        for path, rel, size, mtime in walk_project(self.root, self.cancel):
+            seen.add(rel)
+            self.stats['files'] += 1
+            blob = index.lookup(rel, size, mtime)
+            if blob is not None and wanted and not has_trigrams(blob, wanted):
+                self.stats['skipped'] += 1
+                continue
+            batch.append((path, rel, size, mtime, blob is None))
+            if inline > 0:
+                inline -= 1
+                self._collect(index, search_files(batch, self.options))
+                batch = []
+            elif len(batch) >= FIND_BATCH_FILES:
+                self._submit(index, pending, batch)
+                batch = []
+            self._drain(index, pending, 0)
+        if batch and not self.cancel.is_set():
+            self._submit(index, pending, batch)
+        while pending and not self.cancel.is_set():
+            self._drain(index, pending, 0.1)
+        if self.cancel.is_set():
+            for future in pending:
+                future.cancel()
+        else:
+            index.prune(seen)
+        index.save()
 
+    def _submit(self, index, pending, batch):
+        from concurrent.futures import BrokenExecutor
+        try:
+            if _FIND['pool'] is not False:
+                pending[find_pool().submit(search_files, batch, self.options)] = batch
+                return
+        except BrokenExecutor as e:
+            self._pool_failed(e)
+        self._collect(index, search_files(batch, self.options))
+
+    def _drain(self, index, pending, timeout):
+        """Collect the batches that finish within `timeout` seconds."""
+        from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+        if not pending:
+            return
+        done, _ = wait(pending, timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = pending.pop(future)
+            try:
+                results = future.result()
+            except BrokenExecutor as e:
+                self._pool_failed(e)
+                results = search_files(batch, self.options)
+            self._collect(index, results)
+
+    def _pool_failed(self, error):
+        """The workers could not start or died: this and later searches run on their own thread."""
+        with _FIND['lock']:
+            _FIND['pool'] = False
+        self.results.put(('error', None, f"Worker processes failed ({error}); searching without them"))
+
+    def _collect(self, index, results):
+        for path, rel, size, mtime, hits, blob, error in results:
+            if blob is not None:
+                index.update(rel, size, mtime, blob)
+            if error:
+                self.results.put(('error', path, error))
+            elif hits is None:
+                self.stats['binary'] += 1
+            else:
+                self.stats['searched'] += 1
+                if hits:
+                    self.stats['matches'] += len(hits)
+                    self.results.put(('file', path, rel, hits))
+
+
+def show_find_in_files(root, directory=None):
+    """Edit > Find in Files: search a directory tree; double-click a hit to open it."""
+    win = tk.Toplevel(root)
+    win.title('Find in Files')
+    win.transient(root)
+    form = tk.Frame(win)
+    form.pack(fill='x', padx=8, pady=(8, 4))
+    find_var = tk.StringVar()
+    dir_var = tk.StringVar(value=directory or os.getcwd())
+    tk.Label(form, text='Find:').grid(row=0, column=0, sticky='w')
+    find_entry = tk.Entry(form, textvariable=find_var, width=48)
+    find_entry.grid(row=0, column=1, sticky='we', padx=4)
+    tk.Label(form, text='In:').grid(row=1, column=0, sticky='w')
+    tk.Entry(form, textvariable=dir_var).grid(row=1, column=1, sticky='we', padx=4, pady=(4, 0))
+
+    def browse():
+        path = filedialog.askdirectory(parent=win, initialdir=dir_var.get())
+        if path:
+            dir_var.set(path)
+
+    tk.Button(form, text='Browse...', command=browse).grid(row=1, column=2, pady=(4, 0))
+    form.columnconfigure(1, weight=1)
+
+    options = tk.Frame(win)
+    options.pack(fill='x', padx=8)
+    regex_var, word_var, case_var = tk.BooleanVar(), tk.BooleanVar(), tk.BooleanVar()
+    tk.Checkbutton(options, text='Regex', variable=regex_var).pack(side='left')
+    tk.Checkbutton(options, text='Whole word', variable=word_var).pack(side='left')
+    tk.Checkbutton(options, text='Match case', variable=case_var).pack(side='left')
+    stop_btn = tk.Button(options, text='Stop', state='disabled')
+    stop_btn.pack(side='right')
+    tk.Button(options, text='Search', command=lambda: start()).pack(side='right', padx=4)
+
+    body = tk.Frame(win)
+    body.pack(expand=True, fill='both', padx=8, pady=4)
+    tree = ttk.Treeview(body, columns=('line', 'text'), height=18)
+    tree.heading('#0', text='File')
+    tree.column('#0', width=260)
+    tree.heading('line', text='Line')
+    tree.column('line', width=60, anchor='e')
+    tree.heading('text', text='Text')
+    tree.column('text', width=480)
+    scrollbar = tk.Scrollbar(body, command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side='right', fill='y')
+    tree.pack(side='left', expand=True, fill='both')
+    status = tk.Label(win, anchor='w')
+    status.pack(fill='x', padx=8, pady=(0, 8))
+
+    state = {'search': None, 'after_id': None, 'hits': 0, 'files': 0, 'errors': None}
+    targets = {}  # tree item -> (path, line, col)
+
+    def stop():
+        if state['search'] is not None:
+            state['search'].stop()
+
+    def start(event=None):
+        stop()
+        if state['after_id'] is not None:
+            win.after_cancel(state['after_id'])
+            state['after_id'] = None
+        if not find_var.get():
+            return
+        if not os.path.isdir(dir_var.get()):
+            status.config(text=f"Not a directory: {dir_var.get()}")
+            return
+        try:
+            state['search'] = FileSearch(dir_var.get(), find_var.get(), regex_var.get(), word_var.get(), case_var.get())
+        except re.error as e:
+            status.config(text=f'Invalid pattern: {e}')
+            return
+        tree.delete(*tree.get_children())
+        targets.clear()
+        state.update(hits=0, files=0, errors=None)
+        status.config(text='Searching...')
+        stop_btn.config(state='normal')
+        state['after_id'] = win.after(FIND_POLL_MS, poll)
+
+    def poll():
+        state['after_id'] = None
+        search = state['search']
+        while True:
+            try:
+                message = search.results.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'done':
+                stats = message[1]
+                stopped = 'Stopped: ' if search.cancel.is_set() else ''
+                shown = f' (first {FIND_MAX_HITS:,} listed)' if stats['matches'] > FIND_MAX_HITS else ''
+                errors = len(tree.get_children(state['errors'])) if state['errors'] else 0
+                status.config(text=f"{stopped}{stats['matches']:,} matches{shown} in {state['files']:,} files; "
+                                   f"{stats['files']:,} files, {stats['searched']:,} searched, "
+                                   f"{stats['skipped']:,} ruled out by the index, {stats['binary']:,} binary"
+                                   f"{f', {errors:,} errors (listed first)' if errors else ''}; "
+                                   f"{stats['seconds']:.2f} s")
+                stop_btn.config(state='disabled')
+                state['search'] = None
+                return
+            if message[0] == 'error':
+                # Problems are listed under an Errors row at the top rather than lost
+                if state['errors'] is None:
+                    state['errors'] = tree.insert('', 0, text='Errors', open=True)
+                _, path, error = message
+                where = os.path.relpath(path, search.root) if path else 'Find in Files'
+                tree.insert(state['errors'], 'end', text=where, values=('', error))
+                continue
+            _, path, rel, hits = message
+            hits = hits[:max(FIND_MAX_HITS - state['hits'], 0)]
+            if not hits:
+                continue
+            state['hits'] += len(hits)
+            state['files'] += 1
+            label = f"{len(hits)} match{'es' if len(hits) != 1 else ''}"
+            parent = tree.insert('', 'end', text=rel, values=('', label), open=len(tree.get_children()) < 50)
+            targets[parent] = (path, hits[0][0], hits[0][1])
+            for line, col, text in hits:
+                targets[tree.insert(parent, 'end', values=(line, text.strip()))] = (path, line, col)
+        status.config(text=f"Searching... {state['hits']:,} matches in {state['files']:,} files")
+        state['after_id'] = win.after(FIND_POLL_MS, poll)
+
+    def open_selected(event=None):
+        target = targets.get(tree.focus())
+        if target is not None:
+            open_file_internal(*target)
+
+    stop_btn.config(command=stop)
+    find_entry.bind('<Return>', start)
+    tree.bind('<Double-1>', open_selected)
+    tree.bind('<Return>', open_selected)
+
+    def on_destroy(event):
+        if event.widget is win:
+            stop()
+            if state['after_id'] is not None:
+                win.after_cancel(state['after_id'])
+
+    win.bind('<Destroy>', on_destroy)
+    find_entry.focus_set()
+    return win
+
+# --------------------- End find in files ---------------------
+
+
+@timed('toggle_tag')
 def toggle_tag(text_widget, tag_name, font_kwargs):
     try:
         start = text_widget.index("sel.first")
@@ -243,9 +5074,11 @@ def toggle_tag(text_widget, tag_name, font_kwargs):
     except tk.TclError:
         messagebox.showinfo("Selection required", "Select text to format.")
         return
-    current_font = font.Font(text_widget, text_widget.cget("font"))
-    current_font.configure(**font_kwargs)
-    text_widget.tag_configure(tag_name, font=current_font)
+    family, size, weight, slant, underline = FONTS.base_props(text_widget)
+    props = (font_kwargs.get('family', family), font_kwargs.get('size', size),
+             font_kwargs.get('weight', weight), font_kwargs.get('slant', slant),
+             font_kwargs.get('underline', underline))
+    FONTS.configure_tag(text_widget, tag_name, props)
     if text_widget.tag_nextrange(tag_name, start, end):
         text_widget.tag_remove(tag_name, start, end)
     else:
@@ -268,38 +5101,396 @@ def make_title(text_widget):
     except tk.TclError:
         start = text_widget.index("insert linestart")
         end = text_widget.index("insert lineend")
-    base_font = font.Font(text_widget, text_widget.cget("font"))
-    title_font = font.Font(text_widget, text_widget.cget("font"))
-    title_font.configure(size=base_font['size'] + 8, weight="bold")
-    text_widget.tag_configure("title", font=title_font, justify="center")
+    family, size, _, slant, underline = FONTS.base_props(text_widget)
+    size = size + 8 if size > 0 else size - 8  # negative sizes are pixels
+    FONTS.configure_tag(text_widget, "title", (family, size, "bold", slant, underline), justify="center")
     text_widget.tag_add("title", start, end)
 
 
-def open_file_internal(file_path):
-    """Internal function to open a file directly by path."""
-    global CURRENT_PATH, IS_DIRTY
-    if os.path.exists(file_path):
+def open_file_internal(file_path, line=None, col=0):
+    """Internal function to open a file directly by path.
+
+    A file that is already open just has its tab selected; otherwise it
+    opens in the current tab if that is an untouched Untitled document, or
+    in a new tab. With `line` (1-based) the cursor goes to `line`:`col`
+    once the text is loaded.
+    """
+    if not os.path.exists(file_path):
+        return
+    doc = DOC_MANAGER.find(file_path)
+    if doc is not None:
+        DOC_MANAGER.notebook.select(doc.frame)
+        if line is not None:
+            goto_when_loaded(doc.text, line, col)
+        return
+    doc = DOC_MANAGER.blank()
+    text = doc.text
+    release_document_fonts(text)
+    clear_bookmarks(text)
+    stop = perf_stopwatch('open_file')
+
+    def done(path):
+        stop()
+        doc.path = path
+        doc.dirty = False
+        doc.title = os.path.basename(path)
+        if DOC_MANAGER.current() is doc:
+            DOC_MANAGER.title_var.set(doc.title)
+        if str(text) in JOURNALS:
+            JOURNALS[str(text)].rebase(path)
+        update_highlighting(text, path)
+        update_title()
+        if line is not None:
+            goto_line(text, line, col)
+
+    def cancelled():
+        doc.path = None
+        doc.dirty = False
+        if str(text) in JOURNALS:
+            JOURNALS[str(text)].rebase(None)
+        update_highlighting(text, None)
+        update_title()
+
+    load_document(APP_ROOT, text, file_path, on_done=done, on_cancel=cancelled,
+                     on_error=lambda e: messagebox.showerror("Error", f"Failed to open file: {e}"))
+
+
+def goto_when_loaded(text_widget, line, col=0):
+    """goto_line once the widget is no longer streaming a file in (a tab being rehydrated)."""
+    if str(text_widget) in LOAD_JOBS:
+        text_widget.after(FIND_POLL_MS, lambda: goto_when_loaded(text_widget, line, col))
+    else:
+        goto_line(text_widget, line, col)
+
+
+# ----------------------- Plugins -----------------------
+# Updates and plugins are .py files kept in PLUGIN_DIR. Nothing is imported
+# until a plugin is run: the registry in PLUGIN_REGISTRY remembers each file's
+# entry point, found by parsing it (never executing it) and re-parsed only
+# when the file changes. Trusted plugins are imported into the editor on
+# first use and get the full app context. Every other plugin runs in a
+# worker process that is sent the document, and sends back edits and
+# messages as JSON lines. A plugin that takes longer than PLUGIN_TIMEOUT_S
+# gets its worker killed. The worker is isolated, not secured: it cannot
+# freeze or crash the editor, but it runs with the user's permissions.
+
+PLUGIN_DIR = Path(__file__).parent / 'updates'
+PLUGIN_REGISTRY = Path.home() / '.pytext_plugins.json'
+PLUGIN_ENTRY_POINTS = ('apply_update', 'apply', 'update', 'main', 'install_update')
+PLUGIN_CONTEXT_NAMES = ('app', 'app_ctx', 'ctx')
+PLUGIN_TIMEOUT_S = 10
+PLUGIN_MEMORY_LIMIT = 1024 * 1024 * 1024  # address space of the worker, where supported
+PLUGIN_HOST = None
+
+
+def scan_plugin(path):
+    """Registry entry for `path`: its entry point, parameter names and summary."""
+    import ast
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=str(path))
+    functions = {node.name: node for node in tree.body
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    entry = next((name for name in PLUGIN_ENTRY_POINTS if name in functions), None)
+    params = []
+    if entry:
+        args = functions[entry].args
+        params = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+    doc = ast.get_docstring(functions[entry]) if entry else None
+    doc = doc or ast.get_docstring(tree) or ''
+    st = os.stat(path)
+    return {'path': str(path), 'size': st.st_size, 'mtime': st.st_mtime_ns, 'entry': entry,
+            'params': params, 'summary': doc.strip().split('\n')[0], 'trusted': False}
+
+
+def call_plugin(func, params, ctx, mapping):
+    """Call an entry point the way its parameter list asks for.
+
+    No parameters: func(); one: func(ctx); otherwise each parameter named
+    in `mapping` (or a context name) is passed by keyword, falling back to
+    func(ctx).
+    """
+    if not params:
+        return func()
+    if len(params) == 1:
+        return func(ctx)
+    kwargs = {name: ctx if name in PLUGIN_CONTEXT_NAMES else mapping[name]
+              for name in params if name in mapping or name in PLUGIN_CONTEXT_NAMES}
+    return func(**kwargs) if kwargs else func(ctx)
+
+
+def load_plugin_module(path):
+    import importlib.util
+    name = 'pytext_plugin_' + hashlib.blake2b(str(path).encode(), digest_size=6).hexdigest()
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PluginRegistry:
+    """Known plugins by file name, cached in PLUGIN_REGISTRY."""
+
+    def __init__(self, path=PLUGIN_REGISTRY):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.plugins = json.load(f)
+        except (OSError, ValueError):
+            self.plugins = {}
+
+    def save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.plugins, f)
+        except OSError:
+            pass
+
+    def refresh(self, path):
+        """Entry for `path`, parsing the file only if it is new or has changed."""
+        st = os.stat(path)
+        name = os.path.basename(path)
+        entry = self.plugins.get(name)
+        if entry is None or (entry['path'], entry['size'], entry['mtime']) != (str(path), st.st_size, st.st_mtime_ns):
+            trusted = bool(entry and entry['path'] == str(path) and entry.get('trusted'))
+            entry = scan_plugin(path)
+            entry['trusted'] = trusted
+            self.plugins[name] = entry
+            self.save()
+        return entry
+
+    def set_trusted(self, name, trusted):
+        self.plugins[name]['trusted'] = trusted
+        self.save()
+
+    def available(self):
+        """Registered plugins whose files still exist, by name."""
+        return {name: entry for name, entry in sorted(self.plugins.items()) if os.path.exists(entry['path'])}
+
+
+class PluginHost:
+    """Runs plugins for the editor: trusted ones in-process, others in a worker.
+
+    Worker requests are {"id", "op": "run", "path", "entry", "params",
+    "app": {"text", "path", "title", "selection"}}; replies carry the same
+    id with "type" "message" (text to show), "done" (a list of
+    [start, end, replacement] edits) or "error". Replies are read on a
+    thread and handled on the Tk thread from a `root.after` poll, which
+    also enforces the timeouts.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root):
+        self.root = root
+        self.registry = PluginRegistry()
+        self.modules = {}  # path -> (mtime, module) of trusted plugins already imported
+        self._proc = None
+        self._replies = queue.Queue()
+        self._pending = {}  # request id -> {'deadline', 'on_message', 'on_done', 'on_error'}
+        self._next_id = 0
+        self._polling = False
+
+    # -- trusted, in-process --
+
+    def run_trusted(self, entry, ctx):
+        mtime, module = self.modules.get(entry['path'], (None, None))
+        if module is None or mtime != entry['mtime']:
+            module = load_plugin_module(entry['path'])
+            self.modules[entry['path']] = (entry['mtime'], module)
+        return call_plugin(getattr(module, entry['entry']), entry['params'], ctx, ctx)
+
+    # -- sandboxed, in the worker --
+
+    def _spawn(self):
+        import subprocess
+        import sys
+        self._proc = subprocess.Popen([sys.executable, '-I', os.path.abspath(__file__), 'plugin-worker'],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      text=True, encoding='utf-8', bufsize=1)
+        proc = self._proc
+        threading.Thread(target=self._read, args=(proc,), name='pytext-plugins', daemon=True).start()
+
+    def _read(self, proc):
+        for line in proc.stdout:
+            try:
+                self._replies.put((proc, json.loads(line)))
+            except ValueError:
+                pass
+        self._replies.put((proc, None))
+
+    def run_sandboxed(self, entry, app, on_done, on_message=None, on_error=None, timeout=PLUGIN_TIMEOUT_S):
+        """Send `app` to the worker and run `entry` there; `on_done(edits)` gets its edits."""
+        if self._proc is None or self._proc.poll() is not None:
+            self._spawn()
+        self._next_id += 1
+        request = {'id': self._next_id, 'op': 'run', 'path': entry['path'], 'entry': entry['entry'],
+                   'params': entry['params'], 'app': app}
+        self._pending[self._next_id] = {'deadline': time.monotonic() + timeout, 'timeout': timeout, 'on_done': on_done,
+                                        'on_message': on_message, 'on_error': on_error}
+        try:
+            self._proc.stdin.write(json.dumps(request) + '\n')
+            self._proc.stdin.flush()
+        except OSError as e:
+            self._fail_all(RuntimeError(f"The plugin worker stopped: {e}"))
+            return
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                proc, reply = self._replies.get_nowait()
+            except queue.Empty:
+                break
+            if proc is not self._proc:
+                continue  # from a worker that was already killed
+            if reply is None:
+                self._proc = None
+                self._fail_all(RuntimeError('The plugin worker exited unexpectedly.'))
+                continue
+            job = self._pending.get(reply.get('id'))
+            if job is None:
+                continue
+            if reply['type'] == 'message':
+                if job['on_message']:
+                    job['on_message'](reply['text'])
+                continue
+            del self._pending[reply['id']]
+            if reply['type'] == 'done':
+                job['on_done'](reply.get('edits', []))
+            elif job['on_error']:
+                job['on_error'](RuntimeError(reply.get('error', 'Plugin failed')))
+        now = time.monotonic()
+        late = [job for job in self._pending.values() if job['deadline'] < now]
+        if late:
+            # The worker runs one request at a time, so a late one holds up the rest too
+            self.stop()
+            self._fail_all(TimeoutError(f"The plugin did not finish within {late[0]['timeout']} seconds and was stopped."))
+        if self._pending:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _fail_all(self, error):
+        pending, self._pending = self._pending, {}
+        for job in pending.values():
+            if job['on_error']:
+                job['on_error'](error)
+
+    def stop(self):
+        """Kill the worker (a new one starts with the next sandboxed run)."""
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def plugin_host(root):
+    global PLUGIN_HOST
+    if PLUGIN_HOST is None:
+        PLUGIN_HOST = PluginHost(root)
+    return PLUGIN_HOST
+
+
+def plugin_app_context(root, text_widget, title_var):
+    """What a trusted plugin's entry point receives."""
+    return {
+        'root': root,
+        'text': text_widget,
+        'title_var': title_var,
+        'save_file': save_file,
+        'open_file': open_file,
+        'new_file': new_file,
+        'make_bold': make_bold,
+        'make_italic': make_italic,
+        'make_title': make_title,
+        'update_title': update_title,
+        'CURRENT_PATH': lambda: current_document().path,
+    }
+
+
+def run_plugin(root, name, text_widget, title_var):
+    """Run registered plugin `name` against `text_widget`, reporting the outcome."""
+    host = plugin_host(root)
+    entry = host.registry.refresh(host.registry.plugins[name]['path'])
+    if entry['trusted']:
         try:
-            text = find_text_widget()
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            text.delete("1.0", tk.END)
-            text.insert(tk.END, content)
-            CURRENT_PATH = file_path
-            IS_DIRTY = False
-            update_title()
+            host.run_trusted(entry, plugin_app_context(root, text_widget, title_var))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to open file: {e}")
+            messagebox.showerror("Plugin Error", f"Error while running {name}:\n{e}")
+            return
+        messagebox.showinfo("Plugin", f"{name} finished.")
+        return
+    if str(text_widget) in LARGE_VIEWS:
+        messagebox.showinfo("Plugin", "Sandboxed plugins cannot run on a file open in the large-file view.")
+        return
+    doc = get_document(text_widget)
+    version = doc.version
+    try:
+        selection = [doc.offset_of(*_line_col(text_widget.index(i))) for i in ('sel.first', 'sel.last')]
+    except tk.TclError:
+        selection = None
+    current = current_document()
+    app = {'text': doc.text(), 'path': current.path if current else OFF_APP_STATE['current_path'],
+           'title': title_var.get(), 'selection': selection}
+
+    def done(edits):
+        if doc.version != version:
+            messagebox.showwarning("Plugin", f"The document changed while {name} ran; its edits were not applied.")
+            return
+        try:
+            edits = check_plugin_edits(edits, len(doc))
+        except ValueError as e:
+            messagebox.showerror("Plugin Error", f"{name} sent invalid edits, none were applied:\n{e}")
+            return
+        apply_edits(text_widget, edits)
+        messagebox.showinfo("Plugin", f"{name} finished ({len(edits)} edit{'s' if len(edits) != 1 else ''}).")
+
+    host.run_sandboxed(entry, app, done,
+                       on_message=lambda text: messagebox.showinfo(name, text),
+                       on_error=lambda e: messagebox.showerror("Plugin Error", f"{name} failed:\n{e}"))
+
+
+def _line_col(index):
+    line, col = map(int, index.split('.'))
+    return line - 1, col
+
+
+def check_plugin_edits(edits, length):
+    """Validate edits sent by a sandboxed plugin for a document of `length` characters.
+
+    Returns them as sorted (start, end, text) tuples, as apply_edits needs;
+    raises ValueError unless each is an int range within the document with
+    string text and no two overlap.
+    """
+    if not isinstance(edits, list):
+        raise ValueError("edits must be a list")
+    checked = []
+    for edit in edits:
+        if not (isinstance(edit, (list, tuple)) and len(edit) == 3):
+            raise ValueError(f"not a (start, end, text) edit: {edit!r:.80}")
+        start, end, new = edit
+        if type(start) is not int or type(end) is not int or not isinstance(new, str):
+            raise ValueError(f"not a (start, end, text) edit: {edit!r:.80}")
+        if not 0 <= start <= end <= length:
+            raise ValueError(f"range {start}-{end} is not a range within the document (0-{length})")
+        checked.append((start, end, new))
+    checked.sort(key=lambda edit: (edit[0], edit[1]))
+    for prev, edit in zip(checked, checked[1:]):
+        if edit[0] < prev[1] or edit[0] == prev[0]:
+            raise ValueError(f"ranges {prev[0]}-{prev[1]} and {edit[0]}-{edit[1]} overlap")
+    return checked
 
 
 def install_update(root, text_widget, title_var):
-    """Let user select a .py file and run its `apply_update` function if present.
+    """Let the user pick a .py update, register it and offer to run it.
 
-    The update module should expose one of:
-      - apply_update(app): a function that accepts an app-context dict and applies changes
-      - This runs the code in the update file, so only install files you trust.
+    The file is copied into PLUGIN_DIR and registered (parsed, not run).
+    Its entry point is one of PLUGIN_ENTRY_POINTS, e.g. apply_update(app).
+    Running it sandboxed is the default; with full access it gets the
+    editor's app context and runs inside the editor.
     """
-    # Ask for confirmation (security warning)
     ok = messagebox.askyesno("Install Update",
                              "Install a Python update file (.py)?\n\nWARNING: This will execute code from the selected file. Only install updates you trust. Continue?")
     if not ok:
@@ -309,128 +5500,132 @@ def install_update(root, text_widget, title_var):
     if not path:
         return
 
-    # Optionally copy the update file to an updates/ folder for record
-    updates_dir = Path(__file__).parent / 'updates'
-    updates_dir.mkdir(exist_ok=True)
+    # Keep a copy in the plugin folder so it shows up under Tools > Plugins
+    PLUGIN_DIR.mkdir(exist_ok=True)
+    dest = PLUGIN_DIR / Path(path).name
     try:
-        dest = updates_dir / Path(path).name
-        shutil.copy2(path, dest)
+        if Path(path).resolve() != dest.resolve():
+            shutil.copy2(path, dest)
     except Exception:
-        dest = None
+        dest = Path(path)
 
+    host = plugin_host(root)
     try:
-        spec = importlib.util.spec_from_file_location("pytext_update", path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-    except Exception as e:
-        messagebox.showerror("Update Failed", f"Failed to load update file:\n{e}")
+        entry = host.registry.refresh(dest)
+    except (OSError, SyntaxError, ValueError) as e:
+        messagebox.showerror("Update Failed", f"Failed to read update file:\n{e}")
         return
 
-    # Build a minimal app-context to pass to the update
-    app_ctx = {
-        'root': root,
-        'text': text_widget,
-        'title_var': title_var,
-        'save_file': save_file,
-        'open_file': open_file,
-        'new_file': new_file,
-        'make_bold': make_bold,
-        'make_italic': make_italic,
-        'make_title': make_title,
-        'update_title': update_title,
-        'CURRENT_PATH': lambda: CURRENT_PATH,
-    }
-
-    # Look for common callable entry points in the module (try several names)
-    candidates = [name for name in ('apply_update', 'apply', 'update', 'main', 'install_update')
-                  if hasattr(module, name) and callable(getattr(module, name))]
-    try:
-        if candidates:
-            chosen = candidates[0]
-            # Confirm before calling
-            ok = messagebox.askyesno("Run update function",
-                                     f"Found function `{chosen}` in the selected file. Run it now?\n\nThis function will be called with the app context and may modify the UI or files.")
-            if not ok:
-                messagebox.showinfo("Update Skipped", "Update function was not executed.")
-                return
-            func = getattr(module, chosen)
-            # Inspect the callable's signature and call appropriately
+    if not entry['entry']:
+        # No callable update entry found — offer to show file contents and instructions
+        show = messagebox.askyesno("No Update Action",
+                                   "The selected file did not provide a callable update function like `apply_update(app)`.\n\nWould you like to view the file contents and instructions for creating an update file?")
+        if show:
             try:
-                sig = inspect.signature(func)
-                params = list(sig.parameters.values())
-                # No parameters -> call directly
-                if len(params) == 0:
-                    func()
-                # Single parameter -> pass the app context dict
-                elif len(params) == 1:
-                    func(app_ctx)
-                else:
-                    # Try to map common parameter names to values
-                    mapping = {
-                        'app': app_ctx,
-                        'app_ctx': app_ctx,
-                        'ctx': app_ctx,
-                        'root': root,
-                        'text': text_widget,
-                        'title_var': title_var,
-                        'save_file': save_file,
-                        'open_file': open_file,
-                        'new_file': new_file,
-                        'make_bold': make_bold,
-                        'make_italic': make_italic,
-                        'make_title': make_title,
-                        'update_title': update_title,
-                    }
-                    kwargs = {}
-                    for p in params:
-                        name = p.name
-                        if name in mapping:
-                            kwargs[name] = mapping[name]
-                        elif name in ('app', 'app_ctx', 'ctx') and 'app' not in kwargs:
-                            kwargs[name] = app_ctx
-                    if kwargs:
-                        func(**kwargs)
-                    else:
-                        # Fallback to passing app_ctx as single arg
-                        func(app_ctx)
+                with open(path, 'r', encoding='utf-8') as f:
+                    src = f.read()
             except Exception:
-                # If signature inspection fails for any reason, try the simple call
-                func(app_ctx)
-            messagebox.showinfo("Update Installed", "Update applied successfully.")
+                src = "(Could not read file)"
+            dlg = tk.Toplevel(root)
+            dlg.title("Update file contents")
+            txt = tk.Text(dlg, wrap='none', width=80, height=30)
+            txt.insert('1.0', src)
+            txt.config(state='disabled')
+            txt.pack(expand=True, fill='both')
+            info = tk.Label(dlg, text=("To be used as an update, the file should provide:\n"
+                                       "def apply_update(app):\n    # modify app (app['root'], app['text'], etc.)\n"
+                                       "Sandboxed updates get app['text'] as a string and call\n"
+                                       "app['replace'](start, end, text) or app['message'](text).\n"))
+            info.pack(pady=6)
+            tk.Button(dlg, text='Close', command=dlg.destroy).pack(pady=4)
         else:
-            # No callable update entry found — offer to show file contents and instructions
-            show = messagebox.askyesno("No Update Action",
-                                       "The selected file did not provide a callable update function like `apply_update(app)`.\n\nWould you like to view the file contents and instructions for creating an update file?")
-            if show:
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        src = f.read()
-                except Exception:
-                    src = "(Could not read file)"
-                dlg = tk.Toplevel(root)
-                dlg.title("Update file contents")
-                txt = tk.Text(dlg, wrap='none', width=80, height=30)
-                txt.insert('1.0', src)
-                txt.config(state='disabled')
-                txt.pack(expand=True, fill='both')
-                info = tk.Label(dlg, text=("To be used as an update, the file should provide:\n"
-                                           "def apply_update(app):\n    # modify app (app['root'], app['text'], etc.)\n"))
-                info.pack(pady=6)
-                tk.Button(dlg, text='Close', command=dlg.destroy).pack(pady=4)
-            else:
-                messagebox.showinfo("No Update Action", "No update function found; nothing was executed.")
-    except Exception as e:
-        messagebox.showerror("Update Error", f"Error while applying update:\n{e}")
+            messagebox.showinfo("No Update Action", "No update function found; nothing was executed.")
+        return
+
+    choice = messagebox.askyesnocancel(
+        "Run update function",
+        f"Found function `{entry['entry']}` in the selected file. Run it now?\n\n"
+        "Yes: run it sandboxed, in a separate process that only sees this document (recommended).\n"
+        "No: run it inside the editor with full access to the UI and files.\n"
+        "Cancel: don't run it.")
+    if choice is None:
+        messagebox.showinfo("Update Skipped", "Update function was not executed.")
+        return
+    host.registry.set_trusted(dest.name, not choice)
+    run_plugin(root, dest.name, text_widget, title_var)
+
+
+def fill_plugins_menu(menu, root, text, title_var):
+    """Rebuild Tools > Plugins from the registry (no plugin is imported)."""
+    menu.delete(0, tk.END)
+    plugins = plugin_host(root).registry.available()
+    for name, entry in plugins.items():
+        if entry['entry']:
+            label = name + (' (full access)' if entry['trusted'] else '')
+            menu.add_command(label=label, command=lambda name=name: run_plugin(root, name, text(), title_var))
+    if not plugins:
+        menu.add_command(label='(none installed)', state='disabled')
+
+
+def plugin_worker_main():
+    """`project.py plugin-worker`: serve the editor's plugin requests on stdin/stdout."""
+    import sys
+    import traceback
+    out = sys.stdout
+    sys.stdout = sys.stderr  # a plugin's print() must not corrupt the protocol
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (PLUGIN_MEMORY_LIMIT, PLUGIN_MEMORY_LIMIT))
+    except (ImportError, ValueError, OSError):
+        pass
+    modules = {}
+
+    def reply(message):
+        out.write(json.dumps(message) + '\n')
+        out.flush()
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        rid = request['id']
+        app = dict(request['app'])
+        edits = []
+        app['replace'] = lambda start, end, text: edits.append([start, end, text])
+        app['set_text'] = lambda text: edits.append([0, len(request['app']['text']), text])
+        app['message'] = lambda text: reply({'id': rid, 'type': 'message', 'text': str(text)})
+        try:
+            path = request['path']
+            mtime = os.stat(path).st_mtime_ns
+            if modules.get(path, (None,))[0] != mtime:
+                modules[path] = (mtime, load_plugin_module(path))
+            func = getattr(modules[path][1], request['entry'])
+            call_plugin(func, request['params'], app, app)
+            reply({'id': rid, 'type': 'done', 'edits': edits})
+        except BaseException:
+            reply({'id': rid, 'type': 'error', 'error': traceback.format_exc(limit=5)})
+
+# --------------------- End plugins ---------------------
 
 
 def launch_offline_editor():
     """Launch the integrated offline editor UI defined in this file.
 
+    It opens as a Toplevel of the main editor's root (or raises the one
+    already open); only without a main editor does it get its own Tk root.
     The offline editor functions are prefixed with `offline_` to avoid name collisions.
     """
     try:
+        window = OFF_APP_STATE['window']
+        if window is not None and window.winfo_exists():
+            window.lift()
+            return
+        if APP_ROOT is not None:
+            offline_build_ui(APP_ROOT)
+            return
         root = offline_build_ui()
+        if PERF_ENABLED:
+            set_perf_enabled(root, True)
         root.mainloop()
+        SAVER.wait()
     except NameError:
         messagebox.showerror("Offline Editor", "Offline editor code is not available.")
     except Exception as e:
@@ -444,6 +5639,7 @@ def launch_offline_editor():
 OFF_APP_STATE = {
     'current_path': None,
     'is_dirty': False,
+    'window': None,
 }
 
 OFF_FONTS = [
@@ -467,66 +5663,109 @@ def offline_prompt_save_if_dirty(root, text_widget):
 def offline_new_file(root, text_widget, title_var):
     if not offline_prompt_save_if_dirty(root, text_widget):
         return
+    close_large_file(text_widget)
     text_widget.delete('1.0', tk.END)
+    get_document(text_widget).file_format = DEFAULT_FORMAT
+    reset_undo(text_widget)
+    release_document_fonts(text_widget)
     title_var.set('Untitled')
     OFF_APP_STATE['current_path'] = None
     OFF_APP_STATE['is_dirty'] = False
+    if str(text_widget) in JOURNALS:
+        JOURNALS[str(text_widget)].rebase(None)
+    update_highlighting(text_widget, None)
     offline_update_title(root, title_var)
 
 
 def offline_open_file(root, text_widget, title_var):
     if not offline_prompt_save_if_dirty(root, text_widget):
         return
-    path = filedialog.askopenfilename(filetypes=[('Text', '*.txt'), ('All files', '*.*')])
+    path = filedialog.askopenfilename(filetypes=[('Text', '*.txt'), ('PyText Document', '*.pytx'), ('All files', '*.*')])
     if not path:
         return
+    release_document_fonts(text_widget)
+    stop = perf_stopwatch('offline_open_file')
+
+    def done(path):
+        stop()
+        OFF_APP_STATE['current_path'] = path
+        OFF_APP_STATE['is_dirty'] = False
+        if str(text_widget) in JOURNALS:
+            JOURNALS[str(text_widget)].rebase(path)
+        update_highlighting(text_widget, path)
+        title_var.set(os.path.basename(path))
+        offline_update_title(root, title_var)
+
+    def cancelled():
+        OFF_APP_STATE['current_path'] = None
+        OFF_APP_STATE['is_dirty'] = False
+        if str(text_widget) in JOURNALS:
+            JOURNALS[str(text_widget)].rebase(None)
+        update_highlighting(text_widget, None)
+        title_var.set('Untitled')
+        offline_update_title(root, title_var)
+
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
+        view = open_large_file(root, text_widget, text_widget.scrollbar, path)
+    except (OSError, ValueError) as e:
         messagebox.showerror('Open error', str(e))
         return
-    text_widget.delete('1.0', tk.END)
-    text_widget.insert(tk.END, content)
+    if view is not None:
+        done(path)
+        return
+    load_document(root, text_widget, path, on_done=done, on_cancel=cancelled,
+                     on_error=lambda e: messagebox.showerror('Open error', str(e)))
+
+
+def offline_save_to(root, text_widget, path, notify=True):
+    """Save the document to `path` on the background save worker."""
+    doc = get_document(text_widget)
+    view = LARGE_VIEWS.get(str(text_widget))
+    if view is not None and view.indexing:
+        messagebox.showinfo('Save', 'The file is still being indexed; try again in a moment.')
+        return
+    journal = JOURNALS.get(str(text_widget))
+    gen = journal.begin() if journal else None
+    stop = perf_stopwatch('offline_save_file')
+
+    def done(path, error):
+        stop()
+        if error:
+            if offer_utf8(text_widget, error):
+                offline_save_to(root, text_widget, path, notify)
+            elif notify:
+                messagebox.showerror('Save error', str(error))
+            return
+        if journal:
+            journal.commit_file(gen, path)
+        if view is not None and LARGE_VIEWS.get(str(text_widget)) is view and doc.version == version:
+            view.reload(path)
+        if doc.version == version and OFF_APP_STATE['current_path'] == path:
+            OFF_APP_STATE['is_dirty'] = False
+        offline_update_title(None, None)
+        if notify:
+            messagebox.showinfo('Saved', f'Saved to {path}')
+
     OFF_APP_STATE['current_path'] = path
-    OFF_APP_STATE['is_dirty'] = False
-    title_var.set(os.path.basename(path))
-    offline_update_title(root, title_var)
+    update_highlighting(text_widget, path)
+    version = SAVER.submit(root, path, document_for_save(text_widget, path), done)
 
 
 def offline_save_file(root, text_widget):
     if OFF_APP_STATE['current_path']:
         path = OFF_APP_STATE['current_path']
     else:
-        path = filedialog.asksaveasfilename(defaultextension='.txt', filetypes=[('Text', '*.txt')])
+        path = filedialog.asksaveasfilename(defaultextension='.txt', filetypes=[('Text', '*.txt'), ('PyText Document', '*.pytx')])
         if not path:
             return
-    try:
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(text_widget.get('1.0', tk.END))
-    except Exception as e:
-        messagebox.showerror('Save error', str(e))
-        return
-    OFF_APP_STATE['current_path'] = path
-    OFF_APP_STATE['is_dirty'] = False
-    offline_update_title(None, None)
-    messagebox.showinfo('Saved', f'Saved to {path}')
+    offline_save_to(root, text_widget, path)
 
 
 def offline_save_file_as(root, text_widget):
-    path = filedialog.asksaveasfilename(defaultextension='.txt', filetypes=[('Text', '*.txt')])
+    path = filedialog.asksaveasfilename(defaultextension='.txt', filetypes=[('Text', '*.txt'), ('PyText Document', '*.pytx')])
     if not path:
         return
-    try:
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(text_widget.get('1.0', tk.END))
-    except Exception as e:
-        messagebox.showerror('Save error', str(e))
-        return
-    OFF_APP_STATE['current_path'] = path
-    OFF_APP_STATE['is_dirty'] = False
-    offline_update_title(None, None)
-    messagebox.showinfo('Saved', f'Saved to {path}')
+    offline_save_to(root, text_widget, path)
 
 
 def offline_update_title(root, title_var):
@@ -538,6 +5777,7 @@ def offline_update_title(root, title_var):
     else:
         name = 'Untitled'
     marker = ' •' if OFF_APP_STATE['is_dirty'] else ''
+    root = root or OFF_APP_STATE['window']
     if root:
         root.title(f'{name}{marker} - PyText (Offline)')
 
@@ -546,12 +5786,17 @@ def offline_make_tag_name(props: dict):
     return f"f_{props.get('family')}_s_{props.get('size')}_w_{props.get('weight')}_sl_{props.get('slant')}_u_{int(props.get('underline'))}"
 
 
+OFF_TAG_NAMES = {}
+
+
+@timed('offline_apply_font_tag')
 def offline_apply_font_tag(text, start, end, family, size, weight='normal', slant='roman', underline=False):
-    props = {'family': family, 'size': size, 'weight': weight, 'slant': slant, 'underline': underline}
-    tag = offline_make_tag_name(props)
-    if not text.tag_cget(tag, 'font'):
-        f = font.Font(family=family, size=size, weight=weight, slant=slant, underline=underline)
-        text.tag_configure(tag, font=f)
+    props = (family, size, weight, slant, bool(underline))
+    tag = OFF_TAG_NAMES.get(props)
+    if tag is None:
+        tag = OFF_TAG_NAMES[props] = offline_make_tag_name(
+            {'family': family, 'size': size, 'weight': weight, 'slant': slant, 'underline': underline})
+    FONTS.configure_tag(text, tag, props)
     text.tag_add(tag, start, end)
 
 
@@ -579,39 +5824,101 @@ def offline_find_replace_dialog(root, text_widget):
     replace_var = tk.StringVar()
     tk.Entry(dlg, textvariable=replace_var, width=30).grid(row=1, column=1, padx=4, pady=4)
 
+    options = tk.Frame(dlg)
+    options.grid(row=3, column=0, columnspan=2, sticky='w', padx=4)
+    regex_var = tk.BooleanVar(value=False)
+    word_var = tk.BooleanVar(value=False)
+    case_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(options, text='Regex', variable=regex_var).pack(side='left')
+    tk.Checkbutton(options, text='Whole word', variable=word_var).pack(side='left')
+    tk.Checkbutton(options, text='Match case', variable=case_var).pack(side='left')
+    count_label = tk.Label(dlg, text='', anchor='w')
+    count_label.grid(row=4, column=0, columnspan=2, sticky='w', padx=4, pady=(0, 4))
+
+    doc = get_document(text_widget)
+    matches = {'starts': [], 'ends': [], 'note': ''}
+    pending = {'find': None, 'highlight': None}
+    text_widget.tag_configure('search', background='yellow')
+
+    @timed('do_find')
     def do_find():
+        pending['find'] = None
         text_widget.tag_remove('search', '1.0', tk.END)
+        matches['starts'], matches['ends'] = [], []
         q = find_var.get()
         if not q:
+            count_label.config(text='')
             return
-        idx = '1.0'
-        while True:
-            idx = text_widget.search(q, idx, nocase=1, stopindex=tk.END)
-            if not idx:
-                break
-            lastidx = f"{idx}+{len(q)}c"
-            text_widget.tag_add('search', idx, lastidx)
-            idx = lastidx
-        text_widget.tag_configure('search', background='yellow')
+        try:
+            starts, ends = find_all(doc, q, regex_var.get(), word_var.get(), case_var.get())
+        except re.error as e:
+            count_label.config(text=f'Invalid pattern: {e}')
+            return
+        matches['starts'], matches['ends'] = starts, ends
+        count_label.config(text=f"{matches['note']}{len(starts)} match{'es' if len(starts) != 1 else ''}")
+        matches['note'] = ''
+        highlight_visible_matches(text_widget, doc, starts, ends)
+
+    def schedule_find(*args):
+        # Re-run the search once typing in the field or the document pauses
+        if pending['find'] is not None:
+            dlg.after_cancel(pending['find'])
+        pending['find'] = dlg.after(200, do_find)
+
+    def refresh_highlights():
+        pending['highlight'] = None
+        if matches['starts']:
+            highlight_visible_matches(text_widget, doc, matches['starts'], matches['ends'])
+
+    def on_scroll():
+        if pending['highlight'] is None:
+            pending['highlight'] = dlg.after_idle(refresh_highlights)
+
+    def on_changes(changes):
+        if find_var.get():
+            schedule_find()
+
+    find_var.trace_add('write', schedule_find)
+    for var in (regex_var, word_var, case_var):
+        var.trace_add('write', schedule_find)
+    unsubscribe = subscribe_batched(dlg, doc, on_changes)
+    remove_scroll_listener = add_scroll_listener(text_widget, on_scroll)
+
+    def on_close(event=None):
+        if event is not None and event.widget is not dlg:
+            return
+        unsubscribe()
+        remove_scroll_listener()
+        for after_id in pending.values():
+            if after_id is not None:
+                dlg.after_cancel(after_id)
+        text_widget.tag_remove('search', '1.0', tk.END)
 
+    dlg.bind('<Destroy>', on_close)
+
+    @timed('do_replace')
     def do_replace():
         q = find_var.get()
         r = replace_var.get()
         if not q:
             return
-        content = text_widget.get('1.0', tk.END)
-        content = content.replace(q, r)
-        text_widget.delete('1.0', tk.END)
-        text_widget.insert('1.0', content)
-        OFF_APP_STATE['is_dirty'] = True
+        try:
+            count = replace_all(text_widget, q, r, regex_var.get(), word_var.get(), case_var.get())
+        except (re.error, IndexError) as e:
+            count_label.config(text=f'Invalid pattern: {e}')
+            return
+        count_label.config(text=f"Replaced {count} match{'es' if count != 1 else ''}")
+        matches['note'] = f"Replaced {count}; "
+        if count:
+            OFF_APP_STATE['is_dirty'] = True
 
     tk.Button(dlg, text='Find', command=do_find).grid(row=2, column=0, pady=6)
     tk.Button(dlg, text='Replace All', command=do_replace).grid(row=2, column=1, pady=6)
 
 
+@timed('word_count')
 def offline_word_count(text_widget):
-    text = text_widget.get('1.0', tk.END)
-    return len(text.split())
+    return get_word_counter(text_widget).words
 
 
 def offline_create_toolbar(root, text_widget, title_var):
@@ -672,24 +5979,16 @@ def offline_create_toolbar(root, text_widget, title_var):
 
 
 def offline_start_autosave(root, text_widget):
-    tmp = Path(tempfile.gettempdir()) / 'pytext_autosave.txt'
-    def autosave():
-        try:
-            if OFF_APP_STATE['is_dirty'] and OFF_APP_STATE['current_path']:
-                with open(OFF_APP_STATE['current_path'], 'w', encoding='utf-8') as f:
-                    f.write(text_widget.get('1.0', tk.END))
-                OFF_APP_STATE['is_dirty'] = False
-            else:
-                with open(tmp, 'w', encoding='utf-8') as f:
-                    f.write(text_widget.get('1.0', tk.END))
-        except Exception:
-            pass
-        root.after(25000, autosave)
-    root.after(25000, autosave)
+    # Edits are journaled by the app-wide autosave timer
+    journal = EditJournal(root, text_widget)
+    start_autosave(text_widget.nametowidget('.'))
+    return journal
 
 
-def offline_build_ui():
-    root = tk.Tk()
+def offline_build_ui(master=None):
+    """Build the offline editor: a Toplevel of `master`, or its own Tk root without one."""
+    root = tk.Toplevel(master) if master is not None else tk.Tk()
+    OFF_APP_STATE.update(current_path=None, is_dirty=False, window=root)
     root.geometry('900x700')
     root.title('PyText (Offline)')
 
@@ -699,54 +5998,74 @@ def offline_build_ui():
 
     text_frame = tk.Frame(root)
     text_frame.pack(expand=True, fill='both', padx=8, pady=8)
-    text = tk.Text(text_frame, wrap='word', undo=True)
+    text = tk.Text(text_frame, wrap='word')
     text.pack(side='left', expand=True, fill='both')
+    attach_document(text)
+    attach_undo(text)
     scrollbar = tk.Scrollbar(text_frame, command=text.yview)
     scrollbar.pack(side='right', fill='y')
     text.config(yscrollcommand=scrollbar.set)
+    text.scrollbar = scrollbar
 
     toolbar = offline_create_toolbar(root, text, title_var)
     toolbar.pack(fill='x', padx=8, pady=(0,4))
 
+    status_bar = create_status_bar(root, text)
+    status_bar.pack(fill='x', padx=8, pady=(0,4))
+
     menu = tk.Menu(root)
     root.config(menu=menu)
     file_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label='File', menu=file_menu)
     file_menu.add_command(label='New', command=lambda: offline_new_file(root, text, title_var))
     file_menu.add_command(label='Open', command=lambda: offline_open_file(root, text, title_var))
+    file_menu.add_command(label='Open Log Viewer...', command=lambda: open_log_viewer(root))
     file_menu.add_command(label='Save', command=lambda: offline_save_file(root, text))
     file_menu.add_command(label='Save As', command=lambda: offline_save_file_as(root, text))
     file_menu.add_separator()
-    file_menu.add_command(label='Exit', command=lambda: (offline_prompt_save_if_dirty(root, text) and root.destroy()))
+    def exit_editor():
+        if offline_prompt_save_if_dirty(root, text):
+            SAVER.wait()
+            journal.discard()
+            OFF_APP_STATE['window'] = None
+            root.destroy()
+
+    file_menu.add_command(label='Exit', command=exit_editor)
+    root.protocol('WM_DELETE_WINDOW', exit_editor)
 
     edit_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label='Edit', menu=edit_menu)
-    edit_menu.add_command(label='Undo', command=lambda: text.edit_undo())
-    edit_menu.add_command(label='Redo', command=lambda: text.edit_redo())
+    edit_menu.add_command(label='Undo', accelerator='Ctrl+Z', command=lambda: undo(text))
+    edit_menu.add_command(label='Redo', accelerator='Ctrl+Y', command=lambda: undo(text, redo=True))
     edit_menu.add_separator()
     edit_menu.add_command(label='Find/Replace', command=lambda: offline_find_replace_dialog(root, text))
+    edit_menu.add_command(label='Go To Line...', accelerator='Ctrl+G', command=lambda: ask_goto_line(root, text))
 
     tools_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label='Tools', menu=tools_menu)
     tools_menu.add_command(label='Word Count', command=lambda: messagebox.showinfo('Word Count', f"{offline_word_count(text)} words"))
+    tools_menu.add_command(label='Document Analytics...', command=lambda: show_analytics_panel(root, text))
+    tools_menu.add_command(label='Font Cache Stats', command=lambda: messagebox.showinfo('Font Cache', font_cache_summary()))
+    tools_menu.add_command(label='Performance...', command=lambda: show_performance_window(root))
 
     help_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label='Help', menu=help_menu)
     help_menu.add_command(label='About', command=lambda: messagebox.showinfo('About', 'PyText Offline - Google Docs-like experience (no internet)'))
 
-    def on_modified(event=None):
-        if text.edit_modified():
+    def on_edit():
+        if not OFF_APP_STATE['is_dirty']:
             OFF_APP_STATE['is_dirty'] = True
             offline_update_title(root, title_var)
-            text.edit_modified(False)
-    text.bind('<<Modified>>', on_modified)
+    on_user_edit(text, on_edit)
 
-    offline_start_autosave(root, text)
+    journal = offline_start_autosave(root, text)
 
-    root.bind_all('<Control-s>', lambda e: (offline_save_file(root, text), 'break'))
-    root.bind_all('<Control-b>', lambda e: (offline_toggle_tag(text, 'bold'), 'break'))
-    root.bind_all('<Control-i>', lambda e: (offline_toggle_tag(text, 'italic'), 'break'))
-    root.bind_all('<Control-u>', lambda e: (offline_toggle_tag(text, 'underline'), 'break'))
+    # Bound on this window only, so they do not clash with the main editor's
+    root.bind('<Control-s>', lambda e: (offline_save_file(root, text), 'break'))
+    root.bind('<Control-b>', lambda e: (offline_toggle_tag(text, 'bold'), 'break'))
+    root.bind('<Control-i>', lambda e: (offline_toggle_tag(text, 'italic'), 'break'))
+    root.bind('<Control-u>', lambda e: (offline_toggle_tag(text, 'underline'), 'break'))
+    root.bind('<Control-g>', lambda e: (ask_goto_line(root, text), 'break'))
 
     return root
 
@@ -754,33 +6073,32 @@ def offline_build_ui():
 
 
 def find_text_widget():
-    """Find the text widget from the app root."""
-    for child in APP_ROOT.winfo_children():
-        if isinstance(child, tk.Text):
-            return child
-        for subchild in child.winfo_children():
-            if isinstance(subchild, tk.Text):
-                return subchild
-    return None
+    """The text widget of the main editor's selected tab."""
+    doc = current_document()
+    return doc.text if doc else None
 
 
-def main():
+def main(show_splash=True, choice=None, open_path=None, on_ready=None):
+    """Build and run the editor on a single Tk root.
+
+    The root stays withdrawn behind the splash while the window is built;
+    then the splash closes and the startup dialog asks what to do, unless
+    `choice` (1 previous session, 2 new, 3 open `open_path` or ask, 4 exit)
+    is given. `on_ready(root)` is called once the editor window is shown.
+    """
     root = tk.Tk()
+    root.withdraw()
     root.title("PyText editor")
-    global APP_ROOT
+    global APP_ROOT, DOC_MANAGER
     APP_ROOT = root
+    if PERF_ENABLED:
+        set_perf_enabled(root, True)
+    splash = show_splash_screen(root) if show_splash else None
     
     # Set window icon if logo exists
-    logo_path = Path(__file__).parent / 'logo.png'
-    if logo_path.exists():
-        try:
-            from PIL import Image, ImageTk
-            logo_img = Image.open(logo_path).resize((32, 32))
-            logo_photo = ImageTk.PhotoImage(logo_img)
-            root.iconphoto(False, logo_photo)
-            root.icon_ref = logo_photo  # Keep a reference
-        except Exception:
-            pass
+    icon = logo_image(root, 32)
+    if icon is not None:
+        root.iconphoto(False, icon)
 
     # Title entry (like Google Docs)
     title_frame = tk.Frame(root)
@@ -789,22 +6107,19 @@ def main():
     title_entry = tk.Entry(title_frame, textvariable=title_var, font=("Arial", 16, "bold"))
     title_entry.pack(fill="x")
 
-    # Text area
-    text = tk.Text(root, wrap="word", font=("Arial", 12))
-    text.pack(expand=True, fill="both")
+    # One tab per open document
+    notebook = ttk.Notebook(root)
+    notebook.pack(expand=True, fill="both")
+    DOC_MANAGER = DocumentManager(root, notebook, title_var)
+    DOC_MANAGER.new()
 
-    def update_title(event=None):
-        # set window title to show doc title and dirty marker
-        name = title_var.get() or "Untitled"
-        marker = "•" if IS_DIRTY else ""
-        if CURRENT_PATH:
-            display = f"{name} {marker} - {CURRENT_PATH} - PyText editor"
-        else:
-            display = f"{name} {marker} - PyText editor"
-        root.title(display)
+    def text():
+        return DOC_MANAGER.current().text
 
-    # expose update_title for module-level calls
-    globals()['update_title'] = update_title
+    def find_in_files():
+        # Search next to the current file, or from the working directory
+        path = DOC_MANAGER.current().path
+        show_find_in_files(root, os.path.dirname(path) if path else None)
 
     # Menu bar
     menu = tk.Menu(root)
@@ -812,20 +6127,52 @@ def main():
 
     file_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label="File", menu=file_menu)
-    file_menu.add_command(label="New", command=lambda: (prompt_save_if_dirty(text) and new_file(text) and update_title()))
-    file_menu.add_command(label="Open", command=lambda: open_file(text))
+    file_menu.add_command(label="New", command=lambda: DOC_MANAGER.new())
+    file_menu.add_command(label="Open", command=lambda: open_file(text()))
+    file_menu.add_command(label="Open Log Viewer...", command=lambda: open_log_viewer(root))
     file_menu.add_command(label="Open Offline Editor", command=lambda: launch_offline_editor())
-    file_menu.add_command(label="Install Update...", command=lambda: install_update(root, text, title_var))
-    file_menu.add_command(label="Save", command=lambda: save_file(text))
+    file_menu.add_command(label="Install Update...", command=lambda: install_update(root, text(), title_var))
+    file_menu.add_command(label="Save", command=lambda: save_file(text()))
+    file_menu.add_command(label="Close Tab", command=lambda: DOC_MANAGER.close(DOC_MANAGER.current()))
     file_menu.add_separator()
-    file_menu.add_command(label="Exit", command=root.quit)
+    file_menu.add_command(label="Exit", command=lambda: on_close())
+
+    edit_menu = tk.Menu(menu, tearoff=0)
+    menu.add_cascade(label="Edit", menu=edit_menu)
+    edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=lambda: undo(text()))
+    edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=lambda: undo(text(), redo=True))
+    edit_menu.add_separator()
+    edit_menu.add_command(label="Find in Files...", accelerator="Ctrl+Shift+F", command=lambda: find_in_files())
 
     tools_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label="Tools", menu=tools_menu)
     tools_menu.add_command(
         label="Word Count",
-        command=lambda: messagebox.showinfo("Word Count", f"{word_count(text.get('1.0', tk.END))} words")
+        command=lambda: messagebox.showinfo("Word Count", f"{get_word_counter(text()).words} words")
     )
+    tools_menu.add_command(
+        label="Document Analytics...",
+        command=lambda: show_analytics_panel(root, text())
+    )
+    tools_menu.add_command(
+        label="Font Cache Stats",
+        command=lambda: messagebox.showinfo("Font Cache", font_cache_summary())
+    )
+    plugins_menu = tk.Menu(tools_menu, tearoff=0,
+                           postcommand=lambda: fill_plugins_menu(plugins_menu, root, text, title_var))
+    tools_menu.add_cascade(label="Plugins", menu=plugins_menu)
+    tools_menu.add_command(label="Performance...", command=lambda: show_performance_window(root))
+
+    view_menu = tk.Menu(menu, tearoff=0)
+    menu.add_cascade(label="View", menu=view_menu)
+    view_menu.add_command(label="Go To Line...", accelerator="Ctrl+G", command=lambda: ask_goto_line(root, text()))
+    view_menu.add_command(label="Toggle Bookmark", accelerator="Ctrl+F2", command=lambda: toggle_bookmark(text()))
+    view_menu.add_command(label="Next Bookmark", accelerator="F2", command=lambda: jump_to_bookmark(text()))
+    view_menu.add_command(label="Previous Bookmark", accelerator="Shift+F2",
+                          command=lambda: jump_to_bookmark(text(), -1))
+    view_menu.add_separator()
+    minimap_var = tk.BooleanVar(value=True)
+    view_menu.add_checkbutton(label="Minimap", variable=minimap_var, command=lambda: show_minimaps(minimap_var.get()))
 
     help_menu = tk.Menu(menu, tearoff=0)
     menu.add_cascade(label="Help", menu=help_menu)
@@ -838,56 +6185,46 @@ def main():
     toolbar = tk.Frame(root)
     toolbar.pack(fill="x")
 
-    bold_btn = tk.Button(toolbar, text="Bold", command=lambda: make_bold(text))
+    bold_btn = tk.Button(toolbar, text="Bold", command=lambda: make_bold(text()))
     bold_btn.pack(side="left")
 
-    italic_btn = tk.Button(toolbar, text="Italic", command=lambda: make_italic(text))
+    italic_btn = tk.Button(toolbar, text="Italic", command=lambda: make_italic(text()))
     italic_btn.pack(side="left")
 
-    title_btn = tk.Button(toolbar, text="Title", command=lambda: make_title(text))
+    title_btn = tk.Button(toolbar, text="Title", command=lambda: make_title(text()))
     title_btn.pack(side="left")
 
-    update_btn = tk.Button(toolbar, text="Update", command=lambda: install_update(root, text, title_var))
+    update_btn = tk.Button(toolbar, text="Update", command=lambda: install_update(root, text(), title_var))
     update_btn.pack(side="left")
 
-    # Bindings: shortcuts like Google Docs (Ctrl+S, Ctrl+N, Ctrl+B, Ctrl+I)
-    root.bind_all('<Control-s>', lambda e: (save_file(text), 'break'))
-    root.bind_all('<Control-n>', lambda e: (prompt_save_if_dirty(text) and new_file(text) and update_title(), 'break'))
-    root.bind_all('<Control-b>', lambda e: (make_bold(text), 'break'))
-    root.bind_all('<Control-i>', lambda e: (make_italic(text), 'break'))
-
-    # Track changes to mark document dirty and update title
-    def on_modified(event=None):
-        global IS_DIRTY
-        if text.edit_modified():
-            IS_DIRTY = True
-            update_title()
-            text.edit_modified(False)
-
-    text.bind('<<Modified>>', on_modified)
-
-    # Autosave (every 15 seconds) when document has a path
-    def autosave():
-        global IS_DIRTY, CURRENT_PATH
-        if IS_DIRTY and CURRENT_PATH:
-            try:
-                # save silently
-                content = text.get('1.0', tk.END)
-                with open(CURRENT_PATH, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                IS_DIRTY = False
-                update_title()
-            except Exception:
-                pass
-        root.after(15000, autosave)
-
-    root.after(15000, autosave)
-
-    # Prompt to save before closing
+    # Bindings: shortcuts like Google Docs (Ctrl+S, Ctrl+N, Ctrl+B, Ctrl+I).
+    # Bound on the root window so they do not fire in the offline editor.
+    root.bind('<Control-s>', lambda e: (save_file(text()), 'break'))
+    root.bind('<Control-n>', lambda e: (DOC_MANAGER.new(), 'break'))
+    root.bind('<Control-w>', lambda e: (DOC_MANAGER.close(DOC_MANAGER.current()), 'break'))
+    root.bind('<Control-b>', lambda e: (make_bold(text()), 'break'))
+    root.bind('<Control-i>', lambda e: (make_italic(text()), 'break'))
+    root.bind('<Control-g>', lambda e: (ask_goto_line(root, text()), 'break'))
+    root.bind('<Control-F>', lambda e: (find_in_files(), 'break'))
+    root.bind('<Control-F2>', lambda e: (toggle_bookmark(text()), 'break'))
+    root.bind('<F2>', lambda e: (jump_to_bookmark(text()), 'break'))
+    root.bind('<Shift-F2>', lambda e: (jump_to_bookmark(text(), -1), 'break'))
+
+    # Autosave: one timer appends the edits of every open document to the
+    # crash-recovery journal rather than rewriting whole files
+    start_autosave(root)
+
+    # Closing keeps unsaved tabs in their recovery journals and records every
+    # tab in the session, so "Return from Previous Session" brings them back
     def on_close():
-        if not prompt_save_if_dirty(text):
-            return
-        save_session()  # Save session before closing
+        for doc in DOC_MANAGER.docs.values():
+            if doc.dirty:
+                doc.journal.flush()
+        save_session()
+        SAVER.wait()  # Let in-flight background saves reach the disk
+        for doc in DOC_MANAGER.docs.values():
+            if not doc.dirty:
+                doc.journal.discard()
         root.destroy()
 
     root.protocol('WM_DELETE_WINDOW', on_close)
@@ -895,30 +6232,92 @@ def main():
     # Initialize title display
     update_title()
 
+    def recovered(path, pt):
+        doc = DOC_MANAGER.blank()
+        restore_recovered(doc.text, pt)
+        doc.path = path
+        update_highlighting(doc.text, path)
+        doc.dirty = True
+        if path:
+            doc.title = os.path.basename(path)
+            title_var.set(doc.title)
+        update_title()
+
+    def start():
+        global RETURN_FROM_PREVIOUS
+        if splash is not None:
+            splash.destroy()
+        action = choice if choice is not None else show_startup_dialog(root)
+        if action not in (1, 2, 3):
+            root.destroy()
+            return
+        RETURN_FROM_PREVIOUS = action == 1
+        session = load_session() if action == 1 else None
+        if action != 1:
+            clear_session()
+        root.deiconify()
+        text().focus_set()
+        if session:
+            DOC_MANAGER.restore(session)
+        elif action == 3 and open_path:
+            open_file_internal(open_path)
+        elif action == 3:
+            open_file(text())
+        offer_recovery(root, recovered)
+        if on_ready:
+            root.update_idletasks()
+            on_ready(root)
+
+    root.after_idle(start)
     root.mainloop()
+    SAVER.wait()
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='project.py', description='PyText editor')
+    parser.add_argument('--no-splash', action='store_true', help='start without the splash screen')
+    parser.add_argument('--perf', action='store_true', help='record operation timings from the start (Tools > Performance)')
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument('--open', metavar='FILE', help='open FILE (skips the startup dialog)')
+    start.add_argument('--new', action='store_true', help='start with a new document')
+    start.add_argument('--restore', action='store_true', help='reopen the previous session')
+
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('plugin-worker', help='(internal) run sandboxed plugins for the editor over stdin/stdout')
+    batch = commands.add_parser('batch', help='run text operations over many files without a GUI')
+    operations = batch.add_subparsers(dest='operation', required=True)
+    shared = argparse.ArgumentParser(add_help=False, fromfile_prefix_chars='@')
+    shared.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per core)')
+
+    operations.add_parser('count', parents=[shared], fromfile_prefix_chars='@',
+                          help='print words, characters and lines per file')
+    replace = operations.add_parser('replace', parents=[shared], fromfile_prefix_chars='@',
+                                    help='find and replace in every file')
+    replace.add_argument('pattern')
+    replace.add_argument('replacement')
+    replace.add_argument('--regex', action='store_true')
+    replace.add_argument('--whole-word', action='store_true')
+    replace.add_argument('--match-case', action='store_true')
+    replace.add_argument('-o', '--output-dir', help='write results here instead of in place')
+    convert = operations.add_parser('convert', parents=[shared], fromfile_prefix_chars='@',
+                                    help='convert between plain text and .pytx')
+    convert.add_argument('--to', choices=('txt', 'pytx'), required=True)
+    convert.add_argument('-o', '--output-dir', help='write results here instead of next to the input')
+    for operation in operations.choices.values():
+        operation.add_argument('files', nargs='+', help='input files (@LIST reads names from a file)')
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    # Show splash screen for 5 seconds
-    show_splash_screen()
-    
-    # Show startup dialog and handle user choice
-    choice = show_startup_dialog()
-    
-    if choice == 1:  # Return from previous
-        RETURN_FROM_PREVIOUS = True
-        last_file = load_session()
-        main()
-        if last_file and os.path.exists(last_file):
-            # Open the last file in a delayed callback
-            APP_ROOT.after(100, lambda: open_file_internal(last_file))
-    elif choice == 2:  # Create new
-        RETURN_FROM_PREVIOUS = False
-        clear_session()
-        main()
-    elif choice == 3:  # Open file
-        RETURN_FROM_PREVIOUS = False
-        clear_session()
-        main()
-        APP_ROOT.after(100, lambda: open_file(find_text_widget()))
-    # choice == 4 or -1: Exit (do nothing)
\ No newline at end of file
+    args = parse_args()
+    if args.command == 'batch':
+        raise SystemExit(batch_main(args))
+    if args.command == 'plugin-worker':
+        raise SystemExit(plugin_worker_main())
+    if args.perf:
+        PERF_ENABLED = True
+    if args.open:
+        main(show_splash=not args.no_splash, choice=3, open_path=os.path.abspath(args.open))
+    else:
+        main(show_splash=not args.no_splash, choice=2 if args.new else 1 if args.restore else None)